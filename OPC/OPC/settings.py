@@ -222,6 +222,85 @@ SIMPLE_JWT = {
 
 
 
+# Recommender Models
+# Model artifacts are loaded lazily on first use. Set RECOMMENDER_WARMUP to load
+# them when the WSGI/ASGI application starts instead (optionally only the models
+# whose names start with one of RECOMMENDER_WARMUP_MODELS, e.g. 'movies.,books.knn').
+RECOMMENDER_WARMUP = get_env('RECOMMENDER_WARMUP', False, cast=bool)
+RECOMMENDER_WARMUP_MODELS = get_env('RECOMMENDER_WARMUP_MODELS', '', cast=list)
+
+# The title autocomplete indexes are rebuilt in the background once they are
+# this many seconds old, picking up catalog imports and history (0: never)
+AUTOCOMPLETE_REFRESH_INTERVAL = get_env('AUTOCOMPLETE_REFRESH_INTERVAL', 900, cast=int)
+
+# Threads a single BLAS/torch/TensorFlow call may use. 0 divides the cores between
+# the request threads of all workers (GUNICORN_WORKERS x GUNICORN_THREADS, see
+# gunicorn.conf.py), so concurrent requests don't oversubscribe them.
+RECOMMENDER_INTRA_OP_THREADS = get_env('RECOMMENDER_INTRA_OP_THREADS', 0, cast=int)
+RECOMMENDER_WORKERS = get_env('GUNICORN_WORKERS', 1, cast=int)
+RECOMMENDER_REQUEST_THREADS = get_env('GUNICORN_THREADS', 1, cast=int)
+
+# Threads of the pool the async recommendation endpoints run model calls on
+# (one pool per process; under ASGI it takes the place of the request threads)
+RECOMMENDER_EXECUTOR_WORKERS = get_env('RECOMMENDER_EXECUTOR_WORKERS', os.cpu_count() or 1, cast=int)
+
+
+
+# Recommendation History
+# With HISTORY_WRITE_BEHIND, history rows are queued in-process and inserted in
+# batches of up to HISTORY_BATCH_SIZE by a background thread at least every
+# HISTORY_FLUSH_INTERVAL seconds; a full queue (HISTORY_QUEUE_SIZE rows) makes
+# the request write its rows itself. The queue is drained when a worker exits.
+# Off by default: queued rows are lost if a worker is killed.
+HISTORY_WRITE_BEHIND = get_env('HISTORY_WRITE_BEHIND', False, cast=bool)
+HISTORY_QUEUE_SIZE = get_env('HISTORY_QUEUE_SIZE', 10000, cast=int)
+HISTORY_BATCH_SIZE = get_env('HISTORY_BATCH_SIZE', 500, cast=int)
+HISTORY_FLUSH_INTERVAL = float(get_env('HISTORY_FLUSH_INTERVAL', 1.0))
+
+
+
+# Cache Configuration
+# The 'recommendations' cache holds each model's candidate pool per input title
+# (requests still sample from the pool, so regenerate keeps its variety).
+# RECOMMENDATION_CACHE_BACKEND is 'locmem' (per process), 'file', 'redis' or
+# 'dummy' (disabled). Keys include a hash of the model artifacts, so rebuilt
+# models never serve stale pools.
+RECOMMENDATION_CACHE_BACKEND = get_env('RECOMMENDATION_CACHE_BACKEND', 'locmem')
+RECOMMENDATION_CACHE_TIMEOUT = get_env('RECOMMENDATION_CACHE_TIMEOUT', 86400, cast=int)
+
+RECOMMENDATION_CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'recommendations',
+        'OPTIONS': {'MAX_ENTRIES': get_env('RECOMMENDATION_CACHE_MAX_ENTRIES', 10000, cast=int)},
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': get_env('RECOMMENDATION_CACHE_LOCATION', BASE_DIR / 'cache' / 'recommendations'),
+        'OPTIONS': {'MAX_ENTRIES': get_env('RECOMMENDATION_CACHE_MAX_ENTRIES', 10000, cast=int)},
+    },
+    'redis': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': get_env('RECOMMENDATION_CACHE_LOCATION', 'redis://127.0.0.1:6379/1'),
+    },
+    'dummy': {
+        'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+    },
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'recommendations': {
+        **RECOMMENDATION_CACHE_BACKENDS[RECOMMENDATION_CACHE_BACKEND],
+        'TIMEOUT': RECOMMENDATION_CACHE_TIMEOUT,
+        'KEY_PREFIX': 'optichoice',
+    },
+}
+
+
+
 # Email Backend Configuration
 EMAIL_BACKEND = get_env('EMAIL_BACKEND', 'django.core.mail.backends.smtp.EmailBackend')
 EMAIL_HOST = get_env('EMAIL_HOST', 'smtp.gmail.com')
@@ -14,3 +14,28 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'OPC.settings')
 
 application = get_wsgi_application()
+
+from django.conf import settings
+from movies.ai_models.threads import configure_intra_op_threads, intra_op_threads
+
+# Cap the threads of each model call before the models are loaded, so
+# concurrent request threads share the cores instead of oversubscribing them
+configure_intra_op_threads(intra_op_threads(
+    settings.RECOMMENDER_INTRA_OP_THREADS,
+    settings.RECOMMENDER_WORKERS,
+    settings.RECOMMENDER_REQUEST_THREADS,
+))
+
+# Load the recommender models up front when warm-up is enabled, so the first
+# requests don't pay for it. gunicorn imports this module in every worker,
+# after the fork, unless GUNICORN_PRELOAD is set.
+if settings.RECOMMENDER_WARMUP:
+    from movies.ai_models.model_loader import registry
+
+    registry.warm_up(settings.RECOMMENDER_WARMUP_MODELS or None)
+
+    # The autocomplete indexes query the database; with GUNICORN_PRELOAD,
+    # don't hand the connection to forked workers
+    from django.db import connections
+
+    connections.close_all()
@@ -1,40 +1,98 @@
 # recommendation_service.py
 import os
+import joblib
 from django.conf import settings
 
-# Try to import the required libraries, fallback to dummy implementation if not available
-try:
-    import joblib
-    import torch
-    from sentence_transformers import SentenceTransformer, util
-    DEPENDENCIES_AVAILABLE = True
-except ImportError:
-    DEPENDENCIES_AVAILABLE = False
+from movies.ai_models.model_loader import registry
+from movies.ai_models.neighbour_pool import make_rng
+from movies.ai_models.artifacts import export_arrays, load_or
+from movies.ai_models.result_cache import cached_pools
+from movies.ai_models.text_encoder import encode_text
+from movies.ai_models.title_index import TitleIndex
+from movies.ai_models.vector_index import load_vector_index, normalize_rows
 
 EMB_PATH = os.path.join(settings.BASE_DIR, 'books', 'joblibs', 'Embeddings')
 
-# Initialize variables
-model = None
-books = None
-book_embeddings = None
+TITLE_COLUMNS = ['title', 'Title', 'book_title', 'Book_Title']
 
-if DEPENDENCIES_AVAILABLE:
-    try:
-        # Load model and data
-        model = SentenceTransformer('all-MiniLM-L6-v2')
-        books = joblib.load(os.path.join(EMB_PATH, 'books_emb.pkl'))
-        book_embeddings = torch.load(os.path.join(EMB_PATH, 'books_embeddings.pt'), map_location=torch.device('cpu'))
-        book_embeddings = torch.nn.functional.normalize(book_embeddings, p=2, dim=1)
-    except Exception as e:
-        print(f"Warning: Could not load embeddings data: {e}")
-        DEPENDENCIES_AVAILABLE = False
 
-def recommend_books_embeddings(book_titles, top_k=10):
+def _find_column(df, candidates):
+    for col in candidates:
+        if col in df.columns:
+            return col
+    return None
+
+
+def _load_vectors():
+    # torch is only imported when the embeddings have not been exported as
+    # .npy; if it is missing the recommender falls back to dummy data
+    import torch
+
+    book_embeddings = torch.load(os.path.join(EMB_PATH, 'books_embeddings.pt'), map_location=torch.device('cpu'))
+    return normalize_rows(book_embeddings.numpy())
+
+
+def catalog_vectors():
+    """The normalized catalog embeddings (memory-mapped when exported)."""
+    return load_or(EMB_PATH, 'vectors', _load_vectors)
+
+
+def _load():
+    books = joblib.load(os.path.join(EMB_PATH, 'books_emb.pkl'))
+    vectors = catalog_vectors()
+
+    # Use the index built by `manage.py build_vector_index books` when there is one
+    index = load_vector_index(EMB_PATH, vectors)
+
+    # Try different column names for title
+    title_column = _find_column(books, TITLE_COLUMNS)
+
+    return {
+        'books': books,
+        'title_column': title_column,
+        'title_index': TitleIndex(books[title_column]) if title_column else None,
+        'vectors': vectors,
+        'index': index,
+    }
+
+
+# Model files are loaded on first use (or by the warm-up hook), not at import
+embeddings_model = registry.register('books.embeddings', _load, artifacts=[EMB_PATH])
+
+
+def export_mmap_arrays():
+    """Export the large arrays as memory-mapped .npy files (see artifacts.py)."""
+    return export_arrays(embeddings_model, EMB_PATH, ['vectors'])
+
+
+def _recommend_from_ids(state, ids, top_k, exclude_rows=()):
+    """
+    Return the first top_k catalog titles of a best-first list of rows.
+    """
+    books = state['books']
+
+    recommendations = []
+    for idx_int in ids.tolist():
+        # Skip the input book itself (and padding from approximate indexes)
+        if idx_int < 0 or idx_int in exclude_rows:
+            continue
+
+        recommendations.append(books.iloc[idx_int][state['title_column']])
+
+        # Stop when we have enough recommendations
+        if len(recommendations) >= top_k:
+            break
+
+    return recommendations
+
+
+def recommend_books_embeddings(book_titles, top_k=10, seed=None):
     """
     Recommend books using embeddings for multiple input titles
     Args:
         book_titles: List of book titles
         top_k: Number of recommendations per book
+        seed: int or numpy Generator making the random selection reproducible
     Returns:
         Dictionary with input titles as keys and recommendation lists as values
     """
@@ -43,8 +101,11 @@ def recommend_books_embeddings(book_titles, top_k=10):
     
     results = {}
     
+    rng = make_rng(seed)
+
     # Check if dependencies and data are available
-    if not DEPENDENCIES_AVAILABLE or model is None or books is None or book_embeddings is None:
+    state = embeddings_model.get()
+    if state is None:
         # Return dummy data for development/testing
         dummy_books = [
             "The Great Gatsby",
@@ -61,74 +122,87 @@ def recommend_books_embeddings(book_titles, top_k=10):
         
         for title in book_titles:
             # Return a subset of dummy books for each input
-            import random
-            selected_books = random.sample(dummy_books, min(top_k, len(dummy_books)))
+            selected_books = rng.choice(dummy_books, size=min(top_k, len(dummy_books)), replace=False).tolist()
             results[title] = selected_books
         
         return results
     
     # Original implementation for when dependencies are available
+    title_column = state['title_column']
+    title_index = state['title_index']
+    vectors = state['vectors']
+
+    book_titles = [title.strip() for title in book_titles]
+    matching_rows = {}
+    if title_column is not None:
+        matching_rows = {title: title_index.candidates(title) for title in book_titles}
+    found = [title for title in book_titles if matching_rows.get(title)]
+
+    # Catalog books are compared through their stored embedding rows, so no
+    # sentence transformer forward pass runs here; all input books are
+    # searched in one batched query
+    def search_pools(input_titles):
+        search_k = min(top_k + max(len(matching_rows[title]) for title in input_titles), len(state['books']))
+        ids, _ = state['index'].search(vectors[[title_index.resolve(title) for title in input_titles]], search_k)
+        return dict(zip(input_titles, ids))
+
+    pools = {}
+    search_error = None
+    if found:
+        try:
+            pools = cached_pools(embeddings_model, found, top_k, search_pools)
+        except Exception as e:
+            search_error = e
+
     for title in book_titles:
-        title = title.strip()
-        
-        # Try different column names for title
-        title_column = None
-        for col in ['title', 'Title', 'book_title', 'Book_Title']:
-            if col in books.columns:
-                title_column = col
-                break
-        
         if title_column is None:
             results[title] = [f"No title column found in books data for '{title}'."]
             continue
-            
-        idx = books[books[title_column].str.lower() == title.lower()].index
-        
-        if len(idx) == 0:
+
+        if not matching_rows[title]:
             results[title] = [f"Book '{title}' not found in database."]
             continue
-        
+
         try:
-            # Get the book description for embedding
-            description_column = None
-            for col in ['description', 'Description', 'summary', 'Summary']:
-                if col in books.columns:
-                    description_column = col
-                    break
-            
-            if description_column and description_column in books.columns:
-                book_description = books.loc[idx[0], description_column]
-            else:
-                book_description = None
-                
-            if not book_description or str(book_description).lower() == 'nan':
-                # Fallback to title if no description
-                book_description = title
-            
-            query_embedding = model.encode(book_description, convert_to_tensor=True)
-            query_embedding = torch.nn.functional.normalize(query_embedding, p=2, dim=0)
-
-            scores = util.pytorch_cos_sim(query_embedding, book_embeddings)[0]
-            top_results = torch.topk(scores, k=top_k + 1)
-
-            recommendations = []
-            for i, score in zip(top_results[1], top_results[0]):
-                idx_int = i.item()
-                recommended_title = books.iloc[idx_int][title_column]
-                
-                # Skip the input book itself
-                if recommended_title.lower() == title.lower():
-                    continue
-                    
-                recommendations.append(recommended_title)
-                
-                # Stop when we have enough recommendations
-                if len(recommendations) >= top_k:
-                    break
-            
-            results[title] = recommendations
-            
+            if search_error is not None:
+                raise search_error
+            results[title] = _recommend_from_ids(state, pools[title], top_k, exclude_rows=matching_rows[title])
+
         except Exception as e:
             results[title] = [f"Error processing '{title}': {str(e)}"]
     
     return results
+
+
+def recommend_books_by_text(query, top_k=10, seed=None):
+    """
+    Recommend books for a free-text description using embeddings.
+
+    This is the only path that needs the sentence transformer; it is loaded
+    on the first such query.
+
+    Args:
+        query: Free-text description of the kind of book wanted
+        top_k: Number of recommendations
+        seed: int or numpy Generator making the random selection reproducible
+    Returns:
+        list: Recommended book titles, or a message string when unavailable
+    """
+    state = embeddings_model.get()
+    if state is None or state['title_column'] is None:
+        return "Model data not available"
+
+    try:
+        query_embedding = encode_text(query)
+        if query_embedding is None:
+            return "Text encoder not available"
+        # Randomly pick from 3x more results than requested, or all available
+        search_k = min(top_k * 3, len(state['books']))
+        ids, _ = state['index'].search(query_embedding, search_k)
+        pool = _recommend_from_ids(state, ids[0], search_k)
+        if len(pool) > top_k:
+            picked = make_rng(seed).choice(len(pool), size=top_k, replace=False)
+            pool = [pool[i] for i in picked]
+        return pool
+    except Exception as e:
+        return f"Error processing '{query}': {str(e)}"
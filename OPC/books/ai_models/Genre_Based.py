@@ -1,41 +1,88 @@
 import joblib
+import logging
 import os
 import numpy as np
 from django.conf import settings
-from sklearn.metrics.pairwise import cosine_similarity
-import random
+
+from movies.ai_models.model_loader import registry
+from movies.ai_models.neighbour_pool import make_rng
+
+logger = logging.getLogger(__name__)
 
 # Define the base directory for joblib files
 GENRE_BASED_PATH = os.path.join(settings.BASE_DIR, 'books', 'joblibs', 'Genre_knn')
 
-try:
-    # Load data
+# Candidate names of the books_df column holding the categories
+GENRE_COLUMNS = ['Category', 'categories', 'genre']
+
+# Row ids of other selected genres are cached as they are requested, up to this many
+MAX_CACHED_GENRES = 1024
+
+
+def _load():
     books_df = joblib.load(os.path.join(GENRE_BASED_PATH, 'books_df.joblib'))
-    category_encoder = joblib.load(os.path.join(GENRE_BASED_PATH, 'category_encoder.joblib'))
-    category_knn_sparse = joblib.load(os.path.join(GENRE_BASED_PATH, 'category_knn_sparse.joblib'))
-    
-    # Create title to index mapping
-    title_to_index = {title: idx for idx, title in enumerate(books_df['Title'])}
-    book_index_to_title = {idx: title for idx, title in enumerate(books_df['Title'])}
-    
-    DATA_LOADED = True
-except Exception as e:
-    print(f"Warning: Could not load Genre-Based data: {e}")
-    DATA_LOADED = False
+    genre_column = next((col for col in GENRE_COLUMNS if col in books_df.columns), None)
+
+    # Posting lists: lowercased category string -> row ids of the books that have it
+    category_rows = {}
+    if genre_column:
+        for row, book_categories in enumerate(books_df[genre_column]):
+            # Handle the case where categories is a list or string
+            if isinstance(book_categories, list):
+                book_genres_str = ' '.join(book_categories).lower()
+            else:
+                book_genres_str = str(book_categories).lower()
+            category_rows.setdefault(book_genres_str, []).append(row)
+
+    return {
+        'titles': books_df['Title'].to_numpy(dtype=object),
+        'genre_column': genre_column,
+        'category_rows': {category: np.array(rows, dtype=np.int32) for category, rows in category_rows.items()},
+        'genre_rows': {},
+    }
 
 
-def recommend_books_by_genre_selection(selected_genres, number_of_results=10):
+# Model files are loaded on first use (or by the warm-up hook), not at import
+genre_based_model = registry.register('books.genre_based', _load, artifacts=[GENRE_BASED_PATH])
+
+
+def _genre_rows(state, genre):
+    """
+    Row ids of the books whose category string contains the (lowercased)
+    genre, from the union of the matching categories' posting lists.
+    """
+    genre_rows = state['genre_rows']
+    rows = genre_rows.get(genre)
+    if rows is None:
+        postings = [rows for category, rows in state['category_rows'].items() if genre in category]
+        rows = np.concatenate(postings) if postings else np.empty(0, dtype=np.int32)
+        if len(genre_rows) < MAX_CACHED_GENRES:
+            genre_rows[genre] = rows
+    return rows
+
+
+def _sample_titles(titles, k, rng, rows=None):
+    """Randomly pick k titles from the given rows (all rows when None)."""
+    if rows is None:
+        return titles[rng.choice(len(titles), size=k, replace=False)].tolist()
+    return titles[rng.choice(rows, size=k, replace=False)].tolist()
+
+
+def recommend_books_by_genre_selection(selected_genres, number_of_results=10, seed=None):
     """
     Generate book recommendations based on selected genres.
     
     Args:
         selected_genres (list): List of genre names selected by user.
         number_of_results (int): Number of recommendations to return.
+        seed (int or numpy Generator): Makes the random selection reproducible.
     
     Returns:
         list: List of recommended book titles.
     """
-    if not DATA_LOADED:
+    rng = make_rng(seed)
+    state = genre_based_model.get()
+    if state is None:
         # Return dummy data when models are not available
         dummy_books = [
             "The Great Gatsby",
@@ -55,62 +102,53 @@ def recommend_books_by_genre_selection(selected_genres, number_of_results=10):
             "The Picture of Dorian Gray"
         ]
         
-        return random.sample(dummy_books, min(number_of_results, len(dummy_books)))
+        return rng.choice(dummy_books, size=min(number_of_results, len(dummy_books)), replace=False).tolist()
     
+    titles = state['titles']
+
     try:
-        # Convert genre names to lowercase for better matching
-        selected_genres_lower = [genre.lower() for genre in selected_genres]
-        
-        # Find books that match the selected genres
-        matching_books = []
-        
-        # Check if books_df has a 'genres' or 'categories' column
-        if 'Category' in books_df.columns:
-            genre_column = 'Category'
-        elif 'categories' in books_df.columns:
-            genre_column = 'categories'
-        elif 'genre' in books_df.columns:
-            genre_column = 'genre'
-        else:
+        if state['genre_column'] is None:
             # If no genre column found, fall back to random selection from all books
-            all_titles = books_df['Title'].tolist()
-            return random.sample(all_titles, min(number_of_results, len(all_titles)))
-        
-        # Filter books based on genres
-        for idx, row in books_df.iterrows():
-            book_categories = row[genre_column]
-            # Handle the case where categories is a list or string
-            if isinstance(book_categories, list):
-                book_genres_str = ' '.join(book_categories).lower()
-            else:
-                book_genres_str = str(book_categories).lower()
-            
-            # Check if any selected genre is in the book's genres
-            if any(genre in book_genres_str for genre in selected_genres_lower):
-                matching_books.append(row['Title'])  # Note: Column is 'Title' not 'title'
+            return _sample_titles(titles, min(number_of_results, len(titles)), rng)
+
+        # Find books that match the selected genres (lowercased for better matching)
+        postings = [_genre_rows(state, genre.lower()) for genre in selected_genres]
+        if len(postings) == 1:
+            matching_rows = postings[0]
+        else:
+            # Union of the posting lists
+            matched = np.zeros(len(titles), dtype=bool)
+            for rows in postings:
+                matched[rows] = True
+            matching_rows = np.flatnonzero(matched)
         
         # If we found matching books, randomly select from them
-        if matching_books:
-            if len(matching_books) >= number_of_results:
-                return random.sample(matching_books, number_of_results)
+        if len(matching_rows):
+            if len(matching_rows) >= number_of_results:
+                return _sample_titles(titles, number_of_results, rng, matching_rows)
             else:
+                matching_books = titles[matching_rows].tolist()
                 # If not enough matching books, add more from general collection
                 remaining_needed = number_of_results - len(matching_books)
-                all_titles = books_df['Title'].tolist()
-                # Remove already selected books to avoid duplicates
-                remaining_books = [title for title in all_titles if title not in matching_books]
-                if remaining_books:
-                    additional_books = random.sample(remaining_books, min(remaining_needed, len(remaining_books)))
-                    return matching_books + additional_books
-                else:
-                    return matching_books
+                # Draw random rows outside the matched set, skipping titles
+                # already selected to avoid duplicates
+                matched_titles = set(matching_books)
+                seen_rows = set(matching_rows.tolist())
+                additional_books = []
+                while len(additional_books) < remaining_needed and len(seen_rows) < len(titles):
+                    row = int(rng.integers(len(titles)))
+                    if row in seen_rows:
+                        continue
+                    seen_rows.add(row)
+                    if titles[row] not in matched_titles:
+                        additional_books.append(titles[row])
+                return matching_books + additional_books
         else:
             # No genre matches found, return random books
-            all_titles = books_df['Title'].tolist()
-            return random.sample(all_titles, min(number_of_results, len(all_titles)))
+            return _sample_titles(titles, min(number_of_results, len(titles)), rng)
             
     except Exception as e:
-        print(f"Error in genre-based recommendation: {e}")
+        logger.error(f"Error in genre-based recommendation: {e}")
         # Fallback to dummy books
         dummy_books = [
             "The Great Gatsby",
@@ -124,4 +162,4 @@ def recommend_books_by_genre_selection(selected_genres, number_of_results=10):
             "Dune",
             "Fahrenheit 451"
         ]
-        return random.sample(dummy_books, min(number_of_results, len(dummy_books)))
\ No newline at end of file
+        return rng.choice(dummy_books, size=min(number_of_results, len(dummy_books)), replace=False).tolist()
\ No newline at end of file
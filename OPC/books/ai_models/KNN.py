@@ -1,48 +1,62 @@
 # knn_recommendation_service.py
+import logging
 import os
 from django.conf import settings
-import random
 
-# Try to import required libraries with error handling
-try:
-    import joblib
-    JOBLIB_AVAILABLE = True
-except ImportError:
-    JOBLIB_AVAILABLE = False
+from movies.ai_models.model_loader import registry
+from movies.ai_models.artifacts import export_arrays, load_or
+from movies.ai_models.neighbour_pool import NeighbourPool, make_rng, titles_by_row_from_index
+from movies.ai_models.sparse_index import POSTINGS_NAME, exported_postings, load_cosine_index
+
+logger = logging.getLogger(__name__)
 
 # Define the base directory for joblib files
 KNN_PATH = os.path.join(settings.BASE_DIR, 'books', 'joblibs', 'KNN-TF')
+MODEL_PATH = os.path.join(KNN_PATH, 'nn_model.joblib')
 
-# Initialize variables
-model = None
-title_to_index = None
-sparse_matrix = None
 
-if JOBLIB_AVAILABLE:
-    try:
-        # Load data
-        model = joblib.load(os.path.join(KNN_PATH, 'nn_model.joblib'))
-        title_to_index = joblib.load(os.path.join(KNN_PATH, 'title_to_index.joblib'))
-        sparse_matrix = joblib.load(os.path.join(KNN_PATH, 'sparse_matrix.joblib'))
-    except Exception as e:
-        print(f"Warning: Could not load KNN data: {e}")
-        model = None
-        title_to_index = None
-        sparse_matrix = None
-
-def recommend_books_knn(book_titles, n=5, top_k=20):
+def _load():
+    import joblib
+
+    title_to_index = joblib.load(os.path.join(KNN_PATH, 'title_to_index.joblib'))
+    sparse_matrix = load_or(KNN_PATH, 'sparse_matrix', lambda: joblib.load(os.path.join(KNN_PATH, 'sparse_matrix.joblib')))
+    # Cosine queries go through the inverted index instead of sklearn's brute force
+    index = load_cosine_index(KNN_PATH, MODEL_PATH, sparse_matrix)
+    return {
+        'index': index,
+        POSTINGS_NAME: exported_postings(index),
+        'title_to_index': title_to_index,
+        'sparse_matrix': sparse_matrix,
+        # Titles by row, built once instead of reversing title_to_index per request
+        'pool': NeighbourPool(index, sparse_matrix, titles_by_row_from_index(title_to_index, sparse_matrix.shape[0])),
+    }
+
+
+# Model files are loaded on first use (or by the warm-up hook), not at import
+knn_model = registry.register('books.knn', _load, artifacts=[KNN_PATH])
+
+
+def export_mmap_arrays():
+    """Export the large arrays as memory-mapped .npy files (see artifacts.py)."""
+    return export_arrays(knn_model, KNN_PATH, ['sparse_matrix', POSTINGS_NAME])
+
+
+def recommend_books_knn(book_titles, n=5, top_k=20, seed=None):
     """
     Recommend N random books selected from the top K most similar books.
     - n: number of final recommendations
     - top_k: number of top similar books to consider for random sampling
+    - seed: makes the random selection reproducible
     """
     if isinstance(book_titles, str):
         book_titles = [book_titles]
     
     results = {}
+    rng = make_rng(seed)
 
     # Check if data is available
-    if not JOBLIB_AVAILABLE or model is None or title_to_index is None or sparse_matrix is None:
+    state = knn_model.get()
+    if state is None:
         # Return dummy data when models are not available
         dummy_books = [
             "The Great Gatsby",
@@ -58,40 +72,38 @@ def recommend_books_knn(book_titles, n=5, top_k=20):
         ]
         
         for title in book_titles:
-            selected_books = random.sample(dummy_books, min(n, len(dummy_books)))
+            selected_books = rng.choice(dummy_books, size=min(n, len(dummy_books)), replace=False).tolist()
             results[title] = selected_books
         
         return results
 
+    title_to_index = state['title_to_index']
+    pool = state['pool']
+
+    # Use n as target recommendations, get more candidates for randomization
+    target_recommendations = n
+    candidate_pool = max(target_recommendations * 3, 15)  # Get 3x more candidates or at least 15
+
+    # Get the candidates of all input books from the pool cache, or in one kneighbors call
+    rows = {title: title_to_index[title] for title in book_titles if title in title_to_index}
+    pools = {}
+    try:
+        pools = pool.pools(rows, candidate_pool, handle=knn_model)
+    except (KeyError, IndexError):
+        # Rows missing from the catalog matrix: their titles fall back to
+        # dummy books below
+        pass
+    except Exception:
+        logger.exception("Error querying book KNN neighbours")
+
     for title in book_titles:
         if title not in title_to_index:
             results[title] = "Book not found"
             continue
 
         try:
-            idx = title_to_index[title]
-
-            # Use n as target recommendations, get more candidates for randomization
-            target_recommendations = n
-            candidate_pool = max(target_recommendations * 3, 15)  # Get 3x more candidates or at least 15
-
-            # Get top K similar (excluding self)
-            distances, indices = model.kneighbors(sparse_matrix[idx], n_neighbors=candidate_pool + 1)
-            similar_indices = [i for i in indices.flatten() if i != idx]
-
-            # Create reverse mapping
-            index_to_title = {v: k for k, v in title_to_index.items()}
-            
-            # Map to titles
-            similar_titles = [index_to_title[i] for i in similar_indices]
-
             # Randomly select N from the candidates for variety in regeneration
-            if len(similar_titles) >= target_recommendations:
-                recommended = random.sample(similar_titles, target_recommendations)
-            else:
-                recommended = similar_titles  # fallback if not enough results
-
-            results[title] = recommended
+            results[title] = pool.sample(pools[title], target_recommendations, rng)
         
         except Exception as e:
             # Fallback to dummy books if error occurs
@@ -102,6 +114,6 @@ def recommend_books_knn(book_titles, n=5, top_k=20):
                 "Pride and Prejudice",
                 "The Catcher in the Rye",
             ]
-            results[title] = random.sample(dummy_books, min(n, len(dummy_books)))
+            results[title] = rng.choice(dummy_books, size=min(n, len(dummy_books)), replace=False).tolist()
 
     return results
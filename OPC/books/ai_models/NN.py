@@ -5,25 +5,65 @@ import numpy as np
 from django.conf import settings
 from sklearn.metrics.pairwise import cosine_similarity
 
-# Try to import TensorFlow/Keras with error handling
-try:
-    from tensorflow.keras.models import load_model
-    TENSORFLOW_AVAILABLE = True
-except ImportError:
-    TENSORFLOW_AVAILABLE = False
+from movies.ai_models.model_loader import registry
+from movies.ai_models.neighbour_pool import make_rng
+from movies.ai_models.artifacts import export_arrays, load_or
+from movies.ai_models.result_cache import cached_pools
+from movies.ai_models.title_index import TitleIndex
+from movies.ai_models.vector_index import top_k as top_k_rows
 
 # Paths
 NN_PATH = os.path.join(settings.BASE_DIR, 'books', 'joblibs', 'NN')
 MODEL_PATH = os.path.join(NN_PATH, 'books_nn_model.keras')
 BOOKS_DATA_PATH = os.path.join(NN_PATH, 'books_data.pkl')
 
-def recommend_books_nn(book_titles, top_k=10):
+
+def _load():
+    # TensorFlow is only imported once the model is needed; if it is missing
+    # the recommender falls back to dummy data
+    from tensorflow.keras.models import load_model
+
+    books_data = joblib.load(BOOKS_DATA_PATH)
+
+    # Try different column names for title
+    title_column = None
+    for col in ['title', 'Title', 'book_title', 'Book_Title']:
+        if col in books_data.columns:
+            title_column = col
+            break
+
+    # Features to use for the neural network (excluding non-feature columns)
+    feature_columns = [col for col in books_data.columns
+                       if col not in ['title', 'Title', 'book_title', 'Book_Title', 'authors', 'Authors', 'isbn', 'ISBN']]
+
+    # Only the titles are kept; the features are served from all_features
+    return {
+        'model': load_model(MODEL_PATH),
+        'title_column': title_column,
+        'titles': books_data[title_column].to_numpy(dtype=object) if title_column else None,
+        'title_index': TitleIndex(books_data[title_column]) if title_column else None,
+        # Features for all books in the dataset, computed once instead of per title
+        'all_features': load_or(NN_PATH, 'all_features', lambda: books_data[feature_columns].values.astype('float32')),
+    }
+
+
+# Model files are loaded at most once per worker, on first use or by the warm-up hook
+nn_model = registry.register('books.nn', _load, artifacts=[MODEL_PATH, BOOKS_DATA_PATH])
+
+
+def export_mmap_arrays():
+    """Export the large arrays as memory-mapped .npy files (see artifacts.py)."""
+    return export_arrays(nn_model, NN_PATH, ['all_features'])
+
+
+def recommend_books_nn(book_titles, top_k=10, seed=None):
     """
     Recommend books using a neural network model based on input book titles.
     
     Args:
         book_titles: List of book titles or single book title
         top_k: Number of recommendations to return for each input title
+        seed: int or numpy Generator making the random selection reproducible
     
     Returns:
         Dictionary with input titles as keys and recommendation lists as values
@@ -33,9 +73,12 @@ def recommend_books_nn(book_titles, top_k=10):
     
     results = {}
     
-    # Check if TensorFlow is available
-    if not TENSORFLOW_AVAILABLE:
-        # Return dummy data when TensorFlow is not available
+    rng = make_rng(seed)
+
+    # Check if TensorFlow and the model files are available
+    state = nn_model.get()
+    if state is None:
+        # Return dummy data when TensorFlow or the model files are not available
         dummy_books = [
             "The Great Gatsby",
             "To Kill a Mockingbird", 
@@ -50,61 +93,54 @@ def recommend_books_nn(book_titles, top_k=10):
         ]
         
         for title in book_titles:
-            import random
-            selected_books = random.sample(dummy_books, min(top_k, len(dummy_books)))
+            selected_books = rng.choice(dummy_books, size=min(top_k, len(dummy_books)), replace=False).tolist()
             results[title] = selected_books
         
         return results
     
     try:
-        # Load the pre-trained model and book data
-        model = load_model(MODEL_PATH)
-        books_data = joblib.load(BOOKS_DATA_PATH)
-        
-        # Features to use for the neural network (excluding non-feature columns)
-        feature_columns = [col for col in books_data.columns 
-                          if col not in ['title', 'Title', 'book_title', 'Book_Title', 'authors', 'Authors', 'isbn', 'ISBN']]
-        
+        titles = state['titles']
+        title_column = state['title_column']
+        title_index = state['title_index']
+        all_features = state['all_features']
+
+        # Find the input books
+        input_rows = {}
+        if title_column is not None:
+            input_rows = {title.strip(): title_index.resolve(title.strip()) for title in book_titles}
+        found = {title: row for title, row in input_rows.items() if row is not None}
+
+        def similarity_rows(input_titles):
+            rows = np.fromiter((found[title] for title in input_titles), dtype=np.intp, count=len(input_titles))
+
+            # Cosine similarity between all input books and all books in one pass
+            similarities = cosine_similarity(all_features[rows], all_features)
+
+            # Exclude the input books themselves
+            similarities[np.arange(len(rows)), rows] = -1
+
+            # Get top-k most similar books
+            top_indices, _ = top_k_rows(similarities, top_k)
+            return dict(zip(input_titles, top_indices))
+
+        # Top rows from the pool cache, or one similarity pass for all uncached input books
+        top_rows = cached_pools(nn_model, found, top_k, similarity_rows)
+
         for title in book_titles:
             title = title.strip()
-            
-            # Try different column names for title
-            title_column = None
-            for col in ['title', 'Title', 'book_title', 'Book_Title']:
-                if col in books_data.columns:
-                    title_column = col
-                    break
-            
+
             if title_column is None:
                 results[title] = [f"No title column found in books data for '{title}'."]
                 continue
-            
-            # Find the input book
-            book_match = books_data[books_data[title_column].str.lower() == title.lower()]
-            
-            if book_match.empty:
+
+            if input_rows[title] is None:
                 results[title] = [f"Book '{title}' not found in database."]
                 continue
-                
-            # Get input book features
-            input_features = book_match[feature_columns].values[0].astype('float32')
-            
-            # Get features for all books in the dataset
-            all_features = books_data[feature_columns].values.astype('float32')
-            
-            # Calculate cosine similarity between input book and all books
-            input_features = input_features.reshape(1, -1)
-            similarities = cosine_similarity(input_features, all_features)[0]
-            
-            # Exclude the input book itself
-            input_index = book_match.index[0]
-            similarities[input_index] = -1
-            
-            # Get top-k most similar books
-            top_indices = np.argsort(similarities)[::-1][:top_k]
+
+            top_indices = top_rows[title]
             
             # Extract book titles
-            recommendations = books_data.iloc[top_indices][title_column].tolist()
+            recommendations = titles[top_indices].tolist()
             
             results[title] = recommendations
     
@@ -124,8 +160,7 @@ def recommend_books_nn(book_titles, top_k=10):
         ]
         
         for title in book_titles:
-            import random
-            selected_books = random.sample(dummy_books, min(top_k, len(dummy_books)))
+            selected_books = rng.choice(dummy_books, size=min(top_k, len(dummy_books)), replace=False).tolist()
             results[title] = selected_books
     
     return results
@@ -1,29 +1,57 @@
 import os
 import joblib
+import numpy as np
 from django.conf import settings
-import random
+
+from movies.ai_models.model_loader import registry
+from movies.ai_models.artifacts import export_arrays, load_or
+from movies.ai_models.neighbour_pool import make_rng
+from movies.ai_models.sparse_index import POSTINGS_NAME, exported_postings, load_cosine_index
 
 # Define the base path for BOW models
 BOW_MODEL_PATH = os.path.join(settings.BASE_DIR, 'books', 'joblibs', 'BOW')
+MODEL_PATH = os.path.join(BOW_MODEL_PATH, 'nn_model.joblib')
+
 
-try:
-    # Load joblib files using relative paths
-    tfidf = joblib.load(os.path.join(BOW_MODEL_PATH, 'tfidf_vectorizer.joblib'))
-    model = joblib.load(os.path.join(BOW_MODEL_PATH, 'nn_model.joblib'))
+def _load():
     title_to_index = joblib.load(os.path.join(BOW_MODEL_PATH, 'title_to_index.joblib'))
-    tfidf_matrix = joblib.load(os.path.join(BOW_MODEL_PATH, 'tfidf_matrix.joblib'))
-    DATA_LOADED = True
-except Exception as e:
-    print(f"Warning: Could not load TFIDF data: {e}")
-    DATA_LOADED = False
+    tfidf_matrix = load_or(BOW_MODEL_PATH, 'tfidf_matrix', lambda: joblib.load(os.path.join(BOW_MODEL_PATH, 'tfidf_matrix.joblib')))
+
+    # Reverse lookup built once, so mapping a neighbour row back to its title is an array index
+    index_to_title = np.empty(tfidf_matrix.shape[0], dtype=object)
+    for title, idx in title_to_index.items():
+        # First title wins when several map to the same row, as with the old list scan
+        if index_to_title[idx] is None:
+            index_to_title[idx] = title
+
+    # Cosine queries go through the inverted index instead of sklearn's brute force
+    index = load_cosine_index(BOW_MODEL_PATH, MODEL_PATH, tfidf_matrix)
+    return {
+        'index': index,
+        POSTINGS_NAME: exported_postings(index),
+        'title_to_index': title_to_index,
+        'index_to_title': index_to_title,
+        'tfidf_matrix': tfidf_matrix,
+    }
+
+
+# Model files are loaded on first use (or by the warm-up hook), not at import
+tfidf_model = registry.register('books.tfidf', _load, artifacts=[BOW_MODEL_PATH])
 
-def recommend_books_sparse_list(book_titles, n=5):
+
+def export_mmap_arrays():
+    """Export the large arrays as memory-mapped .npy files (see artifacts.py)."""
+    return export_arrays(tfidf_model, BOW_MODEL_PATH, ['tfidf_matrix', POSTINGS_NAME])
+
+
+def recommend_books_sparse_list(book_titles, n=5, seed=None):
     """
     Recommend books using TF-IDF and sparse matrix similarity.
     
     Args:
         book_titles: List of book titles
         n: Number of recommendations per book
+        seed: int or numpy Generator making the fallback selection reproducible
     
     Returns:
         Dictionary with input titles as keys and recommendation lists as values
@@ -32,9 +60,11 @@ def recommend_books_sparse_list(book_titles, n=5):
         book_titles = [book_titles]
     
     recommendations = {}
+    rng = make_rng(seed)
     
     # Check if data is loaded
-    if not DATA_LOADED:
+    state = tfidf_model.get()
+    if state is None:
         # Return dummy data when models are not available
         dummy_books = [
             "The Great Gatsby",
@@ -50,11 +80,16 @@ def recommend_books_sparse_list(book_titles, n=5):
         ]
         
         for book_title in book_titles:
-            selected_books = random.sample(dummy_books, min(n, len(dummy_books)))
+            selected_books = rng.choice(dummy_books, size=min(n, len(dummy_books)), replace=False).tolist()
             recommendations[book_title] = selected_books
         
         return recommendations
-    
+
+    index = state['index']
+    title_to_index = state['title_to_index']
+    index_to_title = state['index_to_title']
+    tfidf_matrix = state['tfidf_matrix']
+
     for book_title in book_titles:
         if book_title not in title_to_index:
             # Try partial matching
@@ -68,9 +103,8 @@ def recommend_books_sparse_list(book_titles, n=5):
 
         try:
             idx = title_to_index[book_title]
-            distances, indices = model.kneighbors(tfidf_matrix[idx], n_neighbors=n + 1)
-            recommended = [list(title_to_index.keys())[list(title_to_index.values()).index(i)]
-                           for i in indices.flatten() if i != idx]
+            distances, indices = index.kneighbors(tfidf_matrix[idx], n_neighbors=n + 1)
+            recommended = index_to_title[indices[0][indices[0] != idx]].tolist()
             recommendations[book_title] = recommended[:n]
         except Exception as e:
             # Fallback to dummy books if error occurs
@@ -81,6 +115,6 @@ def recommend_books_sparse_list(book_titles, n=5):
                 "Pride and Prejudice",
                 "The Catcher in the Rye",
             ]
-            recommendations[book_title] = random.sample(dummy_books, min(n, len(dummy_books)))
+            recommendations[book_title] = rng.choice(dummy_books, size=min(n, len(dummy_books)), replace=False).tolist()
     
     return recommendations
@@ -0,0 +1,12 @@
+from movies.ai_models.model_loader import registry
+from movies.autocomplete import build_autocomplete
+
+from .models import Book, BookRecommendationHistory
+
+
+def _load():
+    return build_autocomplete(Book, 'title', BookRecommendationHistory)
+
+
+# Built on first use (or by the warm-up hook), rebuilt periodically by complete_titles()
+book_autocomplete = registry.register('books.autocomplete', _load)
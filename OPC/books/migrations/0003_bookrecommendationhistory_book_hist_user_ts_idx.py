@@ -0,0 +1,19 @@
+# Generated by Django 5.2.1 on 2026-10-18 17:27
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0002_alter_bookrecommendationhistory_user'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bookrecommendationhistory',
+            index=models.Index(fields=['user', '-timestamp', '-id'], name='book_hist_user_ts_idx'),
+        ),
+    ]
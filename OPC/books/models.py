@@ -16,6 +16,20 @@ class Book(models.Model):
         return self.title
     
 
+class BookSearchIndex(models.Model):
+    """
+    The SQLite FTS5 table over Book (created by a migration, not by
+    Django), joined by search to rank matches with bm25.
+    """
+    book = models.OneToOneField(
+        Book, on_delete=models.DO_NOTHING, primary_key=True, db_column='rowid', related_name='search_index'
+    )
+
+    class Meta:
+        managed = False
+        db_table = 'books_book_fts'
+
+
 class BookRecommendationHistory(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='book_recommendation_history')
     input_title = models.CharField(max_length=255)
@@ -23,5 +37,11 @@ class BookRecommendationHistory(models.Model):
     model_used = models.CharField(max_length=100)
     timestamp = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Serves the per-user history list, newest first, and its keyset pagination
+            models.Index(fields=['user', '-timestamp', '-id'], name='book_hist_user_ts_idx'),
+        ]
+
     def __str__(self):
         return f"{self.user} | {self.input_title} -> {len(self.recommended_titles)} recs"
\ No newline at end of file
@@ -1,6 +1,9 @@
 from books.models import Book , BookRecommendationHistory 
 from rest_framework import serializers 
 
+# Upper bound on the titles accepted by one batch recommendation request
+MAX_BATCH_TITLES = 500
+
 
 
 
@@ -36,8 +39,50 @@ class BookRecommendationRequestSerializer(serializers.Serializer):
         default=False,
         help_text="Whether this request is a regeneration"
     )
+    seed = serializers.IntegerField(
+        required=False,
+        allow_null=True,
+        default=None,
+        min_value=0,
+        help_text="Seed making the random selection reproducible; random when omitted"
+    )
 
 
+class BookBatchRecommendationRequestSerializer(serializers.Serializer):
+    book_titles = serializers.ListField(
+        child=serializers.CharField(),
+        allow_empty=False,
+        max_length=MAX_BATCH_TITLES,
+        help_text="Input book titles"
+    )
+    models_used = serializers.ListField(
+        child=serializers.ChoiceField(choices=BookRecommendationRequestSerializer.Model_Choices),
+        allow_empty=False,
+        help_text="Recommendation models to run for every input title"
+    )
+    num_recommendations = serializers.IntegerField(
+        min_value=1,
+        default=5,
+        help_text="Number of recommendations to return per title and model"
+    )
+    save_history = serializers.BooleanField(
+        required=False,
+        default=False,
+        help_text="Whether to save these recommendations to history"
+    )
+    regenerate = serializers.BooleanField(
+        required=False,
+        default=False,
+        help_text="Whether this request is a regeneration"
+    )
+    seed = serializers.IntegerField(
+        required=False,
+        allow_null=True,
+        default=None,
+        min_value=0,
+        help_text="Seed making the random selection reproducible; random when omitted"
+    )
+
 
 class BookRecommendationHistorySerializer(serializers.ModelSerializer): 
     class Meta: 
@@ -77,3 +122,10 @@ class BookRecommendationUserGenreSerializer(serializers.Serializer):
             default=False,
             help_text="Whether this request is a regeneration"
         )
+    seed = serializers.IntegerField(
+            required=False,
+            allow_null=True,
+            default=None,
+            min_value=0,
+            help_text="Seed making the random selection reproducible; random when omitted"
+        )
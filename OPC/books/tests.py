@@ -1,3 +1,111 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+import pandas as pd
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from movies.ai_models.vector_index import ExactIndex, normalize_rows
+
+from .ai_models import KNN, Embeddings
+from .models import Book
+
+
+class BookSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('reader', password='secret')
+        Book.objects.bulk_create([
+            Book(book_id=1, title='Dune', authors='Frank Herbert', category='Fiction'),
+            Book(book_id=2, title='Frankenstein', authors='Mary Shelley', category='Fiction'),
+            Book(book_id=3, title='Herbert Hoover', authors='William Leuchtenburg', category='Biography'),
+        ])
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def search(self, query):
+        response = self.client.get(reverse('books:book_search'), {'search': query})
+        self.assertEqual(response.status_code, 200)
+        return [book['title'] for book in response.data['results']]
+
+    def test_title_matches_rank_above_author_matches(self):
+        self.assertEqual(self.search('herbert'), ['Herbert Hoover', 'Dune'])
+        self.assertEqual(self.search('fran'), ['Frankenstein', 'Dune'])
+
+    def test_every_term_must_match(self):
+        self.assertEqual(self.search('frank herb'), ['Dune'])
+        self.assertEqual(self.search('frank shelley'), ['Frankenstein'])
+
+
+class BookTextRecommendationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('reader', password='secret')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        vectors = normalize_rows(np.eye(4, 8) + 0.1)
+        state = {
+            'books': pd.DataFrame({'Title': ['Dune', 'Emma', 'Ulysses', 'Beloved']}),
+            'title_column': 'Title',
+            'vectors': vectors,
+            'index': ExactIndex(vectors),
+        }
+        patcher = mock.patch.object(Embeddings.embeddings_model, 'get', return_value=state)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(Embeddings, 'encode_text', return_value=vectors[0])
+        self.encode_text = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def recommend(self, data):
+        return self.client.post(reverse('books:book_recommendation_text'), data, format='json')
+
+    def test_recommends_from_the_encoded_query(self):
+        response = self.recommend({'query': 'desert planet', 'num_recommendations': 4})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['query'], 'desert planet')
+        self.assertCountEqual(response.data['recommendations'], ['Dune', 'Emma', 'Ulysses', 'Beloved'])
+        self.encode_text.assert_called_once_with('desert planet')
+
+    def test_picks_from_the_best_matches(self):
+        response = self.recommend({'query': 'desert planet', 'num_recommendations': 3})
+        self.assertEqual(len(response.data['recommendations']), 3)
+        self.assertLessEqual(set(response.data['recommendations']), {'Dune', 'Emma', 'Ulysses', 'Beloved'})
+
+    def test_seed_makes_the_selection_reproducible(self):
+        picks = {tuple(Embeddings.recommend_books_by_text('desert planet', 1, seed=5)) for _ in range(5)}
+        self.assertEqual(len(picks), 1)
+        # Unseeded calls sample the pool of the 3 best matches
+        picks = {tuple(Embeddings.recommend_books_by_text('desert planet', 1)) for _ in range(50)}
+        self.assertGreater(len(picks), 1)
+        self.assertLessEqual(picks, {('Dune',), ('Emma',), ('Ulysses',)})
+
+    def test_invalid_request(self):
+        self.assertEqual(self.recommend({'query': ''}).status_code, 400)
+        self.encode_text.assert_not_called()
+
+
+class BookKNNTests(SimpleTestCase):
+    def recommend_with_failing_pools(self, error):
+        pool = mock.Mock()
+        pool.pools.side_effect = error
+        state = {'title_to_index': {'Dune': 0}, 'pool': pool}
+        with mock.patch.object(KNN.knn_model, 'get', return_value=state):
+            return KNN.recommend_books_knn(['Dune'], n=3, seed=1)
+
+    def test_missing_rows_fall_back_quietly(self):
+        with self.assertNoLogs('books.ai_models.KNN'):
+            results = self.recommend_with_failing_pools(IndexError('index 0 is out of bounds'))
+        self.assertEqual(len(results['Dune']), 3)
+
+    def test_unexpected_errors_are_logged(self):
+        with self.assertLogs('books.ai_models.KNN', level='ERROR') as logs:
+            results = self.recommend_with_failing_pools(RuntimeError('database is locked'))
+        self.assertIn('database is locked', logs.output[0])
+        self.assertEqual(len(results['Dune']), 3)
@@ -11,10 +11,16 @@ urlpatterns = [
      
     # API endpoints
     path('api/search/', views.BookSearchView.as_view(), name='book_search'),
+    path('api/autocomplete/', views.BookAutocompleteView.as_view(), name='book_autocomplete'),
     path('api/recommend/', views.BookRecommendationView.as_view(), name='book_recommendation'),
+    path('api/recommend-batch/', views.BookBatchRecommendationView.as_view(), name='book_recommendation_batch'),
+    path('api/recommend-text/', views.BookTextRecommendationView.as_view(), name='book_recommendation_text'),
     path('api/save-recommendations/', views.SaveSelectedRecommendations.as_view(), name='save_recommendations'),
     path('api/history/', views.BookHistoryView.as_view(), name='book_history'),
     path('api/history/delete-single/', views.BookHistoryDeleteView.as_view(), name='book_history_delete_single'),
     path('api/history/delete-bulk/', views.BookHistoryBulkClearView.as_view(), name='book_history_bulk_delete'),
     path('api/genre-recommendations/', views.GenreBasedRecommendationView.as_view(), name='genre_recommendations'),
+    path('api/async/recommend/', views.AsyncBookRecommendationView.as_view(), name='book_recommendation_async'),
+    path('api/async/recommend-batch/', views.AsyncBookBatchRecommendationView.as_view(), name='book_recommendation_batch_async'),
+    path('api/async/genre-recommendations/', views.AsyncGenreBasedRecommendationView.as_view(), name='genre_recommendations_async'),
 ]
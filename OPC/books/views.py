@@ -9,18 +9,34 @@ from django.contrib.auth.decorators import login_required
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from django.db import models
+import asyncio
 from rest_framework.permissions import IsAuthenticated 
 from rest_framework import filters
 
-from .serializers import BookRecommendationRequestSerializer, BookRecommendationHistorySerializer, BookSerializer, BookRecommendationUserGenreSerializer
+from .serializers import BookRecommendationRequestSerializer, BookBatchRecommendationRequestSerializer, BookRecommendationHistorySerializer, BookSerializer, BookRecommendationUserGenreSerializer
 from .models import Book, BookRecommendationHistory 
-from .ai_models.Embeddings import recommend_books_embeddings
+from movies.history import awrite_history, history_entries, history_user, insert_history, write_history
+from movies.async_api import AsyncAPIView, run_inference
+from movies.pagination import ApproximateCountMixin, HistoryPagination
+from movies.search import FullTextSearchFilter
+from movies.autocomplete import complete_titles
+from movies.serializers import TextRecommendationRequestSerializer, TitleAutocompleteQuerySerializer
+from .autocomplete import book_autocomplete
+from .ai_models.Embeddings import recommend_books_by_text, recommend_books_embeddings
 from .ai_models.KNN import recommend_books_knn
 from .ai_models.NN import recommend_books_nn
 from .ai_models.Genre_Based import recommend_books_by_genre_selection
 
 
-class CustomLimitOffsetPagination(LimitOffsetPagination):
+# Title-based recommenders by model_used; each takes a list of titles, a count and an optional seed
+BOOK_RECOMMENDERS = {
+    'Embeddings': recommend_books_embeddings,
+    'knn': recommend_books_knn,
+    'NN': recommend_books_nn,
+}
+
+
+class CustomLimitOffsetPagination(ApproximateCountMixin, LimitOffsetPagination):
     """
     Custom offset pagination for search results with enhanced response format
     """
@@ -32,6 +48,7 @@ class CustomLimitOffsetPagination(LimitOffsetPagination):
     def get_paginated_response(self, data):
         return Response({
             'count': self.count,
+            'count_is_estimate': self.count_is_estimate,
             'next': self.get_next_link(),
             'previous': self.get_previous_link(),
             'total_pages': (self.count + self.limit - 1) // self.limit if self.limit else 1,
@@ -47,7 +64,7 @@ class BookSearchView(generics.ListAPIView):
     permission_classes = [IsAuthenticated]
     serializer_class = BookSerializer
     pagination_class = CustomLimitOffsetPagination
-    filter_backends = [filters.SearchFilter]
+    filter_backends = [FullTextSearchFilter]
     search_fields = ['title', 'authors']
     
     def get_queryset(self):
@@ -56,6 +73,23 @@ class BookSearchView(generics.ListAPIView):
         return queryset
     
 
+class BookAutocompleteView(APIView):
+    """
+    Title suggestions for the search box, served from the in-memory
+    autocomplete index without touching the database.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        serializer = TitleAutocompleteQuerySerializer(data=request.query_params)
+        if serializer.is_valid():
+            query = serializer.validated_data['q']
+            suggestions = complete_titles(book_autocomplete, query, serializer.validated_data['limit'])
+            return Response({"query": query, "results": suggestions}, status=status.HTTP_200_OK)
+
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
 class BookRecommendationView(APIView):
     permission_classes = [IsAuthenticated]
     
@@ -67,32 +101,20 @@ class BookRecommendationView(APIView):
             model_used = serializer.validated_data['model_used']
             save_history = serializer.validated_data.get('save_history', False)
             regenerate = serializer.validated_data.get('regenerate', False)
+            seed = serializer.validated_data.get('seed')
         
             book_titles = [book_title]
         
-            if model_used == 'Embeddings':
-                results = recommend_books_embeddings(book_titles, num_recommendations)
-            elif model_used == 'knn':
-                results = recommend_books_knn(book_titles, num_recommendations)
-            elif model_used == 'NN':
-                results = recommend_books_nn(book_titles, num_recommendations)
-
-
-            else:
+            recommend = BOOK_RECOMMENDERS.get(model_used)
+            if recommend is None:
                 return Response(
                     {"error": f"Model '{model_used}' is not supported."},
                     status=status.HTTP_400_BAD_REQUEST
                 )
+            results = recommend(book_titles, num_recommendations, seed=seed)
             
             if save_history:
-                for input_title, recommended in results.items():
-                    if isinstance(recommended, list):
-                        BookRecommendationHistory.objects.create(
-                            user=request.user if request.user.is_authenticated else None,
-                            input_title=input_title,
-                            recommended_titles=recommended,
-                            model_used=model_used
-                        )
+                write_history(history_entries(BookRecommendationHistory, history_user(request), model_used, results))
 
             return Response({
                 "recommendations": results,
@@ -105,6 +127,162 @@ class BookRecommendationView(APIView):
     
         
 
+class BookTextRecommendationView(APIView):
+    """
+    Recommend books for a free-text description with the Embeddings model.
+    The description is encoded by the sentence transformer, loaded on the
+    first such request.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = TextRecommendationRequestSerializer(data=request.data)
+        if serializer.is_valid():
+            query = serializer.validated_data['query']
+            num_recommendations = serializer.validated_data['num_recommendations']
+            seed = serializer.validated_data.get('seed')
+
+            return Response({
+                "recommendations": recommend_books_by_text(query, num_recommendations, seed=seed),
+                "query": query
+            }, status=status.HTTP_200_OK)
+
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class BookBatchRecommendationView(APIView):
+    """
+    Recommend for many input titles and models in one request. Each model
+    handles all titles in a single batched similarity pass.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = BookBatchRecommendationRequestSerializer(data=request.data)
+        if serializer.is_valid():
+            book_titles = serializer.validated_data['book_titles']
+            models_used = list(dict.fromkeys(serializer.validated_data['models_used']))
+            num_recommendations = serializer.validated_data['num_recommendations']
+            save_history = serializer.validated_data.get('save_history', False)
+            regenerate = serializer.validated_data.get('regenerate', False)
+            seed = serializer.validated_data.get('seed')
+
+            unsupported = [model_used for model_used in models_used if model_used not in BOOK_RECOMMENDERS]
+            if unsupported:
+                return Response(
+                    {"error": f"Model '{unsupported[0]}' is not supported."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            results = {
+                model_used: BOOK_RECOMMENDERS[model_used](book_titles, num_recommendations, seed=seed)
+                for model_used in models_used
+            }
+
+            if save_history:
+                user = history_user(request)
+                write_history([
+                    entry
+                    for model_used, model_results in results.items()
+                    for entry in history_entries(BookRecommendationHistory, user, model_used, model_results)
+                ])
+
+            return Response({
+                "recommendations": results,
+                "saved_history": save_history,
+                "regenerated": regenerate,
+                "input_books": book_titles
+            }, status=status.HTTP_200_OK)
+
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class AsyncBookRecommendationView(AsyncAPIView):
+    """
+    Async variant of BookRecommendationView for ASGI servers: the model runs
+    on the inference pool while the request only holds a coroutine.
+    """
+    permission_classes = [IsAuthenticated]
+
+    async def post(self, request):
+        serializer = BookRecommendationRequestSerializer(data=request.data)
+        if serializer.is_valid():
+            book_title = serializer.validated_data['book_title']
+            num_recommendations = serializer.validated_data['num_recommendations']
+            model_used = serializer.validated_data['model_used']
+            save_history = serializer.validated_data.get('save_history', False)
+            regenerate = serializer.validated_data.get('regenerate', False)
+            seed = serializer.validated_data.get('seed')
+
+            recommend = BOOK_RECOMMENDERS.get(model_used)
+            if recommend is None:
+                return Response(
+                    {"error": f"Model '{model_used}' is not supported."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            results = await run_inference(recommend, [book_title], num_recommendations, seed=seed)
+
+            if save_history:
+                await awrite_history(history_entries(BookRecommendationHistory, history_user(request), model_used, results))
+
+            return Response({
+                "recommendations": results,
+                "saved_history": save_history,
+                "regenerated": regenerate,
+                "input_book": book_title
+            }, status=status.HTTP_200_OK)
+
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class AsyncBookBatchRecommendationView(AsyncAPIView):
+    """
+    Async variant of BookBatchRecommendationView; the requested models run
+    concurrently on the inference pool.
+    """
+    permission_classes = [IsAuthenticated]
+
+    async def post(self, request):
+        serializer = BookBatchRecommendationRequestSerializer(data=request.data)
+        if serializer.is_valid():
+            book_titles = serializer.validated_data['book_titles']
+            models_used = list(dict.fromkeys(serializer.validated_data['models_used']))
+            num_recommendations = serializer.validated_data['num_recommendations']
+            save_history = serializer.validated_data.get('save_history', False)
+            regenerate = serializer.validated_data.get('regenerate', False)
+            seed = serializer.validated_data.get('seed')
+
+            unsupported = [model_used for model_used in models_used if model_used not in BOOK_RECOMMENDERS]
+            if unsupported:
+                return Response(
+                    {"error": f"Model '{unsupported[0]}' is not supported."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            model_results = await asyncio.gather(*(
+                run_inference(BOOK_RECOMMENDERS[model_used], book_titles, num_recommendations, seed=seed)
+                for model_used in models_used
+            ))
+            results = dict(zip(models_used, model_results))
+
+            if save_history:
+                user = history_user(request)
+                await awrite_history([
+                    entry
+                    for model_used, model_results in results.items()
+                    for entry in history_entries(BookRecommendationHistory, user, model_used, model_results)
+                ])
+
+            return Response({
+                "recommendations": results,
+                "saved_history": save_history,
+                "regenerated": regenerate,
+                "input_books": book_titles
+            }, status=status.HTTP_200_OK)
+
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
 class SaveSelectedRecommendations(APIView):
     def post(self, request):
         input_title = request.data.get('input_title')
@@ -115,13 +293,11 @@ class SaveSelectedRecommendations(APIView):
             return Response({'error': 'No recommendations provided.'}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            for input_title, recommended_titles in selected_recommendations.items():
-                BookRecommendationHistory.objects.create(
-                    user=request.user if request.user.is_authenticated else None,
-                    input_title=input_title, 
-                    recommended_titles=recommended_titles,  # Store the list of strings directly
-                    model_used=model_used
-                )
+            user = history_user(request)
+            insert_history([
+                BookRecommendationHistory(user=user, input_title=input_title, recommended_titles=recommended_titles, model_used=model_used)
+                for input_title, recommended_titles in selected_recommendations.items()
+            ])
 
             return Response({'status': 'Saved successfully.'}, status=status.HTTP_200_OK)
 
@@ -205,7 +381,8 @@ class BookHistoryView(generics.ListAPIView):
     permission_classes = [IsAuthenticated]
     search_fields = ['input_title', 'model_used']
     ordering_fields = ['timestamp']
-    ordering = ['-timestamp']  
+    ordering = ['-timestamp', '-id']
+    pagination_class = HistoryPagination
 
     def get_queryset(self):
         """Return history entries for the authenticated user only"""
@@ -220,9 +397,10 @@ class GenreBasedRecommendationView(APIView):
             num_recommendations = serializer.validated_data['num_recommendations']
             model_used = serializer.validated_data['model_used']
             regenerate = serializer.validated_data.get('regenerate', False)
+            seed = serializer.validated_data.get('seed')
 
             if model_used == 'Genre-Based':
-                results = recommend_books_by_genre_selection(book_genres, num_recommendations)
+                results = recommend_books_by_genre_selection(book_genres, num_recommendations, seed=seed)
                 
                 # Check if Genre-Based returned an error
                 if isinstance(results, dict) and 'error' in results:
@@ -246,4 +424,35 @@ class GenreBasedRecommendationView(APIView):
                 "regenerated": regenerate
             }, status=status.HTTP_200_OK)
 
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class AsyncGenreBasedRecommendationView(AsyncAPIView):
+    """
+    Async variant of GenreBasedRecommendationView.
+    """
+    async def post(self, request):
+        serializer = BookRecommendationUserGenreSerializer(data=request.data)
+        if serializer.is_valid():
+            book_genres = serializer.validated_data['book_genres']
+            num_recommendations = serializer.validated_data['num_recommendations']
+            model_used = serializer.validated_data['model_used']
+            regenerate = serializer.validated_data.get('regenerate', False)
+            seed = serializer.validated_data.get('seed')
+
+            if model_used != 'Genre-Based':
+                return Response(
+                    {"error": f"Model '{model_used}' is not supported."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            results = await run_inference(recommend_books_by_genre_selection, book_genres, num_recommendations, seed=seed)
+            if isinstance(results, dict) and 'error' in results:
+                return Response({"error": results['error']}, status=status.HTTP_400_BAD_REQUEST)
+
+            return Response({
+                "recommendations": results,
+                "regenerated": regenerate
+            }, status=status.HTTP_200_OK)
+
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -1,6 +1,7 @@
 import pandas as pd
 import numpy as np
 import os
+import threading
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
 import re
@@ -79,23 +80,28 @@ def categorize_course_by_keywords(title):
     
     return genres if genres else ['General']
 
-def load_course_data():
+def get_course_csv_path():
     """
-    Load course data from the CSV file.
-    
-    Returns:
-        pd.DataFrame: Course data with genres
+    Return the path of course_db.csv.
     """
     # Try to get the CSV path from Django settings if available
     if DJANGO_AVAILABLE and settings and hasattr(settings, 'BASE_DIR'):
         try:
-            csv_path = os.path.join(settings.BASE_DIR, '..', 'course_db.csv')
+            return os.path.join(settings.BASE_DIR, '..', 'course_db.csv')
         except:
             # Fallback to relative path
-            csv_path = os.path.join(os.path.dirname(__file__), '..', '..', '..', 'course_db.csv')
-    else:
-        # Use relative path when Django is not available
-        csv_path = os.path.join(os.path.dirname(__file__), '..', '..', '..', 'course_db.csv')
+            return os.path.join(os.path.dirname(__file__), '..', '..', '..', 'course_db.csv')
+    # Use relative path when Django is not available
+    return os.path.join(os.path.dirname(__file__), '..', '..', '..', 'course_db.csv')
+
+def load_course_data():
+    """
+    Load course data from the CSV file.
+    
+    Returns:
+        pd.DataFrame: Course data with genres
+    """
+    csv_path = get_course_csv_path()
     
     try:
         # Read the CSV file
@@ -143,50 +149,98 @@ def create_dummy_course_data():
     
     return pd.DataFrame(dummy_courses)
 
-def recommend_courses_by_genre(selected_genres, number_of_results=5):
+# Catalog built from course_db.csv, rebuilt when the file's mtime changes
+_catalog = None
+_catalog_lock = threading.Lock()
+
+def _course_csv_mtime():
+    try:
+        return os.path.getmtime(get_course_csv_path())
+    except OSError:
+        return None
+
+def build_course_catalog(courses_df, mtime=None):
+    """
+    Build the in-memory course catalog with an inverted genre index.
+    
+    Args:
+        courses_df (pd.DataFrame): Course data with genres
+        mtime (float): mtime of the CSV the data was read from
+        
+    Returns:
+        dict: courses DataFrame, course name array and genre -> row ids index
+    """
+    genre_rows = {}
+    for row, course_genres in enumerate(courses_df['genres']):
+        if isinstance(course_genres, list):
+            for genre in set(course_genres):
+                genre_rows.setdefault(genre, []).append(row)
+    
+    return {
+        'mtime': mtime,
+        'courses_df': courses_df,
+        'course_names': courses_df['course_name'].to_numpy(dtype=object),
+        'genre_index': {genre: np.array(rows, dtype=np.int32) for genre, rows in genre_rows.items()},
+    }
+
+def get_course_catalog():
+    """
+    Return the course catalog, reading and categorizing course_db.csv only
+    on first use and when the file has changed since.
+    
+    Returns:
+        dict: See build_course_catalog
+    """
+    global _catalog
+    mtime = _course_csv_mtime()
+    catalog = _catalog
+    if catalog is not None and catalog['mtime'] == mtime:
+        return catalog
+    
+    with _catalog_lock:
+        if _catalog is None or _catalog['mtime'] != mtime:
+            _catalog = build_course_catalog(load_course_data(), mtime)
+        return _catalog
+
+def recommend_courses_by_genre(selected_genres, number_of_results=5, seed=None):
     """
     Recommend courses based on selected genres.
     
     Args:
         selected_genres (list): List of selected genre strings
         number_of_results (int): Number of recommendations to return
+        seed (int or numpy Generator): Makes the order within equal scores reproducible
         
     Returns:
         list: List of recommended course names
     """
     try:
         # Load course data
-        courses_df = load_course_data()
+        catalog = get_course_catalog()
+        course_names = catalog['course_names']
         
-        if courses_df.empty:
+        if len(course_names) == 0:
             return ["No courses available"]
         
-        # Filter courses that match any of the selected genres
-        matching_courses = []
-        
-        for _, course in courses_df.iterrows():
-            course_genres = course['genres'] if isinstance(course['genres'], list) else []
-            
-            # Check if any selected genre matches the course genres
-            if any(genre in course_genres for genre in selected_genres):
-                matching_courses.append({
-                    'course_id': course['course_id'],
-                    'course_name': course['course_name'],
-                    'genres': course_genres,
-                    'match_score': len(set(selected_genres) & set(course_genres))
-                })
-        
-        if not matching_courses:
+        # Match score: how many of the selected genres each course has
+        match_scores = np.zeros(len(course_names), dtype=np.int32)
+        for genre in set(selected_genres):
+            rows = catalog['genre_index'].get(genre)
+            if rows is not None:
+                match_scores[rows] += 1
+        
+        matching_rows = np.flatnonzero(match_scores)
+        if len(matching_rows) == 0:
             return ["No courses found for the selected genres"]
         
         # Sort by match score (how many genres match) and randomize within same scores
-        matching_courses.sort(key=lambda x: x['match_score'], reverse=True)
-        
-        # Add some randomization to avoid always returning the same results
-        np.random.shuffle(matching_courses)
+        # (this module runs without Django, so it builds its own generator)
+        rng = seed if isinstance(seed, np.random.Generator) else np.random.default_rng(seed)
+        ranking = match_scores[matching_rows] + rng.random(len(matching_rows))
+        top_rows = matching_rows[np.argsort(-ranking)[:number_of_results]]
         
         # Return the top recommendations
-        recommendations = [course['course_name'] for course in matching_courses[:number_of_results]]
+        recommendations = course_names[top_rows].tolist()
         
         return recommendations
         
@@ -195,7 +249,7 @@ def recommend_courses_by_genre(selected_genres, number_of_results=5):
         return [f"Error generating recommendations: {str(e)}"]
 
 # Additional function for backwards compatibility
-def recommend_courses_by_genre_legacy(favorite_courses, number_of_results=5):
+def recommend_courses_by_genre_legacy(favorite_courses, number_of_results=5, seed=None):
     """
     Legacy function for course-to-course recommendations (not genre-based).
     This is kept for compatibility with the existing API structure.
@@ -203,12 +257,14 @@ def recommend_courses_by_genre_legacy(favorite_courses, number_of_results=5):
     Args:
         favorite_courses (list): List of favorite course titles
         number_of_results (int): Number of recommendations to return
+        seed (int or numpy Generator): Makes the recommendations reproducible
         
     Returns:
         dict: Mapping of favorite course to list of recommended titles
     """
-    courses_df = load_course_data()
+    courses_df = get_course_catalog()['courses_df']
     recommendations = {}
+    rng = seed if isinstance(seed, np.random.Generator) else np.random.default_rng(seed)
     
     for course_name in favorite_courses:
         # Find the course in our dataset
@@ -222,7 +278,7 @@ def recommend_courses_by_genre_legacy(favorite_courses, number_of_results=5):
         course_genres = matching_course.iloc[0]['genres']
         if isinstance(course_genres, list) and course_genres:
             # Use the genre-based recommendation
-            recommended_courses = recommend_courses_by_genre(course_genres, number_of_results)
+            recommended_courses = recommend_courses_by_genre(course_genres, number_of_results, seed=rng)
             recommendations[course_name] = recommended_courses
         else:
             recommendations[course_name] = ["No similar courses found"]
@@ -0,0 +1,12 @@
+from movies.ai_models.model_loader import registry
+from movies.autocomplete import build_autocomplete
+
+from .models import Course, RecommendationHistory
+
+
+def _load():
+    return build_autocomplete(Course, 'course_name', RecommendationHistory)
+
+
+# Built on first use (or by the warm-up hook), rebuilt periodically by complete_titles()
+course_autocomplete = registry.register('courses.autocomplete', _load)
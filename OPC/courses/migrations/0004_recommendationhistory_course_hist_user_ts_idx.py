@@ -0,0 +1,19 @@
+# Generated by Django 5.2.1 on 2026-10-18 17:27
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0003_alter_course_course_name_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recommendationhistory',
+            index=models.Index(fields=['user', '-timestamp', '-id'], name='course_hist_user_ts_idx'),
+        ),
+    ]
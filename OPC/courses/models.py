@@ -12,6 +12,20 @@ class Course(models.Model):
         return self.course_name
 
 
+class CourseSearchIndex(models.Model):
+    """
+    The SQLite FTS5 table over Course (created by a migration, not by
+    Django), joined by search to rank matches with bm25.
+    """
+    course = models.OneToOneField(
+        Course, on_delete=models.DO_NOTHING, primary_key=True, db_column='rowid', related_name='search_index'
+    )
+
+    class Meta:
+        managed = False
+        db_table = 'courses_course_fts'
+
+
 class RecommendationHistory(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True )
     input_title = models.CharField()
@@ -19,5 +33,11 @@ class RecommendationHistory(models.Model):
     model_used = models.CharField(max_length=100)
     timestamp = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Serves the per-user history list, newest first, and its keyset pagination
+            models.Index(fields=['user', '-timestamp', '-id'], name='course_hist_user_ts_idx'),
+        ]
+
     def __str__(self):
         return f"{self.user} | {self.input_title} -> {len(self.recommended_titles)} recs"
@@ -35,7 +35,8 @@ class CourseRecommendationRequestSerializer(serializers.Serializer):
         default=False,
         help_text="Whether this request is a regeneration"
         )
-    
+
+
 class CourseRecommendationUserRatingSerializer(serializers.Serializer):
     Model_Choices = [
             ('GRHR', 'GRHR'),
@@ -66,6 +67,13 @@ class CourseRecommendationUserRatingSerializer(serializers.Serializer):
             default=False,
             help_text="Whether this request is a regeneration"
         )
+    seed = serializers.IntegerField(
+            required=False,
+            allow_null=True,
+            default=None,
+            min_value=0,
+            help_text="Seed making the random selection reproducible; random when omitted"
+        )
 
 
 class RecommendationHistorySerializer(serializers.ModelSerializer): 
@@ -131,4 +139,11 @@ class CourseRecommendationUserGenreSerializer(serializers.Serializer):
         required=False,
         default=False,
         help_text="Whether this request is a regeneration"
+    )
+    seed = serializers.IntegerField(
+        required=False,
+        allow_null=True,
+        default=None,
+        min_value=0,
+        help_text="Seed making the random selection reproducible; random when omitted"
     )
\ No newline at end of file
@@ -1,3 +1,32 @@
+from django.contrib.auth.models import User
 from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from .models import Course
+
+
+class CourseSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('reader', password='secret')
+        Course.objects.bulk_create([
+            Course(course_id='CS101', course_name='Introduction to Programming'),
+            Course(course_id='CS201', course_name='Data Structures'),
+            Course(course_id='DS100', course_name='Introduction to Data Science'),
+        ])
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def search(self, query):
+        response = self.client.get(reverse('course_search'), {'search': query})
+        self.assertEqual(response.status_code, 200)
+        return [course['course_name'] for course in response.data['results']]
+
+    def test_word_prefix_search(self):
+        self.assertCountEqual(self.search('intro'), ['Introduction to Programming', 'Introduction to Data Science'])
+        self.assertEqual(self.search('data sci'), ['Introduction to Data Science'])
+        self.assertEqual(self.search('structure'), ['Data Structures'])
+        self.assertEqual(self.search('ming'), [])
@@ -13,6 +13,13 @@ from django.db import models
 
 from .serializers import CourseRecommendationRequestSerializer, CourseRecommendationUserRatingSerializer , RecommendationHistorySerializer, CourseSerializer, CourseRecommendationUserGenreSerializer
 from .models import RecommendationHistory, Course
+from movies.history import awrite_history, history_entries, history_user, insert_history, write_history
+from movies.async_api import AsyncAPIView, run_inference
+from movies.pagination import ApproximateCountMixin, HistoryPagination
+from movies.search import FullTextSearchFilter
+from movies.autocomplete import complete_titles
+from movies.serializers import TitleAutocompleteQuerySerializer
+from .autocomplete import course_autocomplete
 # from .ai_models.knn import recommend_courses_knn
 # from .ai_models.tfidf import recommend_courses_sparse_list
 from .ai_models.Genre_Based import recommend_courses_by_genre
@@ -26,7 +33,7 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.pagination import PageNumberPagination
 
 
-class CustomLimitOffsetPagination(LimitOffsetPagination):
+class CustomLimitOffsetPagination(ApproximateCountMixin, LimitOffsetPagination):
     """
     Custom offset pagination for search results with enhanced response format
     """
@@ -38,6 +45,7 @@ class CustomLimitOffsetPagination(LimitOffsetPagination):
     def get_paginated_response(self, data):
         return Response({
             'count': self.count,
+            'count_is_estimate': self.count_is_estimate,
             'next': self.get_next_link(),
             'previous': self.get_previous_link(),
             'total_pages': (self.count + self.limit - 1) // self.limit if self.limit else 1,
@@ -54,7 +62,7 @@ class CourseSearchView(generics.ListAPIView):
     permission_classes = [IsAuthenticated]
     queryset = Course.objects.all()
     serializer_class = CourseSerializer
-    filter_backends = [filters.SearchFilter]
+    filter_backends = [FullTextSearchFilter]
     search_fields = ['course_name']
     pagination_class = CustomLimitOffsetPagination
     
@@ -70,6 +78,23 @@ class CourseSearchView(generics.ListAPIView):
         return queryset
 
 
+class CourseAutocompleteView(APIView):
+    """
+    Title suggestions for the search box, served from the in-memory
+    autocomplete index without touching the database.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        serializer = TitleAutocompleteQuerySerializer(data=request.query_params)
+        if serializer.is_valid():
+            query = serializer.validated_data['q']
+            suggestions = complete_titles(course_autocomplete, query, serializer.validated_data['limit'])
+            return Response({"query": query, "results": suggestions}, status=status.HTTP_200_OK)
+
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
 class CourseRecommendation_1(APIView):
     permission_classes = [IsAuthenticated]
     
@@ -112,14 +137,7 @@ class CourseRecommendation_1(APIView):
                 )
 
             if save_history:
-                for input_title, recommended in results.items():
-                    if isinstance(recommended, list):
-                        RecommendationHistory.objects.create(
-                            user=request.user if request.user.is_authenticated else None,
-                            input_title=input_title,
-                            recommended_titles=recommended,
-                            model_used=model_used
-                        )
+                write_history(history_entries(RecommendationHistory, history_user(request), model_used, results))
 
             return Response({
                 "recommendations": results,
@@ -142,10 +160,11 @@ class CourseRecommendation_2(APIView):
             model_used = serializer.validated_data['model_used']
             save_history = serializer.validated_data.get('save_history', False)
             regenerate = serializer.validated_data.get('regenerate', False)
+            seed = serializer.validated_data.get('seed')
 
             # Use actual AI model for Genre-Based recommendations
             if model_used == 'Genre-Based':
-                results = recommend_courses_by_genre(course_genres, num_recommendations)
+                results = recommend_courses_by_genre(course_genres, num_recommendations, seed=seed)
             elif model_used == 'GRHR':
                 # results = recommend_courses_GRHR(course_genres, num_recommendations)
                 results = [f"Course {i} (GRHR - {', '.join(course_genres)})" for i in range(1, num_recommendations + 1)]
@@ -160,12 +179,12 @@ class CourseRecommendation_2(APIView):
                 )
 
             if save_history and isinstance(results, list):
-                RecommendationHistory.objects.create(
-                    user=request.user if request.user.is_authenticated else None,
+                write_history([RecommendationHistory(
+                    user=history_user(request),
                     input_title=", ".join(course_genres),
                     recommended_titles=results,
                     model_used=model_used
-                )
+                )])
 
             return Response({
                 "recommendations": results,
@@ -188,13 +207,11 @@ class SaveSelectedCourseRecommendations(APIView):
             return Response({'error': 'No recommendations provided.'}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            for input_title, recommended_titles in selected_recommendations.items():
-                RecommendationHistory.objects.create(
-                    user=request.user if request.user.is_authenticated else None,
-                    input_title= input_title, 
-                    recommended_titles=recommended_titles,  # Assuming this is a JSONField or TextField
-                    model_used=model_used
-                )
+            user = history_user(request)
+            insert_history([
+                RecommendationHistory(user=user, input_title=input_title, recommended_titles=recommended_titles, model_used=model_used)
+                for input_title, recommended_titles in selected_recommendations.items()
+            ])
 
             return Response({'status': 'Saved successfully.'}, status=status.HTTP_200_OK)
 
@@ -207,7 +224,8 @@ class CourseHistoryView(generics.ListAPIView):
     permission_classes = [IsAuthenticated]
     search_fields = ['input_title', 'model_used']
     ordering_fields = ['timestamp']
-    ordering = ['-timestamp']  
+    ordering = ['-timestamp', '-id']
+    pagination_class = HistoryPagination
 
     def get_queryset(self):
         """Return history entries for the authenticated user only"""
@@ -273,10 +291,11 @@ class CourseGenreBasedRecommendationView(APIView):
             model_used = serializer.validated_data['model_used']
             save_history = serializer.validated_data.get('save_history', False)
             regenerate = serializer.validated_data.get('regenerate', False)
+            seed = serializer.validated_data.get('seed')
 
             if model_used == 'Genre-Based':
                 # Use the actual AI model
-                results = recommend_courses_by_genre(course_genres, num_recommendations)
+                results = recommend_courses_by_genre(course_genres, num_recommendations, seed=seed)
                     
             elif model_used == 'knn_genre':
                 return Response(
@@ -290,13 +309,57 @@ class CourseGenreBasedRecommendationView(APIView):
                 )
 
             if save_history and isinstance(results, list):
-                RecommendationHistory.objects.create(
-                    user=request.user if request.user.is_authenticated else None,
+                write_history([RecommendationHistory(
+                    user=history_user(request),
                     input_title=f"Genre-based: {', '.join(course_genres)}",
                     recommended_titles=results,
                     model_used=model_used
+                )])
+
+            return Response({
+                "recommendations": results,
+                "saved_history": save_history,
+                "regenerated": regenerate,
+                "selected_genres": course_genres
+            }, status=status.HTTP_200_OK)
+
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class AsyncCourseGenreBasedRecommendationView(AsyncAPIView):
+    """
+    Async variant of CourseGenreBasedRecommendationView for ASGI servers: the
+    genre matching runs on the inference pool. The other course endpoints
+    serve placeholders and have no async variant.
+    """
+    permission_classes = [IsAuthenticated]
+
+    async def post(self, request):
+        serializer = CourseRecommendationUserGenreSerializer(data=request.data)
+        if serializer.is_valid():
+            course_genres = serializer.validated_data['course_genres']
+            num_recommendations = serializer.validated_data['num_recommendations']
+            model_used = serializer.validated_data['model_used']
+            save_history = serializer.validated_data.get('save_history', False)
+            regenerate = serializer.validated_data.get('regenerate', False)
+            seed = serializer.validated_data.get('seed')
+
+            if model_used != 'Genre-Based':
+                return Response(
+                    {"error": f"Model '{model_used}' is not supported."},
+                    status=status.HTTP_400_BAD_REQUEST
                 )
 
+            results = await run_inference(recommend_courses_by_genre, course_genres, num_recommendations, seed=seed)
+
+            if save_history and isinstance(results, list):
+                await awrite_history([RecommendationHistory(
+                    user=history_user(request),
+                    input_title=f"Genre-based: {', '.join(course_genres)}",
+                    recommended_titles=results,
+                    model_used=model_used
+                )])
+
             return Response({
                 "recommendations": results,
                 "saved_history": save_history,
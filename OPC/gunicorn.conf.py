@@ -0,0 +1,29 @@
+"""
+Gunicorn settings, read from the working directory by every gunicorn command.
+
+Workers run GUNICORN_THREADS request threads each (gthread worker class), so
+a slow NN or Embeddings request no longer blocks a whole worker. The model
+state is loaded once per worker and shared read-only by its threads, and
+OPC/wsgi.py caps the intra-op threads of each model call (see
+RECOMMENDER_INTRA_OP_THREADS). GUNICORN_THREADS=1 gives the previous
+synchronous workers.
+"""
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('GUNICORN_WORKERS', 3))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+worker_class = 'gthread' if threads > 1 else 'sync'
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+
+# Each worker imports the app (and warms the models when RECOMMENDER_WARMUP is
+# set) after the fork: TensorFlow and torch are not fork-safe once imported.
+# Memory-mapped model arrays are shared through the page cache either way.
+# GUNICORN_PRELOAD=True imports the app in the master instead; only combine it
+# with a RECOMMENDER_WARMUP_MODELS list that leaves out the *.nn,
+# *.embeddings and sentence_transformer models.
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'False').lower() in ('true', '1', 'yes')
+
+# settings.py reads these to size the intra-op thread budget
+os.environ.setdefault('GUNICORN_WORKERS', str(workers))
+os.environ.setdefault('GUNICORN_THREADS', str(threads))
@@ -1,106 +1,203 @@
 # recommendation_service.py
 import joblib
-import torch
-from sentence_transformers import SentenceTransformer, util
 import os
-import random
 from django.conf import settings
 import logging
 
+from .model_loader import registry
+from .neighbour_pool import make_rng
+from .artifacts import export_arrays, load_or
+from .result_cache import cached_pools
+from .neighbours import DEFAULT_TABLE_K, load_neighbour_table, save_neighbour_table, table_from_similarity
+from .text_encoder import encode_text
+from .title_index import TitleIndex
+from .vector_index import load_vector_index, normalize_rows
+
 logger = logging.getLogger(__name__)
 
 EMB_PATH = os.path.join(settings.BASE_DIR, 'movies', 'joblibs', 'Embeddings')
 
-# Initialize variables
-model = None
-movies = None
-movie_embeddings = None
 
-# Load model and data with error handling
-try:
-    model = SentenceTransformer('all-MiniLM-L6-v2')
-    movies = joblib.load(os.path.join(EMB_PATH, 'movies.pkl'))
+def _load_vectors():
+    # torch is only imported when the embeddings have not been exported as .npy
+    import torch
+
     movie_embeddings = torch.load(os.path.join(EMB_PATH, 'movie_embeddings.pt'), map_location=torch.device('cpu'))
-    movie_embeddings = torch.nn.functional.normalize(movie_embeddings, p=2, dim=1)
-    logger.info("Embeddings model files loaded successfully")
-except Exception as e:
-    logger.warning(f"Failed to load Embeddings model files: {e}")
-    model = None
-    movies = None
-    movie_embeddings = None
-
-def recommend_movies_embeddings(movie_titles, top_k=10):
+    return normalize_rows(movie_embeddings.numpy())
+
+
+def catalog_vectors():
+    """The normalized catalog embeddings (memory-mapped when exported)."""
+    return load_or(EMB_PATH, 'vectors', _load_vectors)
+
+
+def _load():
+    movies = joblib.load(os.path.join(EMB_PATH, 'movies.pkl'))
+    vectors = catalog_vectors()
+
+    # Use the index built by `manage.py build_vector_index movies` when there is one
+    index = load_vector_index(EMB_PATH, vectors)
+
+    return {
+        'movies': movies,
+        'titles': movies['title'].to_numpy(dtype=object),
+        'title_index': TitleIndex(movies['title']),
+        'vectors': vectors,
+        'index': index,
+        'neighbours': load_neighbour_table(EMB_PATH, len(vectors)),
+    }
+
+
+# Model files are loaded on first use (or by the warm-up hook), not at import
+embeddings_model = registry.register('movies.embeddings', _load, artifacts=[EMB_PATH])
+
+
+def export_mmap_arrays():
+    """Export the large arrays as memory-mapped .npy files (see artifacts.py)."""
+    return export_arrays(embeddings_model, EMB_PATH, ['vectors'])
+
+
+def build_neighbour_table(k=DEFAULT_TABLE_K):
+    """
+    Precompute the top-k neighbours of every catalog movie and save them next
+    to the model files. Returns the number of rows, or None when the model
+    files are not available.
+    """
+    state = embeddings_model.get()
+    if state is None:
+        return None
+    vectors = state['vectors']
+    ids, scores = table_from_similarity(lambda rows: vectors[rows] @ vectors.T, len(vectors), k)
+    save_neighbour_table(EMB_PATH, ids, scores)
+    # Reload so the new table is served
+    embeddings_model.reset()
+    return len(ids)
+
+
+def _search_pools(state, queries, search_k, rows=None):
+    """
+    Return the search_k best matching rows of each normalized query, best
+    first. Queries that are catalog movies (rows given) come from the
+    precomputed neighbour table when it is deep enough; otherwise all
+    queries are searched together in one batched index query.
+    """
+    neighbours = state['neighbours']
+    if rows is not None and neighbours is not None and neighbours.covers(search_k):
+        return [neighbours.neighbours(row, search_k) for row in rows]
+    ids, _ = state['index'].search(queries, search_k)
+    return list(ids)
+
+
+def _sample_recommendations(titles, ids, top_k, rng, exclude_rows=()):
+    """
+    Randomly pick top_k titles from a pool of candidate rows.
+    """
+    # Skip the input movie itself (and padding from approximate indexes)
+    recommendations = [titles[i] for i in ids.tolist() if i >= 0 and i not in exclude_rows]
+
+    # Randomly select the requested number of recommendations
+    if len(recommendations) > top_k:
+        picked = rng.choice(len(recommendations), size=top_k, replace=False)
+        recommendations = [recommendations[i] for i in picked]
+
+    return recommendations
+
+
+def recommend_movies_embeddings(movie_titles, top_k=10, seed=None):
     """
     Recommend movies using embeddings for multiple input titles
+
+    Catalog movies are compared through their stored embedding rows, so no
+    sentence transformer forward pass runs on this path, and all input
+    titles are searched in one batched query.
+
     Args:
         movie_titles: List of movie titles
         top_k: Number of recommendations per movie
+        seed: int or numpy Generator making the random selection reproducible
     Returns:
         Dictionary with input titles as keys and recommendation lists as values
     """
     # Check if model data is available
-    if model is None or movies is None or movie_embeddings is None:
+    state = embeddings_model.get()
+    if state is None:
         logger.warning("Embeddings model data not available, returning empty recommendations")
         if isinstance(movie_titles, str):
             return {movie_titles: "Model data not available"}
         return {title: "Model data not available" for title in movie_titles}
-    
-    # Reset random seed for different results each time
-    import time
-    random.seed(int(time.time()))
-    
+
+    title_index = state['title_index']
+    titles = state['titles']
+    vectors = state['vectors']
+
+    # Per-request generator: different results each call unless seeded
+    rng = make_rng(seed)
+
     if isinstance(movie_titles, str):
         movie_titles = [movie_titles]
-    
+
     results = {}
-    
-    for title in movie_titles:
+
+    matching_rows = {title.strip(): title_index.candidates(title.strip()) for title in movie_titles}
+    found = {title: rows for title, rows in matching_rows.items() if rows}
+
+    def search_pools(input_titles):
+        # Get more results than requested for randomization: 3x more plus the
+        # input movie's own rows, or all available
+        pool_sizes = {title: min(top_k * 3 + len(found[title]), len(titles)) for title in input_titles}
+        query_rows = [title_index.resolve(title) for title in input_titles]
+        searched = _search_pools(state, vectors[query_rows], max(pool_sizes.values()), rows=query_rows)
+        return {title: ids[:pool_sizes[title]] for title, ids in zip(input_titles, searched)}
+
+    pools = {}
+    if found:
+        try:
+            pools = cached_pools(embeddings_model, found, top_k, search_pools)
+        except Exception as e:
+            logger.error(f"Error searching movie embeddings: {e}")
+            return {title: [f"Error processing '{title}': {str(e)}"] for title in matching_rows}
+
+    for title, rows in matching_rows.items():
         try:
-            title = title.strip()
-            idx = movies[movies['title'].str.lower() == title.lower()].index
-            
-            if len(idx) == 0:
+            if not rows:
                 results[title] = [f"Movie '{title}' not found in database."]
                 continue
-            # Get the movie description for embedding
-            movie_description = movies.loc[idx[0], 'description']
-            if not movie_description or str(movie_description).lower() == 'nan':
-                # Fallback to title if no description
-                movie_description = title
-            
-            query_embedding = model.encode(movie_description, convert_to_tensor=True)
-            query_embedding = torch.nn.functional.normalize(query_embedding, p=2, dim=0)
-
-            # Get more results than requested for randomization
-            search_k = min(top_k * 3, len(movies))  # Get 3x more results or all available
-            scores = util.pytorch_cos_sim(query_embedding, movie_embeddings)[0]
-            
-            # Add small random noise to scores for variety (without destroying ranking too much)
-            noise = torch.randn_like(scores) * 0.01  # Small random noise
-            scores = scores + noise
-            
-            top_results = torch.topk(scores, k=search_k + 1)
-
-            recommendations = []
-            for i, score in zip(top_results[1], top_results[0]):
-                idx_int = i.item()
-                recommended_title = movies.iloc[idx_int]['title']
-                
-                # Skip the input movie itself
-                if recommended_title.lower() == title.lower():
-                    continue
-                    
-                recommendations.append(recommended_title)
-            
-            # Randomly shuffle and select the requested number of recommendations
-            if len(recommendations) > top_k:
-                random.shuffle(recommendations)
-                recommendations = recommendations[:top_k]
-            
-            results[title] = recommendations
-            
+
+            results[title] = _sample_recommendations(titles, pools[title], top_k, rng, exclude_rows=rows)
+
         except Exception as e:
             logger.error(f"Error processing movie '{title}': {e}")
             results[title] = [f"Error processing '{title}': {str(e)}"]
-    
+
     return results
+
+
+def recommend_movies_by_text(query, top_k=10, seed=None):
+    """
+    Recommend movies for a free-text description using embeddings.
+
+    This is the only path that needs the sentence transformer; it is loaded
+    on the first such query.
+
+    Args:
+        query: Free-text description of the kind of movie wanted
+        top_k: Number of recommendations
+        seed: int or numpy Generator making the random selection reproducible
+    Returns:
+        list: Recommended movie titles, or a message string when unavailable
+    """
+    state = embeddings_model.get()
+    if state is None:
+        logger.warning("Embeddings model data not available, returning empty recommendations")
+        return "Model data not available"
+
+    try:
+        query_embedding = encode_text(query)
+        if query_embedding is None:
+            return "Text encoder not available"
+        search_k = min(top_k * 3, len(state['titles']))  # Get 3x more results or all available
+        pool = _search_pools(state, query_embedding, search_k)[0]
+        return _sample_recommendations(state['titles'], pool, top_k, make_rng(seed))
+    except Exception as e:
+        logger.error(f"Error processing query '{query}': {e}")
+        return f"Error processing '{query}': {str(e)}"
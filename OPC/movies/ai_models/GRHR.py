@@ -1,49 +1,108 @@
 import joblib
 import os
+import numpy as np
 from django.conf import settings
-import random
 import logging
+from itertools import combinations
+
+from .knn_genre import GENRE_COLUMNS
+from .model_loader import registry
+from .neighbour_pool import make_rng
 
 logger = logging.getLogger(__name__)
 
 GRHR_PATH = os.path.join(settings.BASE_DIR, 'movies', 'joblibs', 'GRHR')
 
-# Initialize variable
-movies_df = None
+# Recommendations are sampled from the POOL_SIZE highest-rated matching movies
+POOL_SIZE = 25
+
+# Pools for other genre combinations are cached as they are requested, up to this many
+MAX_CACHED_POOLS = 1024
+
+
+def _genre_pool(masks, titles, query_mask):
+    # Movies are in descending rating order, so the pool is the first POOL_SIZE matches
+    rows = np.flatnonzero((masks & query_mask) == query_mask)[:POOL_SIZE]
+    return titles[rows].tolist()
 
-# Load data with error handling
-try:
+
+def _load():
+    """
+    Build the genre index: one genre bitmask per rated movie, in descending
+    avg_rating order, plus the pools of every single genre and genre pair.
+    """
     movies_df = joblib.load(os.path.join(GRHR_PATH, 'GRHR.joblib'))
-    logger.info("GRHR model files loaded successfully")
-except Exception as e:
-    logger.warning(f"Failed to load GRHR model files: {e}")
-    movies_df = None
 
+    # Every MovieLens genre gets a bit, whatever the indicator columns hold
+    missing = [genre for genre in GENRE_COLUMNS if genre not in movies_df.columns]
+    if missing:
+        logger.warning(f"GRHR data has no column for genres {missing}; they match no movies")
+    genre_columns = [genre for genre in GENRE_COLUMNS if genre not in missing]
+    mask_dtype = np.uint32 if len(GENRE_COLUMNS) <= 32 else np.uint64
+    genre_bits = {genre: 1 << bit for bit, genre in enumerate(GENRE_COLUMNS)}
+
+    rated = movies_df.dropna(subset=['avg_rating'])
+    order = np.argsort(-rated['avg_rating'].to_numpy(), kind='stable')
+
+    masks = np.zeros(len(rated), dtype=mask_dtype)
+    for genre in genre_columns:
+        # NaN (no indicator) counts as not having the genre
+        masks[rated[genre].to_numpy() == 1] |= genre_bits[genre]
+    masks = masks[order]
+    titles = rated['title'].to_numpy(dtype=object)[order]
 
-def recommend_movies_GRHR(selected_genres, n=5):
+    pools = {0: _genre_pool(masks, titles, 0)}
+    for size in (1, 2):
+        for genres in combinations(GENRE_COLUMNS, size):
+            query_mask = sum(genre_bits[g] for g in genres)
+            pools[query_mask] = _genre_pool(masks, titles, query_mask)
+
+    return {
+        'genre_bits': genre_bits,
+        'masks': masks,
+        'titles': titles,
+        'pools': pools,
+    }
+
+
+# Model files are loaded on first use (or by the warm-up hook), not at import
+grhr_model = registry.register('movies.grhr', _load, artifacts=[GRHR_PATH])
+
+
+def recommend_movies_GRHR(selected_genres, n=5, seed=None):
+    """
+    Recommend n movies sampled from the highest-rated movies having all the
+    selected genres (reproducibly when a seed is given).
+    """
     # Check if model data is available
-    if movies_df is None:
+    state = grhr_model.get()
+    if state is None:
         logger.warning("GRHR model data not available, returning empty recommendations")
         return []
-    
+
     try:
-        df = movies_df.copy()
+        genre_bits = state['genre_bits']
+        query_mask = 0
 
         for genre in selected_genres:
-            if genre not in df.columns:
+            if genre not in genre_bits:
                 return { "error": f"Genre '{genre}' not found." }
 
-            df = df[df[genre] == 1]
+            query_mask |= genre_bits[genre]
+
+        pools = state['pools']
+        top_movies = pools.get(query_mask)
+        if top_movies is None:
+            top_movies = _genre_pool(state['masks'], state['titles'], query_mask)
+            if len(pools) < MAX_CACHED_POOLS:
+                pools[query_mask] = top_movies
 
-        df = df.dropna(subset=['avg_rating'])
-        if df.empty:
+        if not top_movies:
             return { "error": "No matching movies found for selected genres." }
 
-        top_movies = df.sort_values(by='avg_rating', ascending=False).head(25)
-        sampled = top_movies.sample(n=min(n, len(top_movies)), random_state=random.randint(1, 9999))
+        picked = make_rng(seed).choice(len(top_movies), size=min(n, len(top_movies)), replace=False)
+        return [top_movies[i] for i in picked]
 
-        return sampled['title'].tolist()
-    
     except Exception as e:
         logger.error(f"Error in recommend_movies_GRHR: {e}")
-        return { "error": f"Error processing recommendation: {str(e)}" }
\ No newline at end of file
+        return { "error": f"Error processing recommendation: {str(e)}" }
@@ -1,70 +1,151 @@
 import joblib
 import os
 import numpy as np
+import scipy.sparse as sp
 from django.conf import settings
-from sklearn.metrics.pairwise import cosine_similarity
 import logging
 
+from .model_loader import registry
+from .neighbour_pool import make_rng
+from .artifacts import export_arrays, load_or
+from .neighbours import DEFAULT_TABLE_K, load_neighbour_table, save_neighbour_table, table_from_similarity
+from .vector_index import normalize_rows, top_k
+
 logger = logging.getLogger(__name__)
 
 # Define the base directory for joblib files
 GENRE_BASED_PATH = os.path.join(settings.BASE_DIR, 'movies', 'joblibs', 'Genre-Based')
 
-# Initialize variables
-movies = None
-genre_matrix = None
-title_index = None
+# Recommendations are sampled from the movies with the POOL_SIZE highest genre
+# similarities (ties broken by row, as in the neighbour table)
+POOL_SIZE = 100
 
-# Load data with error handling
-try:
-    movies = joblib.load(os.path.join(GENRE_BASED_PATH, 'movies_genre_based.joblib'))
+
+def _genre_vectors():
+    """
+    L2-normalized float32 genre vectors, so the cosine similarity of a movie
+    with the whole catalog is a single matrix-vector product.
+    """
     genre_matrix = joblib.load(os.path.join(GENRE_BASED_PATH, 'genre_Based_matrix.joblib'))
-    title_index = joblib.load(os.path.join(GENRE_BASED_PATH, 'title_index_genre-based.joblib'))
-    logger.info("Genre-based model files loaded successfully")
-except Exception as e:
-    logger.warning(f"Failed to load Genre-based model files: {e}")
-    movies = None
-    genre_matrix = None
-    title_index = {}
-
-def recommend_movies_by_genre(favorite_movies, number_of_results=5):
+    if sp.issparse(genre_matrix):
+        genre_matrix = genre_matrix.toarray()
+    return normalize_rows(np.asarray(genre_matrix))
+
+
+def genre_similarities(genre_vectors, rows):
+    """
+    Cosine similarities of rows against the catalog, rounded so movies with
+    the same genres tie exactly whichever BLAS kernel computed the product.
+    """
+    return np.round(genre_vectors[rows] @ genre_vectors.T, 5)
+
+
+def _load():
+    genre_vectors = load_or(GENRE_BASED_PATH, 'genre_vectors', _genre_vectors)
+    movies = joblib.load(os.path.join(GENRE_BASED_PATH, 'movies_genre_based.joblib'))
+    return {
+        'titles': movies['title'].to_numpy(dtype=object),
+        'genre_vectors': genre_vectors,
+        'title_index': joblib.load(os.path.join(GENRE_BASED_PATH, 'title_index_genre-based.joblib')),
+        'neighbours': load_neighbour_table(GENRE_BASED_PATH, len(genre_vectors)),
+    }
+
+
+# Model files are loaded on first use (or by the warm-up hook), not at import
+genre_based_model = registry.register('movies.genre_based', _load, artifacts=[GENRE_BASED_PATH])
+
+
+def export_mmap_arrays():
+    """Export the large arrays as memory-mapped .npy files (see artifacts.py)."""
+    return export_arrays(genre_based_model, GENRE_BASED_PATH, ['genre_vectors'])
+
+
+def build_neighbour_table(k=DEFAULT_TABLE_K):
+    """
+    Precompute the top-k neighbours of every catalog movie and save them next
+    to the model files. Returns the number of rows, or None when the model
+    files are not available.
+    """
+    state = genre_based_model.get()
+    if state is None:
+        return None
+    genre_vectors = state['genre_vectors']
+    ids, scores = table_from_similarity(lambda rows: genre_similarities(genre_vectors, rows), len(genre_vectors), k)
+    save_neighbour_table(GENRE_BASED_PATH, ids, scores)
+    # Reload so the new table is served
+    genre_based_model.reset()
+    return len(ids)
+
+
+def similarity_pool(scores, pool_size=POOL_SIZE):
+    """
+    Rows of the pool_size highest scores. Genre vectors tie a lot (every
+    pure-Drama movie scores the same), so the pool is capped at pool_size
+    with top_k's tie-break: the same rows the neighbour table stores.
+    """
+    ids, _ = top_k(scores, pool_size)
+    return ids[0]
+
+
+def recommend_movies_by_genre(favorite_movies, number_of_results=5, seed=None):
     """
     Generate random genre-based movie recommendations for each favorite movie.
 
+    The recommendations are sampled from the movies whose genres are the
+    most similar to the favorite's (see similarity_pool).
+
     Args:
         favorite_movies (list): List of favorite movie titles.
         number_of_results (int): Number of random recommendations to return.
+        seed (int or numpy Generator): Makes the random selection reproducible.
 
     Returns:
         dict: Mapping of favorite movie to list of recommended titles.
     """
     # Check if model data is available
-    if genre_matrix is None or movies is None or not title_index:
+    state = genre_based_model.get()
+    if state is None:
         logger.warning("Genre-based model data not available, returning empty recommendations")
         return {movie: "Model data not available" for movie in favorite_movies}
-    
+
+    titles = state['titles']
+    genre_vectors = state['genre_vectors']
+    title_index = state['title_index']
+    neighbours = state['neighbours']
+    pool_size = min(max(POOL_SIZE, number_of_results), len(genre_vectors) - 1)
+    rng = make_rng(seed)
+
     recommendations = {}
 
+    # Similarities of all input movies in one matrix product when there is no neighbour table
+    rows = {movie_name: title_index.get(movie_name) for movie_name in favorite_movies}
+    found = [movie_name for movie_name, idx in rows.items() if idx is not None]
+    similarity_block = {}
+    if found and (neighbours is None or not neighbours.covers(pool_size)):
+        try:
+            found_rows = np.array([rows[movie_name] for movie_name in found], dtype=np.intp)
+            scores = genre_similarities(genre_vectors, found_rows)
+            scores[np.arange(len(found_rows)), found_rows] = -np.inf  # exclude itself
+            similarity_block = dict(zip(found, scores))
+        except Exception as e:
+            logger.error(f"Error computing genre similarities: {e}")
+
     for movie_name in favorite_movies:
         try:
-            idx = title_index.get(movie_name)
+            idx = rows[movie_name]
 
             if idx is None:
                 recommendations[movie_name] = "Movie not found"
                 continue
 
-            selected_vector = genre_matrix[idx]
-            similarity_scores = cosine_similarity([selected_vector], genre_matrix)[0]
-            similarity_scores[idx] = -1  # exclude itself
-
-            all_indices = np.arange(len(similarity_scores))
-            sorted_indices = all_indices[np.argsort(similarity_scores)[::-1]]
-            shuffled_indices = np.random.permutation(sorted_indices)
-
-            selected_indices = shuffled_indices[:number_of_results]
-            recommended_titles = movies.iloc[selected_indices]['title'].tolist()
+            if movie_name in similarity_block:
+                pool = similarity_pool(similarity_block[movie_name], pool_size)
+            else:
+                # The stored pool of the most genre-similar movies
+                pool = neighbours.neighbours(idx, pool_size)
 
-            recommendations[movie_name] = recommended_titles
+            selected_indices = rng.choice(pool, size=min(number_of_results, len(pool)), replace=False)
+            recommendations[movie_name] = titles[selected_indices].tolist()
         
         except Exception as e:
             logger.error(f"Error processing movie '{movie_name}': {e}")
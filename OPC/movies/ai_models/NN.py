@@ -1,12 +1,17 @@
 import os
 import joblib
 import numpy as np
-import random
-from tensorflow.keras.models import load_model
 from django.conf import settings
-from sklearn.metrics.pairwise import cosine_similarity
 import logging
 
+from .model_loader import registry
+from .neighbour_pool import make_rng
+from .artifacts import export_arrays, load_array
+from .result_cache import cached_pools
+from .neighbours import DEFAULT_TABLE_K, load_neighbour_table, save_neighbour_table, table_from_similarity
+from .title_index import TitleIndex
+from .vector_index import top_k as top_k_rows
+
 logger = logging.getLogger(__name__)
 
 # Paths
@@ -15,87 +20,143 @@ MODEL_PATH = os.path.join(NN_PATH, 'movie_rating_model.keras')
 SCALER_PATH = os.path.join(NN_PATH, 'rating_count_scaler.pkl')
 MOVIES_DATA_PATH = os.path.join(NN_PATH, 'final_movie_data.pkl')
 
-def recommend_movies_nn(movie_titles, top_k=10):
+# Columns that are not part of the 21 feature inputs
+NON_FEATURE_COLUMNS = ['title', 'genres', 'movieId', 'rating_count', 'avg_rating']
+
+
+def _load():
+    """
+    Load the Keras model and movie features and keep them resident.
+
+    The feature matrix is stored L2-normalized as float32 so a cosine
+    similarity against the whole catalog is a single matrix-vector product.
+    """
+    from tensorflow.keras.models import load_model
+
+    model = load_model(MODEL_PATH)
+    movies_data = joblib.load(MOVIES_DATA_PATH)
+
+    features = load_array(NN_PATH, 'features')
+    if features is None:
+        feature_columns = [col for col in movies_data.columns if col not in NON_FEATURE_COLUMNS]
+        features = np.ascontiguousarray(movies_data[feature_columns].values, dtype=np.float32)
+        norms = np.linalg.norm(features, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        features /= norms
+
+    titles = movies_data['title'].to_numpy(dtype=object)
+
+    return {
+        'model': model,
+        'features': features,
+        'titles': titles,
+        'title_index': TitleIndex(titles),
+        'neighbours': load_neighbour_table(NN_PATH, len(features)),
+    }
+
+
+# Model files are loaded at most once per worker, on first use or by the warm-up hook
+nn_model = registry.register('movies.nn', _load, artifacts=[MODEL_PATH, MOVIES_DATA_PATH])
+
+
+def export_mmap_arrays():
+    """Export the large arrays as memory-mapped .npy files (see artifacts.py)."""
+    return export_arrays(nn_model, NN_PATH, ['features'])
+
+
+def build_neighbour_table(k=DEFAULT_TABLE_K):
+    """
+    Precompute the top-k neighbours of every catalog movie and save them next
+    to the model files. Returns the number of rows, or None when the model
+    files are not available.
+    """
+    state = nn_model.get()
+    if state is None:
+        return None
+    features = state['features']
+    ids, scores = table_from_similarity(lambda rows: features[rows] @ features.T, len(features), k)
+    save_neighbour_table(NN_PATH, ids, scores)
+    # Reload so the new table is served
+    nn_model.reset()
+    return len(ids)
+
+
+def recommend_movies_nn(movie_titles, top_k=10, seed=None):
     """
     Recommend movies using a neural network model based on input movie titles.
-    
+
     Args:
         movie_titles: List of movie titles or single movie title
         top_k: Number of recommendations to return for each input title
-    
+        seed: int or numpy Generator making the random selection reproducible
+
     Returns:
         Dictionary with input titles as keys and recommendation lists as values
     """
-    # Reset random seed for different results each time
-    import time
-    random.seed(int(time.time()))
-    
+    # Per-request generator: different results each call unless seeded
+    rng = make_rng(seed)
+
     if isinstance(movie_titles, str):
         movie_titles = [movie_titles]
-    
-    # Load the pre-trained model and movie data with error handling
-    try:
-        model = load_model(MODEL_PATH)
-        movies_data = joblib.load(MOVIES_DATA_PATH)
-        logger.info("NN model files loaded successfully")
-    except Exception as e:
-        logger.warning(f"Failed to load NN model files: {e}")
+
+    state = nn_model.get()
+    if state is None:
         return {title: "Model data not available" for title in movie_titles}
-    
+
+    features = state['features']
+    titles = state['titles']
+    title_index = state['title_index']
+    neighbours = state['neighbours']
+
     results = {}
-    
-    # Features to use for the neural network (21 features total)
-    feature_columns = [col for col in movies_data.columns 
-                      if col not in ['title', 'genres', 'movieId', 'rating_count', 'avg_rating']]
-    
-    for title in movie_titles:
+
+    # Find the input movies
+    input_rows = {title.strip(): title_index.resolve(title.strip()) for title in movie_titles}
+    found = {title: row for title, row in input_rows.items() if row is not None}
+
+    # Get more candidates than requested for randomization
+    search_k = min(top_k * 3, len(features) - 1)  # Get 3x more results or all available
+
+    # Pools are cached, so they hold no randomness: the variety comes from
+    # sampling them with this request's generator below
+    def similarity_pools(input_titles):
+        rows = np.fromiter((found[title] for title in input_titles), dtype=np.intp, count=len(input_titles))
+
+        # Cosine similarity between all input movies and all movies in one matrix product
+        similarities = features[rows] @ features.T
+
+        # Exclude the input movies themselves
+        similarities[np.arange(len(rows)), rows] = -1
+
+        top_indices, _ = top_k_rows(similarities, search_k)
+        return dict(zip(input_titles, top_indices))
+
+    candidates = {}
+    try:
+        if neighbours is not None and neighbours.covers(search_k):
+            # Precomputed pools, sampled like the cached ones
+            candidates = {title: neighbours.neighbours(row, search_k) for title, row in found.items()}
+        else:
+            candidates = cached_pools(nn_model, found, top_k, similarity_pools)
+    except Exception as e:
+        logger.error(f"Error computing NN similarities: {e}")
+
+    for title in input_rows:
         try:
-            title = title.strip()
-            
-            # Find the input movie
-            movie_match = movies_data[movies_data['title'].str.lower() == title.lower()]
-        
-            if movie_match.empty:
+            if input_rows[title] is None:
                 results[title] = [f"Movie '{title}' not found in database."]
                 continue
-                
-            # Get input movie features
-            input_features = movie_match[feature_columns].values[0].astype('float32')
-            
-            # Get features for all movies in the dataset
-            all_features = movies_data[feature_columns].values.astype('float32')
-            
-            # Calculate cosine similarity between input movie and all movies
-            input_features = input_features.reshape(1, -1)
-            similarities = cosine_similarity(input_features, all_features)[0]
-        
-            # Add small random noise to similarities for variety (without destroying ranking too much)
-            noise = np.random.randn(len(similarities)) * 0.01  # Small random noise
-            similarities = similarities + noise
-            
-            # Exclude the input movie itself
-            input_index = movie_match.index[0]
-            similarities[input_index] = -1
-            
-            # Get more candidates than requested for randomization
-            search_k = min(top_k * 3, len(movies_data))  # Get 3x more results or all available
-            top_indices = np.argsort(similarities)[::-1][:search_k]
-            
-            # Extract movie titles from candidates
-            candidate_recommendations = movies_data.iloc[top_indices]['title'].tolist()
-            
-            # Randomly shuffle and select the requested number of recommendations
-            if len(candidate_recommendations) > top_k:
-                random.shuffle(candidate_recommendations)
-                recommendations = candidate_recommendations[:top_k]
-            else:
-                recommendations = candidate_recommendations
-            
-            results[title] = recommendations
-        
+
+            top_indices = np.asarray(candidates[title])
+
+            # Randomly select the requested number of recommendations from the candidates
+            if len(top_indices) > top_k:
+                top_indices = rng.choice(top_indices, size=top_k, replace=False)
+
+            results[title] = titles[top_indices].tolist()
+
         except Exception as e:
             logger.error(f"Error processing movie '{title}': {e}")
             results[title] = "Error processing recommendation"
-    
-    return results
 
+    return results
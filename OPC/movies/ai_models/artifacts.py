@@ -0,0 +1,102 @@
+"""
+Memory-mapped array artifacts shared by every worker process.
+
+joblib/torch artifacts are unpickled into private memory by each worker, so
+every gunicorn worker holds its own copy of the model data. Exporting the
+large arrays with `manage.py export_mmap_artifacts` stores them as plain .npy
+files next to the model files; loaders open them with mmap_mode='r', so the
+pages live once in the OS page cache and are shared by all workers.
+
+Supported values and their files (for an artifact called <name>):
+
+- numpy arrays: <name>.npy
+- scipy sparse matrices: <name>.data.npy, <name>.indices.npy, <name>.indptr.npy
+  (stored as CSR)
+
+Object arrays (titles) cannot be memory-mapped, so models keep those in
+private memory and export only their numeric arrays.
+
+<name>.meta.json records the kind and shape of the artifact.
+"""
+import json
+import os
+
+import numpy as np
+
+
+def _path(directory, name, suffix):
+    return os.path.join(directory, f'{name}.{suffix}')
+
+
+def has_array(directory, name):
+    return os.path.exists(_path(directory, name, 'meta.json'))
+
+
+def save_array(directory, name, value):
+    """
+    Export an array or sparse matrix as memory-mappable .npy files.
+    """
+    import scipy.sparse as sp
+
+    if sp.issparse(value):
+        value = sp.csr_matrix(value)
+        meta = {'kind': 'csr', 'shape': list(value.shape)}
+        for part in ('data', 'indices', 'indptr'):
+            np.save(_path(directory, name, f'{part}.npy'), getattr(value, part))
+    else:
+        value = np.ascontiguousarray(value)
+        meta = {'kind': 'dense', 'shape': list(value.shape)}
+        np.save(_path(directory, name, 'npy'), value)
+
+    # Written last, so a half-exported artifact is never picked up
+    with open(_path(directory, name, 'meta.json'), 'w') as f:
+        json.dump(meta, f)
+
+
+def load_array(directory, name, mmap_mode='r'):
+    """
+    Open an exported artifact memory-mapped, or return None when it has not
+    been exported.
+    """
+    if not has_array(directory, name):
+        return None
+
+    with open(_path(directory, name, 'meta.json')) as f:
+        meta = json.load(f)
+
+    if meta['kind'] == 'csr':
+        import scipy.sparse as sp
+
+        parts = tuple(np.load(_path(directory, name, f'{part}.npy'), mmap_mode=mmap_mode)
+                      for part in ('data', 'indices', 'indptr'))
+        return sp.csr_matrix(parts, shape=tuple(meta['shape']), copy=False)
+
+    return np.load(_path(directory, name, 'npy'), mmap_mode=mmap_mode)
+
+
+def load_or(directory, name, fallback):
+    """
+    Open an exported artifact, falling back to fallback() (the original
+    joblib/torch load) when it has not been exported.
+    """
+    value = load_array(directory, name)
+    return fallback() if value is None else value
+
+
+def export_arrays(handle, directory, names):
+    """
+    Export the named entries of a registered model's state and reload the
+    model so it serves from the memory-mapped files.
+
+    Entries that are None (optional arrays the model does not use) are
+    skipped. Returns the exported names, or None when the model is not
+    available.
+    """
+    state = handle.get()
+    if state is None:
+        return None
+    names = [name for name in names if state.get(name) is not None]
+    for name in names:
+        save_array(directory, name, state[name])
+    handle.reset()
+    return names
@@ -3,70 +3,90 @@ from django.conf import settings
 import joblib
 import logging
 
+from .model_loader import registry
+from .artifacts import export_arrays, load_or
+from .neighbour_pool import NeighbourPool, make_rng, titles_by_row
+from .neighbours import DEFAULT_TABLE_K, load_neighbour_table, save_neighbour_table, table_from_kneighbors
+from .sparse_index import POSTINGS_NAME, exported_postings, load_cosine_index
+
 logger = logging.getLogger(__name__)
 
 # Define the base directory for joblib files
 KNN_PATH = os.path.join(settings.BASE_DIR, 'movies', 'joblibs', 'KNN')
+MODEL_PATH = os.path.join(KNN_PATH, 'knn_model.joblib')
 
-# Initialize variables
-model = None
-movie_mapping = None
-reverse_mapping = None
-sparse_matrix = None
 
-# Try to load data with error handling
-try:
-    model = joblib.load(os.path.join(KNN_PATH, 'knn_model.joblib'))
+def _load():
+    sparse_matrix = load_or(KNN_PATH, 'sparse_matrix', lambda: joblib.load(os.path.join(KNN_PATH, 'sparse_matrix.joblib')))
     movie_mapping = joblib.load(os.path.join(KNN_PATH, 'movie_mapping.joblib'))
-    reverse_mapping = joblib.load(os.path.join(KNN_PATH, 'reverse_mapping.joblib'))
-    sparse_matrix = joblib.load(os.path.join(KNN_PATH, 'sparse_matrix.joblib'))
-    logger.info("KNN model files loaded successfully")
-except Exception as e:
-    logger.warning(f"Failed to load KNN model files: {e}")
-    # Set default values or None
-    model = None
-    movie_mapping = {}
-    reverse_mapping = {}
-    sparse_matrix = None
+    neighbours = load_neighbour_table(KNN_PATH, sparse_matrix.shape[0])
+    # Cosine queries go through the inverted index instead of sklearn's brute force
+    index = load_cosine_index(KNN_PATH, MODEL_PATH, sparse_matrix)
+    return {
+        'index': index,
+        POSTINGS_NAME: exported_postings(index),
+        'reverse_mapping': joblib.load(os.path.join(KNN_PATH, 'reverse_mapping.joblib')),
+        'sparse_matrix': sparse_matrix,
+        'neighbours': neighbours,
+        'pool': NeighbourPool(index, sparse_matrix, titles_by_row(movie_mapping, sparse_matrix.shape[0]), neighbours),
+    }
+
+
+# Model files are loaded on first use (or by the warm-up hook), not at import
+knn_model = registry.register('movies.knn', _load, artifacts=[KNN_PATH])
+
 
+def export_mmap_arrays():
+    """Export the large arrays as memory-mapped .npy files (see artifacts.py)."""
+    return export_arrays(knn_model, KNN_PATH, ['sparse_matrix', POSTINGS_NAME])
 
 
-import random
+def build_neighbour_table(k=DEFAULT_TABLE_K):
+    """
+    Precompute the top-k neighbours of every catalog movie and save them next
+    to the model files. Returns the number of rows, or None when the model
+    files are not available.
+    """
+    state = knn_model.get()
+    if state is None:
+        return None
+    ids, scores = table_from_kneighbors(state['index'], state['sparse_matrix'], k)
+    save_neighbour_table(KNN_PATH, ids, scores)
+    # Reload so the new table is served
+    knn_model.reset()
+    return len(ids)
+
 
-def recommend_movies_knn(movie_titles, n=5, top_k=20):
+def recommend_movies_knn(movie_titles, n=5, top_k=20, seed=None):
     """
     Recommend N random movies selected from the top K most similar movies.
     - n: number of final recommendations
     - top_k: number of top similar movies to consider for random sampling
+    - seed: makes the random selection reproducible
     """
     results = {}
 
     # Check if model files are loaded
-    if model is None or not movie_mapping or not reverse_mapping or sparse_matrix is None:
+    state = knn_model.get()
+    if state is None:
         for title in movie_titles:
             results[title] = "AI model not available - please check model files"
         return results
 
+    reverse_mapping = state['reverse_mapping']
+    pool = state['pool']
+    rng = make_rng(seed)
+
+    # Get top K similar (excluding self) for all input titles at once
+    rows = {title: reverse_mapping[title] for title in movie_titles if title in reverse_mapping}
+    pools = pool.pools(rows, top_k, handle=knn_model)
+
     for title in movie_titles:
         if title not in reverse_mapping:
             results[title] = "Movie not found"
             continue
 
-        idx = reverse_mapping[title]
-
-        # Get top K similar (excluding self)
-        distances, indices = model.kneighbors(sparse_matrix[idx], n_neighbors=top_k + 1)
-        similar_indices = [i for i in indices.flatten() if i != idx]
-
-        # Map to titles
-        similar_titles = [movie_mapping[i] for i in similar_indices]
-
         # Randomly select N from the top K similar titles
-        if len(similar_titles) >= n:
-            recommended = random.sample(similar_titles, n)
-        else:
-            recommended = similar_titles  # fallback if not enough results
-
-        results[title] = recommended
+        results[title] = pool.sample(pools[title], n, rng)
 
     return results
@@ -1,77 +1,101 @@
 import os
 from django.conf import settings
 import joblib
-import random
 import logging
 
+from .model_loader import registry
+from .artifacts import export_arrays, load_or
+from .neighbour_pool import NeighbourPool, make_rng, titles_by_row
+from .neighbours import DEFAULT_TABLE_K, load_neighbour_table, save_neighbour_table, table_from_kneighbors
+
 logger = logging.getLogger(__name__)
 
 # Define the base directory for joblib files
 KNN_GENRE_PATH = os.path.join(settings.BASE_DIR, 'movies', 'joblibs', 'GenreKnn')
 
-# Initialize variables
-model = None
-movie_index_to_title = None
-title_to_index = {}
-features = None
+GENRE_COLUMNS = ['Action', 'Adventure', 'Animation', 'Children', 'Comedy', 'Crime',
+                 'Documentary', 'Drama', 'Fantasy', 'Film-Noir', 'Horror', 'IMAX',
+                 'Musical', 'Mystery', 'Romance', 'Sci-Fi', 'Thriller', 'War', 'Western']
+
 
-# Load pre-trained components with error handling
-try:
+def _load():
+    # Extract genre features for all movies
+    features = load_or(KNN_GENRE_PATH, 'features',
+                       lambda: joblib.load(os.path.join(KNN_GENRE_PATH, 'genre_movies_df.joblib'))[GENRE_COLUMNS].to_numpy())
     model = joblib.load(os.path.join(KNN_GENRE_PATH, 'genre_knn_model.joblib'))
     movie_index_to_title = joblib.load(os.path.join(KNN_GENRE_PATH, 'genre_index_to_title.joblib'))
-    title_to_index = joblib.load(os.path.join(KNN_GENRE_PATH, 'genre_title_to_index.joblib'))
-    features = joblib.load(os.path.join(KNN_GENRE_PATH, 'genre_movies_df.joblib'))
-    logger.info("KNN Genre model files loaded successfully")
-except Exception as e:
-    logger.warning(f"Failed to load KNN Genre model files: {e}")
-    model = None
-    movie_index_to_title = {}
-    title_to_index = {}
-    features = None
+    neighbours = load_neighbour_table(KNN_GENRE_PATH, len(features))
+    return {
+        'model': model,
+        'title_to_index': joblib.load(os.path.join(KNN_GENRE_PATH, 'genre_title_to_index.joblib')),
+        'features': features,
+        'neighbours': neighbours,
+        'pool': NeighbourPool(model, features, titles_by_row(movie_index_to_title, len(features)), neighbours),
+    }
 
-GENRE_COLUMNS = ['Action', 'Adventure', 'Animation', 'Children', 'Comedy', 'Crime',
-                 'Documentary', 'Drama', 'Fantasy', 'Film-Noir', 'Horror', 'IMAX',
-                 'Musical', 'Mystery', 'Romance', 'Sci-Fi', 'Thriller', 'War', 'Western']
 
-# Extract genre features for all movies if available
-if features is not None:
-    features = features[GENRE_COLUMNS]
+# Model files are loaded on first use (or by the warm-up hook), not at import
+knn_genre_model = registry.register('movies.knn_genre', _load, artifacts=[KNN_GENRE_PATH])
+
+
+def export_mmap_arrays():
+    """Export the large arrays as memory-mapped .npy files (see artifacts.py)."""
+    return export_arrays(knn_genre_model, KNN_GENRE_PATH, ['features'])
+
+
+def build_neighbour_table(k=DEFAULT_TABLE_K):
+    """
+    Precompute the top-k neighbours of every catalog movie and save them next
+    to the model files. Returns the number of rows, or None when the model
+    files are not available.
+    """
+    state = knn_genre_model.get()
+    if state is None:
+        return None
+    ids, scores = table_from_kneighbors(state['model'], state['features'], k)
+    save_neighbour_table(KNN_GENRE_PATH, ids, scores)
+    # Reload so the new table is served
+    knn_genre_model.reset()
+    return len(ids)
 
 
-def recommend_movies_by_knn_genre(movie_titles, n=5):
+def recommend_movies_by_knn_genre(movie_titles, n=5, seed=None):
     """
     Recommend N genre-similar movies for each input title using KNN.
     Returns a dict: {movie_title: [list of recommended movie titles]}
-    The recommendations are randomly sampled from a default larger pool for variability.
+    The recommendations are randomly sampled from a default larger pool for variability
+    (reproducibly when a seed is given).
     """
     # Check if model data is available
-    if model is None or features is None or not title_to_index:
+    state = knn_genre_model.get()
+    if state is None:
         logger.warning("KNN Genre model data not available, returning empty recommendations")
         return {title: "Model data not available" for title in movie_titles}
-    
+
+    title_to_index = state['title_to_index']
+    pool = state['pool']
+    rng = make_rng(seed)
+
     results = {}
     default_pool_size = 25  # Can be adjusted if needed
 
+    rows = {title: title_to_index[title] for title in movie_titles if title in title_to_index}
+
+    # Get a larger pool of neighbors for all input titles at once
+    try:
+        pools = pool.pools(rows, default_pool_size, handle=knn_genre_model)
+    except Exception as e:
+        logger.error(f"Error querying KNN Genre neighbours: {e}")
+        return {title: "Error processing recommendation" for title in movie_titles}
+
     for title in movie_titles:
         try:
             if title not in title_to_index:
                 results[title] = "Movie not found"
                 continue
 
-            idx = title_to_index[title]
-            input_vector = features.iloc[idx].values.reshape(1, -1)
-
-            # Get a larger pool of neighbors
-            distances, indices = model.kneighbors(input_vector, n_neighbors=default_pool_size + 1)
-
-            # Flatten and remove the movie itself
-            neighbor_indices = [i for i in indices.flatten() if i != idx]
-
-            # Shuffle and pick n unique recommendations
-            sampled_indices = random.sample(neighbor_indices, min(n, len(neighbor_indices)))
-
-            recommended_titles = [movie_index_to_title[i] for i in sampled_indices]
-            results[title] = recommended_titles
+            # Pick n unique recommendations
+            results[title] = pool.sample(pools[title], n, rng)
         
         except Exception as e:
             logger.error(f"Error processing movie '{title}': {e}")
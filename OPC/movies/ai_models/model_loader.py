@@ -0,0 +1,217 @@
+import importlib
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Modules that register their models with the registry when imported.
+# warm_up() imports these so every model is known before it loads them.
+RECOMMENDER_MODULES = [
+    'movies.ai_models.knn',
+    'movies.ai_models.tfidf',
+    'movies.ai_models.Genre_Based',
+    'movies.ai_models.GRHR',
+    'movies.ai_models.knn_genre',
+    'movies.ai_models.Embeddings',
+    'movies.ai_models.NN',
+    'movies.ai_models.text_encoder',
+    'books.ai_models.Embeddings',
+    'books.ai_models.KNN',
+    'books.ai_models.NN',
+    'books.ai_models.tfidf',
+    'books.ai_models.Genre_Based',
+    'movies.autocomplete',
+    'books.autocomplete',
+    'courses.autocomplete',
+]
+
+
+def current_rss():
+    """
+    Return the resident set size of this process in bytes.
+
+    Reads /proc/self/statm where available and falls back to the peak RSS
+    reported by getrusage on other platforms (0 where neither exists).
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    except ImportError:
+        return 0
+
+
+class RegisteredModel:
+    """
+    A recommender model whose artifacts are loaded at most once per process.
+
+    The loader is a callable that reads the model artifacts and returns the
+    in-memory state the recommend function works with. It runs on the first
+    call to get() (or during warm-up), guarded by a lock so concurrent
+    requests never load the same artifacts twice. A loader that raises marks
+    the model as unavailable until reset() is called. refresh() loads a new
+    state while requests keep using the current one.
+
+    The loaded state is shared by every request thread of the worker, so
+    recommend functions treat it as read-only: per-request values (the RNG,
+    score buffers) are local, and the few lazily filled lookup dicts in a
+    state only ever gain complete, never-mutated entries.
+    """
+
+    def __init__(self, name, loader, artifacts=()):
+        self.name = name
+        self.loader = loader
+        self.artifacts = list(artifacts)
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._value = None
+        self.error = None
+        self.load_seconds = None
+        self.rss_delta = None
+        # time.monotonic() of the last load, or None
+        self.loaded_at = None
+
+    @property
+    def loaded(self):
+        return self._loaded
+
+    def get(self):
+        """Return the loaded state, or None when the artifacts failed to load."""
+        if self._loaded:
+            return self._value
+
+        with self._lock:
+            if not self._loaded:
+                self._load()
+        return self._value
+
+    def _load(self):
+        rss_before = current_rss()
+        started = time.perf_counter()
+        try:
+            self._value = self.loader()
+            self.error = None
+            logger.info(f"{self.name} model files loaded successfully")
+        except Exception as e:
+            logger.warning(f"Failed to load {self.name} model files: {e}")
+            self._value = None
+            self.error = str(e)
+        self.load_seconds = time.perf_counter() - started
+        self.rss_delta = current_rss() - rss_before
+        self.loaded_at = time.monotonic()
+        self._loaded = True
+
+    def refresh(self):
+        """
+        Load the state again and swap it in. Requests keep the current state
+        while the loader runs, and keep it when the loader fails.
+
+        Returns True when the new state was swapped in.
+        """
+        started = time.perf_counter()
+        try:
+            value = self.loader()
+        except Exception as e:
+            logger.warning(f"Failed to refresh {self.name}: {e}")
+            return False
+        with self._lock:
+            self._value = value
+            self.error = None
+            self.load_seconds = time.perf_counter() - started
+            self.loaded_at = time.monotonic()
+            self._loaded = True
+        logger.info(f"{self.name} refreshed")
+        return True
+
+    def reset(self):
+        """Drop the loaded state so the next get() reloads the artifacts."""
+        with self._lock:
+            self._loaded = False
+            self._value = None
+            self.error = None
+            self.load_seconds = None
+            self.rss_delta = None
+            self.loaded_at = None
+
+    def report(self):
+        return {
+            'name': self.name,
+            'loaded': self._loaded,
+            'available': self._value is not None,
+            'load_seconds': self.load_seconds,
+            'rss_delta_mb': self.rss_delta / (1024 * 1024) if self.rss_delta is not None else None,
+            'artifacts': self.artifacts,
+            'error': self.error,
+        }
+
+
+class ModelRegistry:
+    """
+    Process-wide registry of the recommender models of every app.
+    """
+
+    def __init__(self):
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, loader, artifacts=()):
+        """
+        Register a model loader under a unique name and return its handle.
+
+        Nothing is loaded here; the artifacts are read on first use.
+        """
+        with self._lock:
+            if name in self._models:
+                return self._models[name]
+            model = RegisteredModel(name, loader, artifacts)
+            self._models[name] = model
+            return model
+
+    def __contains__(self, name):
+        return name in self._models
+
+    def __getitem__(self, name):
+        return self._models[name]
+
+    def names(self):
+        return sorted(self._models)
+
+    def get(self, name):
+        return self._models[name].get()
+
+    def warm_up(self, names=None):
+        """
+        Eagerly load models so the first request doesn't pay for it.
+
+        Args:
+            names: Model names or name prefixes (e.g. 'movies.') to load;
+                every registered model when omitted.
+
+        Returns:
+            list: Load report of the models that were warmed up
+        """
+        for module in RECOMMENDER_MODULES:
+            try:
+                importlib.import_module(module)
+            except Exception as e:
+                logger.warning(f"Failed to import recommender module {module}: {e}")
+
+        selected = [
+            name for name in self.names()
+            if not names or any(name == n or name.startswith(n) for n in names)
+        ]
+        for name in selected:
+            self._models[name].get()
+        return [self._models[name].report() for name in selected]
+
+    def report(self):
+        return [self._models[name].report() for name in self.names()]
+
+
+registry = ModelRegistry()
@@ -0,0 +1,93 @@
+"""
+Candidate pools of the nearest-neighbour recommenders.
+
+The KNN recommenders (movies knn and knn_genre, books KNN) all recommend n
+random titles out of the pool of the most similar catalog rows. NeighbourPool
+holds what they share:
+
+- the catalog titles as an array indexed by row, built once at load time
+- pool lookup for all input rows of a request at once: from the precomputed
+  neighbour table when it is deep enough, otherwise from the pool cache or a
+  single batched kneighbors call for the uncached rows
+- sampling with a numpy Generator, so results are reproducible for a seed
+"""
+import numpy as np
+
+from .result_cache import cached_pools
+
+
+def titles_by_row(row_to_title, n_rows):
+    """Object array of titles indexed by row, from a {row: title} mapping."""
+    titles = np.empty(n_rows, dtype=object)
+    for row, title in row_to_title.items():
+        titles[row] = title
+    return titles
+
+
+def titles_by_row_from_index(title_to_row, n_rows):
+    """Object array of titles indexed by row, from a {title: row} mapping."""
+    return titles_by_row({row: title for title, row in title_to_row.items()}, n_rows)
+
+
+def make_rng(seed=None):
+    """
+    The per-request numpy Generator of the recommenders: seeded when seed is
+    an int, passed through when it already is a Generator, fresh otherwise.
+    """
+    return seed if isinstance(seed, np.random.Generator) else np.random.default_rng(seed)
+
+
+class NeighbourPool:
+    """
+    Pools of the most similar rows of a fitted NearestNeighbors model.
+
+    Args:
+        model: fitted sklearn NearestNeighbors (or compatible) model
+        matrix: the rows the model was fitted on (queried by row index)
+        titles: object array of titles indexed by row
+        table: optional precomputed NeighbourTable (see neighbours.py)
+    """
+
+    def __init__(self, model, matrix, titles, table=None):
+        self.model = model
+        self.matrix = matrix
+        self.titles = titles
+        self.table = table
+
+    def __len__(self):
+        return len(self.titles)
+
+    def kneighbors_pools(self, rows, pool_size):
+        """
+        {key: pool} for a {key: row} mapping, in one kneighbors call; each
+        pool holds the pool_size nearest rows, best first, the row excluded.
+        """
+        keys = list(rows)
+        query_rows = np.fromiter((rows[key] for key in keys), dtype=np.intp, count=len(keys))
+        n_neighbors = min(pool_size + 1, len(self))
+        _, indices = self.model.kneighbors(self.matrix[query_rows], n_neighbors=n_neighbors)
+        return {
+            key: row_indices[row_indices != row][:pool_size]
+            for key, row, row_indices in zip(keys, query_rows, indices)
+        }
+
+    def pools(self, rows, pool_size, handle=None):
+        """
+        {key: pool} for a {key: row} mapping: from the neighbour table when it
+        covers pool_size, otherwise from the pool cache of the registered
+        model handle (when given) or kneighbors.
+        """
+        if not rows:
+            return {}
+        if self.table is not None and self.table.covers(pool_size):
+            return {key: self.table.neighbours(row, pool_size) for key, row in rows.items()}
+        if handle is not None:
+            return cached_pools(handle, rows, pool_size, lambda keys: self.kneighbors_pools(
+                {key: rows[key] for key in keys}, pool_size))
+        return self.kneighbors_pools(rows, pool_size)
+
+    def sample(self, pool, n, rng):
+        """Titles of n rows drawn without replacement from a pool (all of them when smaller)."""
+        pool = np.asarray(pool, dtype=np.intp)
+        picked = rng.choice(pool, size=min(n, len(pool)), replace=False)
+        return self.titles[picked].tolist()
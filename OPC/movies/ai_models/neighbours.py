@@ -0,0 +1,121 @@
+"""
+Precomputed top-K neighbour tables for the movie recommenders.
+
+The catalog only changes when the model artifacts are rebuilt, so the
+neighbours of every catalog row can be computed offline with
+`manage.py build_neighbour_tables`. A table is two .npy files saved next to
+the model artifacts:
+
+- neighbours_ids.npy: int32 (n_rows, K), neighbour rows best first, the row
+  itself excluded, padded with -1.
+- neighbours_scores.npy: float16 (n_rows, K), the matching similarity
+  (1 - distance for the sklearn NearestNeighbors models).
+
+Tables are opened memory-mapped, so serving a row's neighbours is a slice
+whatever the size of the catalog or the cost of the model.
+"""
+import logging
+import os
+
+import numpy as np
+
+from .vector_index import top_k
+
+logger = logging.getLogger(__name__)
+
+NEIGHBOUR_IDS_FILENAME = 'neighbours_ids.npy'
+NEIGHBOUR_SCORES_FILENAME = 'neighbours_scores.npy'
+
+# Neighbours stored per row; must cover the largest pool a recommender samples from
+DEFAULT_TABLE_K = 100
+
+
+class NeighbourTable:
+    """
+    Read-only view over a precomputed neighbour table.
+    """
+
+    def __init__(self, ids, scores):
+        self.ids = ids
+        self.scores = scores
+
+    @property
+    def k(self):
+        return self.ids.shape[1]
+
+    def __len__(self):
+        return self.ids.shape[0]
+
+    def covers(self, pool_size):
+        """Whether the table stores at least pool_size neighbours per row."""
+        return pool_size <= self.k
+
+    def neighbours(self, row, pool_size):
+        """Return the best pool_size neighbour rows of a row, best first."""
+        ids = np.asarray(self.ids[row, :pool_size])
+        return ids[ids >= 0]
+
+
+def load_neighbour_table(directory, n_rows, mmap_mode='r'):
+    """
+    Open the neighbour table saved in a model directory.
+
+    Returns None when there is no table, or when it was built for a catalog
+    of a different size; the recommender then computes neighbours live.
+    """
+    ids_path = os.path.join(directory, NEIGHBOUR_IDS_FILENAME)
+    scores_path = os.path.join(directory, NEIGHBOUR_SCORES_FILENAME)
+    if not (os.path.exists(ids_path) and os.path.exists(scores_path)):
+        return None
+
+    ids = np.load(ids_path, mmap_mode=mmap_mode)
+    if ids.shape[0] != n_rows:
+        logger.warning(f"Ignoring neighbour table in {directory}: built for {ids.shape[0]} rows, catalog has {n_rows}")
+        return None
+    return NeighbourTable(ids, np.load(scores_path, mmap_mode=mmap_mode))
+
+
+def save_neighbour_table(directory, ids, scores):
+    np.save(os.path.join(directory, NEIGHBOUR_IDS_FILENAME), ids.astype(np.int32))
+    np.save(os.path.join(directory, NEIGHBOUR_SCORES_FILENAME), scores.astype(np.float16))
+
+
+def table_from_kneighbors(model, matrix, k, batch_size=256):
+    """
+    Build a table with a fitted NearestNeighbors model, querying every row of
+    the matrix it was fitted on in batches.
+    """
+    n_rows = matrix.shape[0]
+    n_neighbors = min(k + 1, n_rows)
+    ids = np.full((n_rows, k), -1, dtype=np.int32)
+    scores = np.zeros((n_rows, k), dtype=np.float32)
+
+    for start in range(0, n_rows, batch_size):
+        stop = min(start + batch_size, n_rows)
+        distances, indices = model.kneighbors(matrix[start:stop], n_neighbors=n_neighbors)
+        for offset, row in enumerate(range(start, stop)):
+            # Drop the row itself, wherever ties put it
+            keep = indices[offset] != row
+            row_ids = indices[offset][keep][:k]
+            ids[row, :len(row_ids)] = row_ids
+            scores[row, :len(row_ids)] = 1 - distances[offset][keep][:k]
+
+    return ids, scores
+
+
+def table_from_similarity(similarity_rows, n_rows, k, batch_size=256):
+    """
+    Build a table from a function returning the dense (len(rows), n_rows)
+    similarity block of a batch of rows against the whole catalog.
+    """
+    k = min(k, n_rows - 1)
+    ids = np.empty((n_rows, k), dtype=np.int32)
+    scores = np.empty((n_rows, k), dtype=np.float32)
+
+    for start in range(0, n_rows, batch_size):
+        rows = np.arange(start, min(start + batch_size, n_rows))
+        block = np.asarray(similarity_rows(rows), dtype=np.float32)
+        block[np.arange(len(rows)), rows] = -np.inf  # exclude itself
+        ids[rows], scores[rows] = top_k(block, k)
+
+    return ids, scores
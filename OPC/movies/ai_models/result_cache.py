@@ -0,0 +1,116 @@
+"""
+Cache of recommendation candidate pools, shared by the movie and book models.
+
+Every title-based model first builds a pool of candidates for each input
+title (kneighbors, a similarity pass or an index search) and then samples
+the returned recommendations from it. The pools are deterministic for a
+given model artifact, so they are cached in the 'recommendations' cache
+(see CACHES in settings.py) keyed by
+
+    (model name = domain.model, artifact hash, normalized title)
+
+while the sampling still runs on every request, which keeps the variety of
+regenerate=True calls. The artifact hash covers the size and mtime of every
+file under the model's artifact paths, so rebuilding or exporting a model
+invalidates its pools without flushing the cache.
+"""
+import hashlib
+import logging
+import os
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .title_index import normalize_title
+
+logger = logging.getLogger(__name__)
+
+CACHE_ALIAS = 'recommendations'
+
+# Artifact hashes per model name, with the loaded state they were computed for
+_versions = {}
+
+
+def _artifact_files(path):
+    if os.path.isfile(path):
+        yield path
+        return
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for name in sorted(files):
+            yield os.path.join(root, name)
+
+
+def artifact_version(handle):
+    """
+    Return a short hash of the model's artifact files.
+
+    The hash is computed once per loaded state, so a reset() (after a model
+    rebuild) picks up the new files.
+    """
+    state = handle.get()
+    cached = _versions.get(handle.name)
+    if cached is not None and cached[0] is state:
+        return cached[1]
+
+    digest = hashlib.sha1(handle.name.encode())
+    for path in handle.artifacts:
+        for file_path in _artifact_files(path):
+            try:
+                stat = os.stat(file_path)
+            except OSError:
+                continue
+            digest.update(f'{os.path.relpath(file_path, path)}:{stat.st_size}:{stat.st_mtime_ns};'.encode())
+    version = digest.hexdigest()[:16]
+    _versions[handle.name] = (state, version)
+    return version
+
+
+def pool_cache_key(model_name, version, title):
+    # Titles are hashed, so keys stay short and free of spaces for memcached/redis
+    title_hash = hashlib.sha1(normalize_title(title).encode()).hexdigest()
+    return f'pool:{model_name}:{version}:{title_hash}'
+
+
+def cached_pools(handle, titles, n, compute):
+    """
+    Return {title: candidate pool} for titles found in the model's catalog.
+
+    Pools missing from the cache (or cached for another n, the request
+    parameter the pool size depends on) are computed in one batch with
+    compute(missing_titles) -> {title: pool} and stored. Cache errors are
+    logged and the pools are computed as if nothing was cached.
+    """
+    titles = list(dict.fromkeys(titles))
+    if not titles:
+        return {}
+
+    cache = caches[CACHE_ALIAS]
+    version = artifact_version(handle)
+    keys = {title: pool_cache_key(handle.name, version, title) for title in titles}
+
+    try:
+        hits = cache.get_many(list(keys.values()))
+    except Exception as e:
+        logger.warning(f"Recommendation cache lookup failed for {handle.name}: {e}")
+        hits = {}
+
+    pools = {}
+    for title, key in keys.items():
+        entry = hits.get(key)
+        if entry is not None and entry['n'] == n:
+            pools[title] = entry['pool']
+
+    missing = [title for title in titles if title not in pools]
+    if missing:
+        computed = compute(missing)
+        pools.update(computed)
+        try:
+            cache.set_many(
+                {keys[title]: {'n': n, 'pool': computed[title]} for title in missing if title in computed},
+                timeout=settings.RECOMMENDATION_CACHE_TIMEOUT,
+            )
+        except Exception as e:
+            logger.warning(f"Recommendation cache update failed for {handle.name}: {e}")
+
+    return pools
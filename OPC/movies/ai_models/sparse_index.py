@@ -0,0 +1,185 @@
+"""
+Exact cosine top-k search over sparse rows (TF-IDF / rating matrices).
+
+The KNN and TF-IDF recommenders query a fitted sklearn NearestNeighbors
+(metric='cosine', brute force) one or a few catalog rows at a time. Every
+kneighbors call validates its input, computes the distance to every row of
+the catalog and sorts them all.
+
+SparseCosineIndex answers the same queries from an inverted index: the
+catalog rows are L2-normalized once and stored transposed as CSR (one
+posting list of (row, weight) per column). The similarities of a query are
+the sparse product of its nonzero terms with their posting lists, so only
+rows sharing a term with the query are scored, and the best k of those are
+selected with argpartition.
+
+Rows sharing no term with the query have similarity 0; when fewer than k
+rows share one, the result is padded with such rows (distance 1), as
+NearestNeighbors would return them. The catalogs served this way (TF-IDF
+weights, ratings) have no negative entries, so no similarity is below 0.
+"""
+import time
+
+import numpy as np
+import scipy.sparse as sp
+
+from .artifacts import load_array
+
+# Name of the exported posting lists (see artifacts.py)
+POSTINGS_NAME = 'cosine_postings'
+
+
+def uses_cosine(model):
+    """Whether a fitted NearestNeighbors model ranks by cosine distance."""
+    return getattr(model, 'effective_metric_', getattr(model, 'metric', None)) == 'cosine'
+
+
+def normalize_csr(matrix):
+    """float32 CSR copy of a sparse matrix with L2-normalized rows."""
+    matrix = sp.csr_matrix(matrix, dtype=np.float32, copy=True)
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    matrix.data /= np.repeat(norms, np.diff(matrix.indptr)).astype(np.float32)
+    return matrix
+
+
+def cosine_postings(matrix):
+    """The inverted index of a catalog matrix: its normalized rows, transposed, as CSR."""
+    return normalize_csr(matrix).T.tocsr()
+
+
+class SparseCosineIndex:
+    """
+    Inverted-index cosine search with the kneighbors() interface of
+    sklearn's NearestNeighbors.
+    """
+
+    def __init__(self, postings):
+        self.postings = postings
+
+    @classmethod
+    def build(cls, matrix):
+        return cls(cosine_postings(matrix))
+
+    def __len__(self):
+        return self.postings.shape[1]
+
+    def search(self, queries, k):
+        """
+        Args:
+            queries: Sparse (or dense) query rows, shape (q, n_columns)
+            k: Number of neighbours per query
+        Returns:
+            (ids, scores): int64 and float32 arrays of shape (q, k), best first
+        """
+        if not sp.issparse(queries):
+            queries = np.atleast_2d(queries)
+        scores = (normalize_csr(queries) @ self.postings).tocsr()
+        n_queries = scores.shape[0]
+        k = min(k, len(self))
+
+        all_ids = np.empty((n_queries, k), dtype=np.int64)
+        all_scores = np.zeros((n_queries, k), dtype=np.float32)
+        for q in range(n_queries):
+            start, end = scores.indptr[q], scores.indptr[q + 1]
+            ids, values = scores.indices[start:end], scores.data[start:end]
+            if len(ids) > k:
+                best = np.argpartition(-values, k - 1)[:k]
+                ids, values = ids[best], values[best]
+            order = np.argsort(-values, kind='stable')
+            found = len(order)
+            all_ids[q, :found] = ids[order]
+            all_scores[q, :found] = values[order]
+            if found < k:
+                # Rows without a shared term, lowest row numbers first
+                padding = np.setdiff1d(np.arange(min(len(self), k + found)), ids, assume_unique=True)
+                all_ids[q, found:] = padding[:k - found]
+        return all_ids, all_scores
+
+    def kneighbors(self, X, n_neighbors=5, return_distance=True):
+        """Same results as NearestNeighbors(metric='cosine').kneighbors, up to ties."""
+        ids, scores = self.search(X, n_neighbors)
+        if not return_distance:
+            return ids
+        return np.clip(1.0 - scores, 0.0, 2.0), ids
+
+
+def _matches(postings, matrix):
+    return postings is not None and sp.issparse(matrix) and postings.shape == (matrix.shape[1], matrix.shape[0])
+
+
+def cosine_index(model, matrix, postings=None):
+    """
+    The SparseCosineIndex serving the queries of a fitted NearestNeighbors
+    model over a sparse catalog matrix, or the model itself when it doesn't
+    rank by cosine distance (or the matrix isn't sparse).
+
+    postings: the exported inverted index, when there is one for this matrix.
+    """
+    if not (sp.issparse(matrix) and uses_cosine(model)):
+        return model
+    return SparseCosineIndex(postings if _matches(postings, matrix) else cosine_postings(matrix))
+
+
+def load_cosine_index(directory, model_path, matrix):
+    """
+    The index serving the neighbour queries of the NearestNeighbors model
+    saved at model_path, fitted on matrix.
+
+    The posting lists exported by export_mmap_artifacts (only ever exported
+    for cosine models) are opened memory-mapped and the model is not loaded.
+    Otherwise the model is unpickled to read its metric and, when it ranks by
+    cosine distance, dropped again: it holds a private copy of the training
+    matrix (_fit_X) that no query needs.
+    """
+    postings = load_array(directory, POSTINGS_NAME)
+    if _matches(postings, matrix):
+        return SparseCosineIndex(postings)
+
+    import joblib
+
+    return cosine_index(joblib.load(model_path), matrix)
+
+
+def exported_postings(index):
+    """The posting lists to export for an index, or None when it is not a SparseCosineIndex."""
+    return index.postings if isinstance(index, SparseCosineIndex) else None
+
+
+def evaluate_cosine_index(index, model, matrix, k=10, sample=200, seed=0):
+    """
+    Compare the index with the sklearn model on single-row queries of
+    catalog rows.
+
+    Returns:
+        dict: recall (share of the index's neighbours within the model's
+        k-th distance), sklearn_ms and index_ms (mean milliseconds per query)
+    """
+    rng = np.random.default_rng(seed)
+    n_rows = matrix.shape[0]
+    query_rows = rng.choice(n_rows, size=min(sample, n_rows), replace=False)
+    k = min(k, n_rows)
+
+    hits = 0
+    sklearn_seconds = 0.0
+    index_seconds = 0.0
+    for row in query_rows:
+        query = matrix[row]
+
+        started = time.perf_counter()
+        expected_distances, _ = model.kneighbors(query, n_neighbors=k)
+        sklearn_seconds += time.perf_counter() - started
+
+        started = time.perf_counter()
+        found_distances, _ = index.kneighbors(query, n_neighbors=k)
+        index_seconds += time.perf_counter() - started
+
+        # A neighbour counts when it is at most as far as the model's k-th
+        # one, as rows tied at that distance may be returned in either order
+        hits += int(np.sum(found_distances[0] <= expected_distances[0][-1] + 1e-5))
+
+    return {
+        'recall': hits / (len(query_rows) * k),
+        'sklearn_ms': sklearn_seconds * 1000 / len(query_rows),
+        'index_ms': index_seconds * 1000 / len(query_rows),
+    }
@@ -0,0 +1,40 @@
+import logging
+import threading
+
+from .model_loader import registry
+
+logger = logging.getLogger(__name__)
+
+# Sentence transformer the catalog embeddings were built with
+TEXT_ENCODER_NAME = 'all-MiniLM-L6-v2'
+
+
+def _load():
+    from sentence_transformers import SentenceTransformer
+
+    return SentenceTransformer(TEXT_ENCODER_NAME)
+
+
+# Only loaded when a free-text query arrives; catalog items are served from
+# their stored embedding rows and never need the transformer
+text_encoder = registry.register('sentence_transformer', _load, artifacts=[TEXT_ENCODER_NAME])
+
+# The fast tokenizer inside the transformer can't be used by two threads at
+# once ("Already borrowed"), so threaded workers encode one text at a time
+_encode_lock = threading.Lock()
+
+
+def encode_text(text):
+    """
+    Encode free text into an L2-normalized float32 embedding.
+
+    Returns:
+        numpy.ndarray or None when the sentence transformer is unavailable
+    """
+    model = text_encoder.get()
+    if model is None:
+        return None
+
+    with _encode_lock:
+        embedding = model.encode(text, normalize_embeddings=True)
+    return embedding.astype('float32')
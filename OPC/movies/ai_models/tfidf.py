@@ -1,50 +1,111 @@
 import os
 import joblib
+import numpy as np
 from django.conf import settings
 import logging
 
+from .model_loader import registry
+from .artifacts import export_arrays, load_or
+from .result_cache import cached_pools
+from .neighbours import DEFAULT_TABLE_K, load_neighbour_table, save_neighbour_table, table_from_kneighbors
+from .sparse_index import POSTINGS_NAME, exported_postings, load_cosine_index
+
 logger = logging.getLogger(__name__)
 
 # Define the base path for BOW models
 BOW_MODEL_PATH = os.path.join(settings.BASE_DIR, 'movies', 'joblibs', 'BOW')
+MODEL_PATH = os.path.join(BOW_MODEL_PATH, 'nn_model.joblib')
 
-# Initialize variables
-tfidf = None
-model = None
-title_to_index = None
-tfidf_matrix = None
 
-# Load joblib files using relative paths with error handling
-try:
-    tfidf = joblib.load(os.path.join(BOW_MODEL_PATH, 'tfidf_vectorizer.joblib'))
-    model = joblib.load(os.path.join(BOW_MODEL_PATH, 'nn_model.joblib'))
+def _load():
     title_to_index = joblib.load(os.path.join(BOW_MODEL_PATH, 'title_to_index.joblib'))
-    tfidf_matrix = joblib.load(os.path.join(BOW_MODEL_PATH, 'tfidf_matrix.joblib'))
-    logger.info("TF-IDF model files loaded successfully")
-except Exception as e:
-    logger.warning(f"Failed to load TF-IDF model files: {e}")
-    tfidf = None
-    model = None
-    title_to_index = {}
-    tfidf_matrix = None
-
-def recommend_movies_sparse_list(movie_titles, n=5):
+    tfidf_matrix = load_or(BOW_MODEL_PATH, 'tfidf_matrix', lambda: joblib.load(os.path.join(BOW_MODEL_PATH, 'tfidf_matrix.joblib')))
+
+    # Reverse lookup built once, so mapping a neighbour row back to its title is an array index
+    index_to_title = np.empty(tfidf_matrix.shape[0], dtype=object)
+    for title, idx in title_to_index.items():
+        # First title wins when several map to the same row, as with the old list scan
+        if index_to_title[idx] is None:
+            index_to_title[idx] = title
+
+    # Cosine queries go through the inverted index instead of sklearn's brute force
+    index = load_cosine_index(BOW_MODEL_PATH, MODEL_PATH, tfidf_matrix)
+    return {
+        'index': index,
+        POSTINGS_NAME: exported_postings(index),
+        'title_to_index': title_to_index,
+        'index_to_title': index_to_title,
+        'tfidf_matrix': tfidf_matrix,
+        'neighbours': load_neighbour_table(BOW_MODEL_PATH, tfidf_matrix.shape[0]),
+    }
+
+
+# Model files are loaded on first use (or by the warm-up hook), not at import
+tfidf_model = registry.register('movies.tfidf', _load, artifacts=[BOW_MODEL_PATH])
+
+
+def export_mmap_arrays():
+    """Export the large arrays as memory-mapped .npy files (see artifacts.py)."""
+    return export_arrays(tfidf_model, BOW_MODEL_PATH, ['tfidf_matrix', POSTINGS_NAME])
+
+
+def build_neighbour_table(k=DEFAULT_TABLE_K):
+    """
+    Precompute the top-k neighbours of every catalog movie and save them next
+    to the model files. Returns the number of rows, or None when the model
+    files are not available.
+    """
+    state = tfidf_model.get()
+    if state is None:
+        return None
+    ids, scores = table_from_kneighbors(state['index'], state['tfidf_matrix'], k)
+    save_neighbour_table(BOW_MODEL_PATH, ids, scores)
+    # Reload so the new table is served
+    tfidf_model.reset()
+    return len(ids)
+
+
+def recommend_movies_sparse_list(movie_titles, n=5, seed=None):
+    """
+    Recommend the n nearest TF-IDF neighbours of each input title.
+    - seed: accepted for a uniform recommender interface; the results are not random
+    """
     recommendations = {}
-    
+
     # Check if model files are loaded
-    if tfidf is None or model is None or not title_to_index or tfidf_matrix is None:
+    state = tfidf_model.get()
+    if state is None:
         for movie_title in movie_titles:
             recommendations[movie_title] = "TF-IDF model not available - please check model files"
         return recommendations
-    
+
+    index = state['index']
+    title_to_index = state['title_to_index']
+    index_to_title = state['index_to_title']
+    tfidf_matrix = state['tfidf_matrix']
+    neighbours = state['neighbours']
+
+    rows = {title: title_to_index[title] for title in movie_titles if title in title_to_index}
+
+    def kneighbors_rows(titles):
+        distances, indices = index.kneighbors(tfidf_matrix[[rows[title] for title in titles]], n_neighbors=n + 1)
+        return {
+            title: row_indices[row_indices != rows[title]]
+            for title, row_indices in zip(titles, indices)
+        }
+
+    # Neighbours from the precomputed table, otherwise from the pool cache or
+    # one kneighbors call for all uncached input titles
+    if neighbours is not None and neighbours.covers(n):
+        neighbour_rows = {title: neighbours.neighbours(idx, n) for title, idx in rows.items()}
+    else:
+        neighbour_rows = cached_pools(tfidf_model, rows, n, kneighbors_rows)
+
     for movie_title in movie_titles:
         if movie_title not in title_to_index:
             recommendations[movie_title] = f"'{movie_title}' not found."
             continue
 
-        idx = title_to_index[movie_title]
-        distances, indices = model.kneighbors(tfidf_matrix[idx], n_neighbors=n + 1)
-        recommended = [list(title_to_index.keys())[list(title_to_index.values()).index(i)]
-                       for i in indices.flatten() if i != idx]
+        recommended = index_to_title[neighbour_rows[movie_title]].tolist()
         recommendations[movie_title] = recommended[:n]
-    return recommendations
\ No newline at end of file
+    return recommendations
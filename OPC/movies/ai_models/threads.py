@@ -0,0 +1,70 @@
+"""
+Intra-op thread budget of the recommender models.
+
+NumPy's BLAS, torch and TensorFlow each start one thread per core for a
+single matrix product by default. With threaded workers (gunicorn gthread or
+an ASGI server) several requests run those products at the same time, so a
+worker with N request threads would ask for N x cores threads and spend its
+time switching between them. configure_intra_op_threads() caps every library
+at the same per-call budget:
+
+- the OMP/OpenBLAS/MKL/TensorFlow environment variables, for libraries that
+  are imported later (torch and TensorFlow are imported by the model loaders)
+- threadpoolctl, for the BLAS libraries already loaded in the process
+- torch.set_num_threads, when torch is already imported
+
+It runs when the WSGI/ASGI application starts, before the models are warmed
+up. Recommender state itself is shared read-only between request threads
+(see model_loader.py).
+"""
+import logging
+import os
+import sys
+
+logger = logging.getLogger(__name__)
+
+THREAD_ENV_VARIABLES = [
+    'OMP_NUM_THREADS',
+    'OPENBLAS_NUM_THREADS',
+    'MKL_NUM_THREADS',
+    'VECLIB_MAXIMUM_THREADS',
+    'NUMEXPR_NUM_THREADS',
+    'TF_NUM_INTRAOP_THREADS',
+]
+
+
+def intra_op_threads(configured=0, workers=1, request_threads=1):
+    """
+    Threads one model call may use: the configured count, or when it is 0
+    the cores divided between every request thread of every worker.
+    """
+    if configured and configured > 0:
+        return configured
+    return max(1, (os.cpu_count() or 1) // max(1, workers * request_threads))
+
+
+def configure_intra_op_threads(threads):
+    """
+    Cap BLAS, torch and TensorFlow at threads per call. Environment
+    variables already set by the deployment are left alone.
+
+    Returns:
+        int: the thread count applied
+    """
+    for name in THREAD_ENV_VARIABLES:
+        os.environ.setdefault(name, str(threads))
+    # One inter-op thread: parallelism comes from the request threads
+    os.environ.setdefault('TF_NUM_INTEROP_THREADS', '1')
+
+    try:
+        from threadpoolctl import threadpool_limits
+
+        threadpool_limits(limits=threads)
+    except ImportError:
+        pass
+
+    if 'torch' in sys.modules:
+        sys.modules['torch'].set_num_threads(threads)
+
+    logger.info(f"Recommender intra-op threads set to {threads}")
+    return threads
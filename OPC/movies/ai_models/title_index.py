@@ -0,0 +1,67 @@
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+WHITESPACE = re.compile(r'\s+')
+YEAR_SUFFIX = re.compile(r'\s*\(\d{4}\)$')
+
+
+def normalize_title(title):
+    """
+    Normalize a title for lookup: case-folded with whitespace collapsed.
+    """
+    return WHITESPACE.sub(' ', str(title)).strip().casefold()
+
+
+def fold_year(normalized_title):
+    """
+    Drop a trailing release year, so 'toy story (1995)' and 'toy story' meet.
+    """
+    return YEAR_SUFFIX.sub('', normalized_title)
+
+
+class TitleIndex:
+    """
+    O(1) title -> row lookup over a catalog, built once per model artifact.
+
+    Titles are matched on their normalized form first and on their
+    year-folded form second. When several rows share a key they are kept in
+    ascending row order, so an ambiguous title always resolves to the same
+    (first) row.
+    """
+
+    def __init__(self, titles):
+        self._exact = {}
+        self._folded = {}
+        for row, title in enumerate(titles):
+            if not isinstance(title, str):
+                continue
+            key = normalize_title(title)
+            self._exact.setdefault(key, []).append(row)
+            self._folded.setdefault(fold_year(key), []).append(row)
+
+    def __len__(self):
+        return len(self._exact)
+
+    def candidates(self, title):
+        """Return every row matching the title, in ascending row order."""
+        key = normalize_title(title)
+        rows = self._exact.get(key)
+        if rows is None:
+            rows = self._folded.get(fold_year(key), [])
+        return rows
+
+    def resolve(self, title):
+        """
+        Return the row for a title, or None when it is not in the catalog.
+
+        Ambiguous titles resolve to the lowest matching row and are logged
+        with every candidate row.
+        """
+        rows = self.candidates(title)
+        if not rows:
+            return None
+        if len(rows) > 1:
+            logger.info(f"Title '{title}' is ambiguous (rows {rows}); using row {rows[0]}")
+        return rows[0]
@@ -0,0 +1,306 @@
+"""
+Vector indexes for the embedding recommenders.
+
+All indexes work on L2-normalized float32 vectors and rank by inner product
+(cosine similarity). Three variants are available:
+
+- 'exact': brute-force scores against every vector.
+- 'ivf': inverted-file index. Vectors are clustered with spherical k-means
+  and a query only scores the vectors of its `nprobe` closest clusters.
+- 'exact_int8' / 'ivf_int8': the same, scoring against int8-quantized vectors
+  (one scale per vector) and re-ranking the best candidates in float32. The
+  codes are a quarter of the size of the float vectors, so with memory-mapped
+  embeddings only the codes stay hot and float rows are read for re-ranking.
+
+Indexes are built with `manage.py build_vector_index` and persisted as a
+single .npz file next to the embeddings they index.
+"""
+import logging
+import os
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILENAME = 'vector_index.npz'
+INDEX_KINDS = ['exact', 'exact_int8', 'ivf', 'ivf_int8']
+
+# How many int8 candidates per requested result are re-ranked in float32
+RERANK_FACTOR = 4
+
+
+def normalize_rows(vectors):
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def top_k(scores, k):
+    """
+    Return (ids, scores) of the k highest scores of each row, best first.
+
+    Ties are broken by the lower id, so the result does not depend on the
+    partitioning: rows tied at the k-th score keep the same k ids wherever
+    the top k is computed (live or in a precomputed neighbour table).
+    """
+    scores = np.atleast_2d(scores)
+    k = min(k, scores.shape[1])
+    if k <= 0:
+        return np.empty((scores.shape[0], 0), dtype=np.int64), np.empty((scores.shape[0], 0), dtype=scores.dtype)
+    ids = np.empty((scores.shape[0], k), dtype=np.int64)
+    for i, row in enumerate(scores):
+        kth = row[np.argpartition(-row, k - 1)[k - 1]]
+        above = np.flatnonzero(row > kth)
+        tied = np.flatnonzero(row == kth)[:k - len(above)]
+        candidates = np.concatenate([above, tied])
+        # Stable sort of ascending ids: equal scores stay in id order
+        ids[i] = candidates[np.argsort(-row[candidates], kind='stable')]
+    return ids, np.take_along_axis(scores, ids, axis=1)
+
+
+def quantize(vectors):
+    """Quantize normalized vectors to int8 codes with one float32 scale per vector."""
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.round(vectors / scales[:, None]).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+class ExactIndex:
+    """
+    Brute-force inner-product search over every vector.
+    """
+    kind = 'exact'
+
+    def __init__(self, vectors, codes=None, scales=None):
+        self.vectors = vectors
+        self.codes = codes
+        self.scales = scales
+
+    @property
+    def quantized(self):
+        return self.codes is not None
+
+    @classmethod
+    def build(cls, vectors, quantized=False):
+        codes, scales = quantize(vectors) if quantized else (None, None)
+        return cls(vectors, codes, scales)
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def _score(self, rows, queries, block_size=8192):
+        """Score queries against a subset of rows (all rows when rows is None)."""
+        if self.codes is None:
+            vectors = self.vectors if rows is None else self.vectors[rows]
+            return queries @ vectors.T
+        codes = self.codes if rows is None else self.codes[rows]
+        scales = self.scales if rows is None else self.scales[rows]
+        # Dequantize block by block so the float32 temporary stays small
+        scores = np.empty((len(queries), len(codes)), dtype=np.float32)
+        for start in range(0, len(codes), block_size):
+            block = codes[start:start + block_size].astype(np.float32)
+            scores[:, start:start + block_size] = (queries @ block.T) * scales[start:start + block_size]
+        return scores
+
+    def _rerank(self, candidates, queries, k):
+        """Re-score int8 candidates with the float vectors and keep the top k."""
+        exact = np.einsum('qd,qcd->qc', queries, self.vectors[candidates])
+        ids, scores = top_k(exact, k)
+        return np.take_along_axis(candidates, ids, axis=1), scores
+
+    def search(self, queries, k):
+        """
+        Args:
+            queries: Normalized query vector(s), shape (d,) or (q, d)
+            k: Number of neighbours per query
+        Returns:
+            (ids, scores): int64 and float32 arrays of shape (q, k), best first
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        if self.codes is None:
+            return top_k(self._score(None, queries), k)
+        candidates, _ = top_k(self._score(None, queries), k * RERANK_FACTOR)
+        return self._rerank(candidates, queries, k)
+
+    def arrays(self):
+        arrays = {}
+        if self.codes is not None:
+            arrays['codes'] = self.codes
+            arrays['scales'] = self.scales
+        return arrays
+
+    def save(self, path):
+        np.savez(path, kind=np.array(self.kind if not self.quantized else f'{self.kind}_int8'), **self.arrays())
+
+
+class IVFIndex(ExactIndex):
+    """
+    Inverted-file index: a query scores only the vectors of the nprobe
+    clusters whose centroids are closest to it.
+    """
+    kind = 'ivf'
+
+    def __init__(self, vectors, centroids, list_offsets, list_ids, nprobe=8, codes=None, scales=None):
+        super().__init__(vectors, codes, scales)
+        self.centroids = centroids
+        self.list_offsets = list_offsets
+        self.list_ids = list_ids
+        self.nprobe = nprobe
+
+    @classmethod
+    def build(cls, vectors, quantized=False, n_lists=None, nprobe=8, iterations=10, seed=0):
+        n = len(vectors)
+        n_lists = n_lists or max(1, int(4 * np.sqrt(n)))
+        n_lists = min(n_lists, n)
+        rng = np.random.default_rng(seed)
+
+        # Spherical k-means on a training sample of the catalog
+        sample = vectors[rng.choice(n, size=min(n, n_lists * 256), replace=False)]
+        centroids = sample[rng.choice(len(sample), size=n_lists, replace=False)].copy()
+        for _ in range(iterations):
+            assignment = cls._assign(sample, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            empty = ~sums.any(axis=1)
+            sums[empty] = centroids[empty]
+            centroids = normalize_rows(sums)
+
+        assignment = cls._assign(vectors, centroids)
+        list_ids = np.argsort(assignment, kind='stable').astype(np.int32)
+        list_offsets = np.zeros(n_lists + 1, dtype=np.int64)
+        list_offsets[1:] = np.cumsum(np.bincount(assignment, minlength=n_lists))
+
+        codes, scales = quantize(vectors) if quantized else (None, None)
+        return cls(vectors, centroids, list_offsets, list_ids, nprobe, codes, scales)
+
+    @staticmethod
+    def _assign(vectors, centroids, batch_size=8192):
+        assignment = np.empty(len(vectors), dtype=np.int64)
+        for start in range(0, len(vectors), batch_size):
+            batch = vectors[start:start + batch_size]
+            assignment[start:start + batch_size] = np.argmax(batch @ centroids.T, axis=1)
+        return assignment
+
+    def search(self, queries, k, nprobe=None):
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        nprobe = min(nprobe or self.nprobe, len(self.centroids))
+        probe_lists, _ = top_k(queries @ self.centroids.T, nprobe)
+
+        all_ids = np.empty((len(queries), k), dtype=np.int64)
+        all_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        for q, lists in enumerate(probe_lists):
+            rows = np.concatenate([
+                self.list_ids[self.list_offsets[i]:self.list_offsets[i + 1]] for i in lists
+            ])
+            query = queries[q:q + 1]
+            if self.codes is None:
+                ids, scores = top_k(self._score(rows, query), k)
+                ids = rows[ids]
+            else:
+                candidates, _ = top_k(self._score(rows, query), k * RERANK_FACTOR)
+                ids, scores = self._rerank(rows[candidates], query, k)
+
+            found = ids.shape[1]
+            all_ids[q, :found] = ids[0]
+            all_scores[q, :found] = scores[0]
+            all_ids[q, found:] = -1
+        return all_ids, all_scores
+
+    def arrays(self):
+        arrays = super().arrays()
+        arrays.update(
+            centroids=self.centroids,
+            list_offsets=self.list_offsets,
+            list_ids=self.list_ids,
+            nprobe=np.array(self.nprobe),
+        )
+        return arrays
+
+
+INDEX_CLASSES = {'exact': ExactIndex, 'ivf': IVFIndex}
+
+
+def build_index(vectors, kind='exact', **params):
+    """
+    Build an index of the given kind over normalized vectors.
+    """
+    if kind not in INDEX_KINDS:
+        raise ValueError(f"Unknown vector index kind '{kind}'. Choose from {INDEX_KINDS}.")
+    base_kind, _, suffix = kind.partition('_')
+    return INDEX_CLASSES[base_kind].build(vectors, quantized=suffix == 'int8', **params)
+
+
+def load_index(path, vectors):
+    """
+    Load a persisted index for the given normalized vectors.
+    """
+    with np.load(path) as data:
+        kind = str(data['kind'])
+        base_kind = kind.partition('_')[0]
+        codes = data['codes'] if 'codes' in data else None
+        scales = data['scales'] if 'scales' in data else None
+        if codes is not None and len(codes) != len(vectors):
+            raise ValueError(f"Vector index at {path} was built for {len(codes)} vectors, not {len(vectors)}")
+        if base_kind == 'ivf':
+            if len(data['list_ids']) != len(vectors):
+                raise ValueError(f"Vector index at {path} was built for {len(data['list_ids'])} vectors, not {len(vectors)}")
+            return IVFIndex(vectors, data['centroids'], data['list_offsets'], data['list_ids'],
+                            int(data['nprobe']), codes, scales)
+        return ExactIndex(vectors, codes, scales)
+
+
+def load_vector_index(directory, vectors):
+    """
+    Open the index saved in a model directory for the given normalized
+    vectors.
+
+    Returns an ExactIndex when there is no saved index, or when it can't be
+    loaded or was built for a different catalog; rebuild it with
+    `manage.py build_vector_index`.
+    """
+    path = os.path.join(directory, INDEX_FILENAME)
+    if not os.path.exists(path):
+        return ExactIndex(vectors)
+    try:
+        return load_index(path, vectors)
+    except Exception as e:
+        logger.warning(f"Ignoring vector index {path}, using exact search: {e}")
+        return ExactIndex(vectors)
+
+
+def evaluate_index(index, vectors, k=10, sample=200, seed=0):
+    """
+    Measure recall@k and per-query latency of an index against exact search,
+    using catalog vectors as queries.
+
+    Returns:
+        dict: recall, exact_ms and index_ms (mean milliseconds per query)
+    """
+    rng = np.random.default_rng(seed)
+    query_rows = rng.choice(len(vectors), size=min(sample, len(vectors)), replace=False)
+    exact = ExactIndex(vectors)
+
+    hits = 0
+    exact_seconds = 0.0
+    index_seconds = 0.0
+    for row in query_rows:
+        query = vectors[row]
+
+        started = time.perf_counter()
+        expected, _ = exact.search(query, k)
+        exact_seconds += time.perf_counter() - started
+
+        started = time.perf_counter()
+        found, _ = index.search(query, k)
+        index_seconds += time.perf_counter() - started
+
+        hits += len(np.intersect1d(expected[0], found[0]))
+
+    return {
+        'recall': hits / (len(query_rows) * k),
+        'exact_ms': exact_seconds * 1000 / len(query_rows),
+        'index_ms': index_seconds * 1000 / len(query_rows),
+    }
@@ -0,0 +1,79 @@
+"""
+Async recommendation endpoints shared by the movies, books and courses apps.
+
+Under an ASGI server a request that waits on a worker thread costs a
+suspended coroutine, not a worker, so one process holds many in-flight
+requests. AsyncAPIView is an APIView with an async dispatch: authentication,
+permissions and throttling run as usual (in a thread, as they may query the
+database) and the async post() handler awaits the model work.
+
+run_inference() runs a recommend function on a bounded thread pool shared by
+the process (RECOMMENDER_EXECUTOR_WORKERS threads). Threads rather than
+processes, because the models are loaded once per process and are safe to
+share between threads (see model_loader.py); NumPy/SciPy release the GIL
+for the heavy products. When the client disconnects, the ASGI handler
+cancels the view: jobs still queued in the pool are dropped, a running job
+finishes and its result is discarded.
+"""
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from rest_framework.views import APIView
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def inference_executor():
+    """The process-wide thread pool the async endpoints run model calls on."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.RECOMMENDER_EXECUTOR_WORKERS,
+                    thread_name_prefix='recommender',
+                )
+    return _executor
+
+
+async def run_inference(recommend, *args, **kwargs):
+    """Await recommend(*args, **kwargs) run on the inference pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(inference_executor(), functools.partial(recommend, *args, **kwargs))
+
+
+class AsyncAPIView(APIView):
+    """
+    APIView whose handlers are coroutines (async def post).
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            # Authentication loads the user from the database
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+
+            response = handler(request, *args, **kwargs)
+            if asyncio.iscoroutine(response):
+                response = await response
+
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
@@ -0,0 +1,219 @@
+"""
+In-memory title autocomplete for the search boxes of the three apps.
+
+TitleAutocomplete keeps every distinct normalized title, and every suffix of
+it starting at a word, in one sorted list; the titles completing a prefix are
+a contiguous range found by bisection. Results are ordered by popularity
+(how often a title was used as a recommendation input in the history
+tables), so the top suggestions for short prefixes, whose ranges are large,
+are precomputed when the index is built. When a prefix completes nothing,
+prefixes within edit distance 1 are tried instead.
+
+The index is built from the catalog tables on first use, or at startup by
+the registry warm-up. Lookups never touch the database: once the index is
+older than AUTOCOMPLETE_REFRESH_INTERVAL seconds, a background thread
+rebuilds it (picking up catalog imports and new history) while lookups keep
+using the current one. A failed build is retried by the next lookup.
+"""
+import heapq
+import logging
+import threading
+import time
+from bisect import bisect_left, bisect_right
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Count
+
+from .ai_models.model_loader import registry
+from .ai_models.title_index import normalize_title
+from .models import Movie, RecommendationHistory
+
+logger = logging.getLogger(__name__)
+
+# Top suggestions are precomputed for prefixes up to this length
+PRECOMPUTED_PREFIX_LENGTH = 3
+
+# Suggestions returned by default, and at most
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+
+# Edit-distance-1 fallbacks are only tried for prefixes of these lengths
+MIN_FUZZY_LENGTH = 3
+MAX_FUZZY_LENGTH = 24
+
+
+class TitleAutocomplete:
+    """
+    Sorted-prefix index over a list of titles with popularity counts.
+    """
+
+    def __init__(self, titles, popularity=None):
+        popularity = popularity or {}
+        # One entry per normalized title: catalogs list some titles several times
+        by_key = {}
+        for title in titles:
+            by_key.setdefault(normalize_title(title), title)
+        self.titles = list(by_key.values())
+        self.popularity = [popularity.get(key, 0) for key in by_key]
+
+        entries = set()
+        for row, key in enumerate(by_key):
+            start = 0
+            while True:
+                entries.add((key[start:], row))
+                start = key.find(' ', start) + 1
+                if start == 0:
+                    break
+        entries = sorted(entries)
+        self._keys = [key for key, _ in entries]
+        self._rows = [row for _, row in entries]
+
+        # Top suggestions of the short prefixes, which match the most titles
+        buckets = {}
+        for key, row in entries:
+            for length in range(1, min(len(key), PRECOMPUTED_PREFIX_LENGTH) + 1):
+                buckets.setdefault(key[:length], set()).add(row)
+        self._top = {prefix: self._best(rows, MAX_LIMIT) for prefix, rows in buckets.items()}
+
+    def __len__(self):
+        return len(self.titles)
+
+    def _rank(self, row):
+        # Most popular first, then shorter and alphabetically earlier titles
+        return (-self.popularity[row], len(self.titles[row]), self.titles[row])
+
+    def _best(self, rows, limit):
+        return heapq.nsmallest(limit, rows, key=self._rank)
+
+    def _prefix_rows(self, prefix, limit):
+        if len(prefix) <= PRECOMPUTED_PREFIX_LENGTH:
+            return self._top.get(prefix, [])[:limit]
+        start = bisect_left(self._keys, prefix)
+        end = bisect_right(self._keys, prefix + '\uffff', start)
+        return self._best(set(self._rows[start:end]), limit)
+
+    def _has_prefix(self, prefix):
+        start = bisect_left(self._keys, prefix)
+        return start < len(self._keys) and self._keys[start].startswith(prefix)
+
+    def _next_chars(self, prefix):
+        """The characters following prefix in the index, skipping from one to the next."""
+        chars = []
+        start = bisect_left(self._keys, prefix)
+        while start < len(self._keys) and self._keys[start].startswith(prefix):
+            key = self._keys[start]
+            if len(key) == len(prefix):
+                start += 1
+                continue
+            char = key[len(prefix)]
+            chars.append(char)
+            start = bisect_left(self._keys, prefix + chr(ord(char) + 1), start)
+        return chars
+
+    def _fuzzy_prefixes(self, prefix):
+        """
+        Indexed prefixes within edit distance 1 of prefix.
+
+        The edit position only advances while the unedited part is itself an
+        indexed prefix, and inserted or replacing characters are limited to
+        those that follow it in the index.
+        """
+        variants = set()
+        for i in range(len(prefix) + 1):
+            left, right = prefix[:i], prefix[i:]
+            if not self._has_prefix(left):
+                break
+            if right:
+                variants.add(left + right[1:])
+            if len(right) > 1:
+                variants.add(left + right[1] + right[0] + right[2:])
+            for char in self._next_chars(left):
+                variants.add(left + char + right)
+                if right:
+                    variants.add(left + char + right[1:])
+        variants.discard(prefix)
+        return [variant for variant in variants if self._has_prefix(variant)]
+
+    def complete(self, query, limit=DEFAULT_LIMIT):
+        """
+        Return up to limit titles completing query, most popular first.
+
+        Falls back to prefixes within edit distance 1 when nothing matches.
+        """
+        prefix = normalize_title(query)
+        if not prefix:
+            return []
+
+        rows = self._prefix_rows(prefix, limit)
+        if not rows and MIN_FUZZY_LENGTH <= len(prefix) <= MAX_FUZZY_LENGTH:
+            candidates = set()
+            for variant in self._fuzzy_prefixes(prefix):
+                candidates.update(self._prefix_rows(variant, limit))
+            rows = self._best(candidates, limit)
+        return [self.titles[row] for row in rows]
+
+
+def history_popularity(history_model):
+    """Count how often each (normalized) title was a recommendation input."""
+    popularity = {}
+    counts = history_model.objects.values('input_title').annotate(uses=Count('id')).values_list('input_title', 'uses')
+    for title, uses in counts.iterator():
+        key = normalize_title(title)
+        popularity[key] = popularity.get(key, 0) + uses
+    return popularity
+
+
+def build_autocomplete(catalog_model, title_field, history_model):
+    titles = catalog_model.objects.values_list(title_field, flat=True).iterator()
+    return TitleAutocomplete(titles, history_popularity(history_model))
+
+
+# Names of the autocomplete indexes being rebuilt in the background
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+
+
+def _refresh(handle):
+    try:
+        handle.refresh()
+    finally:
+        # Connections are per thread; don't leave this one open
+        connections.close_all()
+        with _refreshing_lock:
+            _refreshing.discard(handle.name)
+
+
+def refresh_in_background(handle):
+    """Rebuild a registered autocomplete index in a background thread, unless one is running."""
+    with _refreshing_lock:
+        if handle.name in _refreshing:
+            return
+        _refreshing.add(handle.name)
+    threading.Thread(target=_refresh, args=(handle,), name=f'{handle.name}-refresh', daemon=True).start()
+
+
+def complete_titles(handle, query, limit=DEFAULT_LIMIT):
+    """
+    Complete query with a registered autocomplete index.
+
+    Returns [] when the index failed to build; the next call builds it again.
+    """
+    index = handle.get()
+    if index is None:
+        handle.reset()
+        return []
+
+    interval = settings.AUTOCOMPLETE_REFRESH_INTERVAL
+    loaded_at = handle.loaded_at
+    if interval and loaded_at is not None and time.monotonic() - loaded_at >= interval:
+        refresh_in_background(handle)
+    return index.complete(query, limit)
+
+
+def _load():
+    return build_autocomplete(Movie, 'title', RecommendationHistory)
+
+
+# Built on first use (or by the warm-up hook), rebuilt periodically by complete_titles()
+movie_autocomplete = registry.register('movies.autocomplete', _load)
@@ -0,0 +1,261 @@
+"""
+Recommendation history persistence shared by the movies, books and courses apps.
+
+Views build unsaved history rows and hand them to write_history(). They are
+inserted right away unless HISTORY_WRITE_BEHIND is enabled: then the rows go
+into a bounded in-process queue and a background thread inserts them in
+batches, so saving history never adds database latency (or SQLite's write
+lock) to the recommendation response. Explicit saves (the save-selected
+endpoints) always call insert_history() so they can report errors.
+
+Either way a batch is inserted with one bulk_create per history model
+inside a single transaction, instead of one INSERT (and autocommit) per
+entry.
+"""
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections, transaction
+
+logger = logging.getLogger(__name__)
+
+# Queued by stop() to wake a flusher waiting for its batch to fill
+_WAKE = object()
+
+
+def history_user(request):
+    return request.user if request.user.is_authenticated else None
+
+
+def history_entries(model, user, model_used, results):
+    """
+    Build unsaved history rows for every list result of {input_title: recommended}.
+
+    Messages (model not available, title not found) are skipped.
+    """
+    return [
+        model(user=user, input_title=input_title, recommended_titles=recommended, model_used=model_used)
+        for input_title, recommended in results.items()
+        if isinstance(recommended, list)
+    ]
+
+
+def insert_history(entries):
+    """Insert history rows, possibly of several history models, in one transaction."""
+    by_model = {}
+    for entry in entries:
+        by_model.setdefault(type(entry), []).append(entry)
+    if not by_model:
+        return 0
+
+    with transaction.atomic():
+        for model, model_entries in by_model.items():
+            model.objects.bulk_create(model_entries)
+    return len(entries)
+
+
+class HistoryWriter:
+    """
+    Write-behind queue for history rows, flushed by a background thread.
+
+    The flusher inserts up to batch_size rows at a time, waiting at most
+    flush_interval seconds for a batch to fill. When the queue is full the
+    caller inserts its rows itself (backpressure instead of dropping
+    history), which is counted in the stats. The thread is started on first
+    use in each process, so workers forked by gunicorn get their own, and
+    the queue is drained when the process exits.
+    """
+
+    def __init__(self, max_size=10000, batch_size=500, flush_interval=1.0):
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._stopping = threading.Event()
+        self._counters = {
+            'enqueued': 0,
+            'written': 0,
+            'failed': 0,
+            'flushes': 0,
+            'overflow_writes': 0,
+            'max_depth': 0,
+        }
+
+    def _count(self, name, value=1):
+        with self._lock:
+            self._counters[name] += value
+
+    def _ensure_started(self):
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            # A queue and thread inherited through fork are not usable here
+            self._queue = queue.Queue(maxsize=self.max_size)
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name='history-writer', daemon=True)
+            self._thread.start()
+            if self._pid is None:
+                atexit.register(self.stop)
+            self._pid = os.getpid()
+
+    def submit(self, entries):
+        """Queue history rows for insertion; returns the number of rows accepted."""
+        entries = list(entries)
+        if not entries:
+            return 0
+        self._ensure_started()
+
+        queued = 0
+        for entry in entries:
+            try:
+                self._queue.put_nowait(entry)
+            except queue.Full:
+                break
+            queued += 1
+
+        depth = self._queue.qsize()
+        with self._lock:
+            self._counters['enqueued'] += queued
+            self._counters['max_depth'] = max(self._counters['max_depth'], depth)
+
+        if queued < len(entries):
+            # Backpressure: the request pays for the write instead of losing history
+            overflow = entries[queued:]
+            logger.warning(f"History queue full ({self.max_size} rows), writing {len(overflow)} rows synchronously")
+            self._count('overflow_writes', len(overflow))
+            self._write(overflow)
+        return len(entries)
+
+    def _next_batch(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                entry = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if entry is _WAKE:
+                break
+            batch.append(entry)
+        return batch
+
+    def _drain(self):
+        batch = []
+        while True:
+            try:
+                entry = self._queue.get_nowait()
+            except queue.Empty:
+                return batch
+            if entry is not _WAKE:
+                batch.append(entry)
+
+    def _write(self, batch):
+        """
+        Insert a batch. A batch mixes rows of many requests, so when it fails
+        it is split in halves and retried, down to single rows: only the bad
+        rows are lost.
+        """
+        try:
+            insert_history(batch)
+            self._count('written', len(batch))
+        except Exception as e:
+            if len(batch) == 1:
+                logger.error(f"Failed to write history row for {batch[0].input_title!r}: {e}")
+                self._count('failed')
+                return
+            logger.warning(f"Failed to write {len(batch)} history rows, retrying in halves: {e}")
+            middle = len(batch) // 2
+            self._write(batch[:middle])
+            self._write(batch[middle:])
+
+    def _run(self):
+        try:
+            while not self._stopping.is_set():
+                batch = self._next_batch()
+                if batch:
+                    self._write(batch)
+                    self._count('flushes')
+        finally:
+            batch = self._drain()
+            if batch:
+                self._write(batch)
+                self._count('flushes')
+            # Connections are per thread; don't leave this one open
+            connections.close_all()
+
+    def flush(self, timeout=10.0):
+        """Wait until the rows queued so far have been taken by the flusher."""
+        deadline = time.monotonic() + timeout
+        while self._queue is not None and not self._queue.empty() and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def stop(self, timeout=10.0):
+        """Drain the queue and stop the flusher thread (called at process exit)."""
+        thread = self._thread
+        if thread is None or self._pid != os.getpid() or not thread.is_alive():
+            return
+        self._stopping.set()
+        try:
+            self._queue.put_nowait(_WAKE)
+        except queue.Full:
+            # The flusher isn't waiting on a full queue
+            pass
+        thread.join(timeout)
+        if thread.is_alive():
+            logger.warning(f"History writer did not drain within {timeout}s, {self._queue.qsize()} rows left")
+        else:
+            logger.info(f"History writer drained: {self.stats()}")
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+        stats['depth'] = self._queue.qsize() if self._queue is not None else 0
+        stats['capacity'] = self.max_size
+        return stats
+
+
+history_writer = HistoryWriter(
+    max_size=settings.HISTORY_QUEUE_SIZE,
+    batch_size=settings.HISTORY_BATCH_SIZE,
+    flush_interval=settings.HISTORY_FLUSH_INTERVAL,
+)
+
+
+def write_history(entries):
+    """
+    Persist history rows, through the write-behind queue when it is enabled.
+
+    Returns the number of rows written or queued.
+    """
+    if settings.HISTORY_WRITE_BEHIND:
+        return history_writer.submit(entries)
+    return insert_history(entries)
+
+
+async def awrite_history(entries):
+    """
+    write_history() for async views. Rows of a single history model are
+    inserted with the async ORM when write-behind is disabled; queueing (which
+    may fall back to a synchronous write) and multi-model inserts run in a
+    thread.
+    """
+    entries = list(entries)
+    if settings.HISTORY_WRITE_BEHIND or len({type(entry) for entry in entries}) > 1:
+        return await sync_to_async(write_history)(entries)
+    if entries:
+        await type(entries[0]).objects.abulk_create(entries)
+    return len(entries)
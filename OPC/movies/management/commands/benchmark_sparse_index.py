@@ -0,0 +1,61 @@
+import importlib
+
+import joblib
+from django.core.management.base import BaseCommand, CommandError
+
+from movies.ai_models.model_loader import registry
+from movies.ai_models.sparse_index import SparseCosineIndex, evaluate_cosine_index
+
+# Sparse cosine models: registered name -> (module, state key of the catalog matrix)
+SPARSE_MODELS = {
+    'movies.knn': ('movies.ai_models.knn', 'sparse_matrix'),
+    'movies.tfidf': ('movies.ai_models.tfidf', 'tfidf_matrix'),
+    'books.knn': ('books.ai_models.KNN', 'sparse_matrix'),
+    'books.tfidf': ('books.ai_models.tfidf', 'tfidf_matrix'),
+}
+
+
+class Command(BaseCommand):
+    help = "Compare the sparse cosine index with sklearn NearestNeighbors on single-row queries"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'models',
+            nargs='*',
+            help=f"Models to benchmark ({', '.join(sorted(SPARSE_MODELS))}); all sparse models when omitted",
+        )
+        parser.add_argument('--k', type=int, default=10, help="Neighbours per query (default: 10)")
+        parser.add_argument('--sample', type=int, default=200, help="Catalog rows queried (default: 200)")
+
+    def handle(self, *args, **options):
+        # Checked here rather than with argparse choices, which reject an
+        # empty nargs='*' list
+        unknown = [name for name in options['models'] if name not in SPARSE_MODELS]
+        if unknown:
+            raise CommandError(
+                f"Unknown model(s): {', '.join(unknown)} (choose from {', '.join(sorted(SPARSE_MODELS))})"
+            )
+
+        for name in options['models'] or SPARSE_MODELS:
+            path, matrix_key = SPARSE_MODELS[name]
+            module = importlib.import_module(path)
+            handle = registry[name]
+
+            state = handle.get()
+            if state is None:
+                self.stdout.write(self.style.ERROR(f"{name:<14} skipped: model files not available"))
+                continue
+            if not isinstance(state['index'], SparseCosineIndex):
+                self.stdout.write(self.style.WARNING(f"{name:<14} skipped: model does not rank by cosine distance"))
+                continue
+
+            # The served state doesn't keep the sklearn model; load it to compare with
+            model = joblib.load(module.MODEL_PATH)
+            report = evaluate_cosine_index(state['index'], model, state[matrix_key],
+                                           k=options['k'], sample=options['sample'])
+            speedup = report['sklearn_ms'] / max(report['index_ms'], 1e-9)
+            self.stdout.write(
+                f"{name:<14} recall@{options['k']}: {report['recall']:.3f}  "
+                f"sklearn: {report['sklearn_ms']:.2f} ms/query  "
+                f"index: {report['index_ms']:.2f} ms/query  ({speedup:.1f}x)"
+            )
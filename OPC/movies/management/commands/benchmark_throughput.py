@@ -0,0 +1,81 @@
+import importlib
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+
+from books.models import Book
+from movies.ai_models.model_loader import registry
+from movies.ai_models.result_cache import CACHE_ALIAS
+from movies.ai_models.threads import configure_intra_op_threads, intra_op_threads
+from movies.models import Movie
+
+# Title-based recommenders: registered name -> (module, recommend function, catalog model)
+RECOMMENDERS = {
+    'movies.knn': ('movies.ai_models.knn', 'recommend_movies_knn', Movie),
+    'movies.tfidf': ('movies.ai_models.tfidf', 'recommend_movies_sparse_list', Movie),
+    'movies.genre_based': ('movies.ai_models.Genre_Based', 'recommend_movies_by_genre', Movie),
+    'movies.knn_genre': ('movies.ai_models.knn_genre', 'recommend_movies_by_knn_genre', Movie),
+    'movies.embeddings': ('movies.ai_models.Embeddings', 'recommend_movies_embeddings', Movie),
+    'movies.nn': ('movies.ai_models.NN', 'recommend_movies_nn', Movie),
+    'books.knn': ('books.ai_models.KNN', 'recommend_books_knn', Book),
+    'books.tfidf': ('books.ai_models.tfidf', 'recommend_books_sparse_list', Book),
+    'books.embeddings': ('books.ai_models.Embeddings', 'recommend_books_embeddings', Book),
+    'books.nn': ('books.ai_models.NN', 'recommend_books_nn', Book),
+}
+
+
+class Command(BaseCommand):
+    help = "Measure recommendation throughput with 1..N concurrent request threads in one worker"
+
+    def add_arguments(self, parser):
+        parser.add_argument('model', choices=sorted(RECOMMENDERS))
+        parser.add_argument('--threads', type=int, nargs='+', default=[1, 2, 4, 8],
+                            help="Request thread counts to compare (default: 1 2 4 8)")
+        parser.add_argument('--requests', type=int, default=200, help="Requests per run (default: 200)")
+        parser.add_argument('--n', type=int, default=5, help="Recommendations per request (default: 5)")
+        parser.add_argument('--intra-op-threads', type=int, default=settings.RECOMMENDER_INTRA_OP_THREADS,
+                            help="Threads per model call; 0 divides the cores between the request threads")
+        parser.add_argument('--keep-cache', action='store_true',
+                            help="Don't clear the recommendation pool cache before each run")
+
+    def handle(self, *args, **options):
+        path, function_name, catalog = RECOMMENDERS[options['model']]
+        recommend = getattr(importlib.import_module(path), function_name)
+        handle = registry[options['model']]
+        if handle.get() is None:
+            raise CommandError(f"{handle.name} model data not available: {handle.report()['error']}")
+
+        titles = list(catalog.objects.order_by('?').values_list('title', flat=True)[:options['requests']])
+        if not titles:
+            raise CommandError(f"The {catalog._meta.verbose_name} catalog is empty; run import_catalog first")
+        rng = np.random.default_rng(0)
+        inputs = [titles[i] for i in rng.integers(len(titles), size=options['requests'])]
+
+        def request(i):
+            started = time.perf_counter()
+            recommend([inputs[i]], options['n'], seed=i)
+            return time.perf_counter() - started
+
+        recommend([inputs[0]], options['n'], seed=0)  # warm-up
+        baseline = None
+        for request_threads in options['threads']:
+            intra_op = configure_intra_op_threads(intra_op_threads(options['intra_op_threads'], 1, request_threads))
+            if not options['keep_cache']:
+                caches[CACHE_ALIAS].clear()
+
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=request_threads) as executor:
+                latencies = np.array(list(executor.map(request, range(len(inputs)))))
+            throughput = len(inputs) / (time.perf_counter() - started)
+            baseline = baseline or throughput
+
+            self.stdout.write(
+                f"{request_threads:>3} threads x {intra_op} intra-op: "
+                f"{throughput:8.1f} req/s ({throughput / baseline:.1f}x)  "
+                f"p50 {np.percentile(latencies, 50) * 1000:7.1f} ms  "
+                f"p95 {np.percentile(latencies, 95) * 1000:7.1f} ms"
+            )
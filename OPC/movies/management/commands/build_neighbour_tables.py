@@ -0,0 +1,54 @@
+import importlib
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from movies.ai_models.neighbours import DEFAULT_TABLE_K
+
+# Movie recommender modules that can serve from a precomputed neighbour table
+NEIGHBOUR_MODULES = {
+    'knn': 'movies.ai_models.knn',
+    'tfidf': 'movies.ai_models.tfidf',
+    'genre_based': 'movies.ai_models.Genre_Based',
+    'knn_genre': 'movies.ai_models.knn_genre',
+    'embeddings': 'movies.ai_models.Embeddings',
+    'nn': 'movies.ai_models.NN',
+}
+
+
+class Command(BaseCommand):
+    help = "Precompute the top-K neighbours of every movie for each movie recommender"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'models',
+            nargs='*',
+            help=f"Models to build tables for ({', '.join(sorted(NEIGHBOUR_MODULES))}); all movie models when omitted",
+        )
+        parser.add_argument(
+            '--k',
+            type=int,
+            default=DEFAULT_TABLE_K,
+            help=f"Neighbours stored per movie (default: {DEFAULT_TABLE_K})",
+        )
+
+    def handle(self, *args, **options):
+        # Checked here rather than with argparse choices, which reject an
+        # empty nargs='*' list
+        unknown = [name for name in options['models'] if name not in NEIGHBOUR_MODULES]
+        if unknown:
+            raise CommandError(
+                f"Unknown model(s): {', '.join(unknown)} (choose from {', '.join(sorted(NEIGHBOUR_MODULES))})"
+            )
+
+        for name in options['models'] or NEIGHBOUR_MODULES:
+            module = importlib.import_module(NEIGHBOUR_MODULES[name])
+
+            started = time.perf_counter()
+            rows = module.build_neighbour_table(options['k'])
+            seconds = time.perf_counter() - started
+
+            if rows is None:
+                self.stdout.write(self.style.ERROR(f"{name:<12} skipped: model files not available"))
+            else:
+                self.stdout.write(self.style.SUCCESS(f"{name:<12} {rows} movies x {options['k']} neighbours in {seconds:.1f}s"))
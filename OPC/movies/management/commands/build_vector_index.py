@@ -0,0 +1,57 @@
+import importlib
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from movies.ai_models.model_loader import registry
+from movies.ai_models.vector_index import INDEX_FILENAME, INDEX_KINDS, build_index, evaluate_index
+
+# Embedding recommender module of each domain; its EMB_PATH is where the index is saved
+EMBEDDING_MODULES = {
+    'movies': 'movies.ai_models.Embeddings',
+    'books': 'books.ai_models.Embeddings',
+}
+
+
+class Command(BaseCommand):
+    help = "Build and persist the vector index used by the embedding recommenders"
+
+    def add_arguments(self, parser):
+        parser.add_argument('domain', choices=sorted(EMBEDDING_MODULES))
+        parser.add_argument('--kind', choices=INDEX_KINDS, default='ivf', help="Index kind (default: ivf)")
+        parser.add_argument('--lists', type=int, default=None, help="IVF clusters (default: 4 * sqrt(n))")
+        parser.add_argument('--nprobe', type=int, default=8, help="IVF clusters scanned per query (default: 8)")
+        parser.add_argument('--k', type=int, default=10, help="k used for the recall report (default: 10)")
+        parser.add_argument('--sample', type=int, default=200, help="Queries used for the recall report (default: 200)")
+        parser.add_argument('--no-report', action='store_true', help="Skip the recall/latency report")
+
+    def handle(self, *args, **options):
+        module = importlib.import_module(EMBEDDING_MODULES[options['domain']])
+        handle = registry[f"{options['domain']}.embeddings"]
+
+        # Built from the embeddings alone: the saved index may be the stale
+        # one being replaced
+        try:
+            vectors = module.catalog_vectors()
+        except Exception as e:
+            raise CommandError(f"{handle.name} embeddings not available: {e}")
+
+        params = {}
+        if options['kind'].startswith('ivf'):
+            params = {'n_lists': options['lists'], 'nprobe': options['nprobe']}
+        index = build_index(vectors, options['kind'], **params)
+
+        path = os.path.join(module.EMB_PATH, INDEX_FILENAME)
+        index.save(path)
+        self.stdout.write(self.style.SUCCESS(f"Saved {options['kind']} index over {len(vectors)} vectors to {path}"))
+
+        if not options['no_report']:
+            report = evaluate_index(index, vectors, k=options['k'], sample=options['sample'])
+            self.stdout.write(
+                f"recall@{options['k']}: {report['recall']:.3f}  "
+                f"exact: {report['exact_ms']:.2f} ms/query  "
+                f"{options['kind']}: {report['index_ms']:.2f} ms/query"
+            )
+
+        # Serve the new index the next time the model is used in this process
+        handle.reset()
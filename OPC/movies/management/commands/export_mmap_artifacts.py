@@ -0,0 +1,32 @@
+import importlib
+
+from django.core.management.base import BaseCommand
+
+from movies.ai_models.model_loader import RECOMMENDER_MODULES
+
+
+class Command(BaseCommand):
+    help = "Export the large model arrays as .npy files that every worker memory-maps"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'modules',
+            nargs='*',
+            help="Recommender modules or prefixes (e.g. 'movies.' or 'books.ai_models.KNN'); all when omitted",
+        )
+
+    def handle(self, *args, **options):
+        prefixes = options['modules']
+        for path in RECOMMENDER_MODULES:
+            if prefixes and not any(path.startswith(p) for p in prefixes):
+                continue
+
+            module = importlib.import_module(path)
+            if not hasattr(module, 'export_mmap_arrays'):
+                continue
+
+            exported = module.export_mmap_arrays()
+            if exported is None:
+                self.stdout.write(self.style.ERROR(f"{path:<32} skipped: model files not available"))
+            else:
+                self.stdout.write(self.style.SUCCESS(f"{path:<32} exported {', '.join(exported)}"))
@@ -0,0 +1,191 @@
+import csv
+import os
+import time
+from itertools import islice
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from books.autocomplete import book_autocomplete
+from books.models import Book
+from courses.autocomplete import course_autocomplete
+from courses.models import Course
+from movies.autocomplete import movie_autocomplete
+from movies.models import Movie
+from movies.search import create_search_index, drop_search_index, search_index_columns
+
+# catalog -> model, unique key field, {model field: CSV column}, default CSV
+# path and the autocomplete index over its titles
+CATALOGS = {
+    'movies': {
+        'model': Movie,
+        'unique_field': 'movie_id',
+        'columns': {'movie_id': 'movieId', 'title': 'title', 'genres': 'genres'},
+        'path': os.path.join(settings.BASE_DIR, 'movies.csv'),
+        'autocomplete': movie_autocomplete,
+    },
+    'books': {
+        'model': Book,
+        'unique_field': 'book_id',
+        'columns': {
+            'book_id': 'book_id',
+            'title': 'Title',
+            'authors': 'Authors',
+            'description': 'Description',
+            'category': 'Category',
+        },
+        'path': os.path.join(settings.BASE_DIR, 'books.csv'),
+        'autocomplete': book_autocomplete,
+    },
+    'courses': {
+        'model': Course,
+        'unique_field': 'course_id',
+        'columns': {'course_id': 'COURSE_ID', 'course_name': 'TITLE'},
+        'path': os.path.join(settings.BASE_DIR, '..', 'course_db.csv'),
+        'autocomplete': course_autocomplete,
+    },
+}
+
+
+def _chunks(rows, size):
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _secondary_indexes(model):
+    """
+    Name and column of the table's non-unique single-column indexes (the
+    db_index=True fields), as found in the database.
+    """
+    columns = {field.column for field in model._meta.local_fields if field.db_index and not field.unique}
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(cursor, model._meta.db_table)
+    return [
+        (name, info['columns'][0])
+        for name, info in constraints.items()
+        if info['index'] and not info['unique'] and not info['primary_key']
+        and len(info['columns']) == 1 and info['columns'][0] in columns
+    ]
+
+
+def _drop_indexes(indexes):
+    qn = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        for name, _ in indexes:
+            cursor.execute(f"DROP INDEX {qn(name)}")
+
+
+def _create_indexes(table, indexes):
+    qn = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        for name, column in indexes:
+            cursor.execute(f"CREATE INDEX {qn(name)} ON {qn(table)} ({qn(column)})")
+
+
+class Command(BaseCommand):
+    help = "Bulk-load the movie, book and course catalogs from CSV files (insert or update by their unique id)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'catalogs',
+            nargs='*',
+            help="Catalogs to import (movies, books, courses); those whose CSV exists when omitted",
+        )
+        parser.add_argument('--movies-csv', help="Path of the movies CSV (movieId,title,genres)")
+        parser.add_argument('--books-csv', help="Path of the books CSV (book_id,Title,Authors,Description,Category)")
+        parser.add_argument('--courses-csv', help="Path of the courses CSV (COURSE_ID,TITLE)")
+        parser.add_argument('--chunk-size', type=int, default=5000, help="Rows per bulk insert (default: 5000)")
+        parser.add_argument(
+            '--keep-indexes',
+            action='store_true',
+            help="Don't drop the secondary and full-text indexes during the load",
+        )
+
+    def handle(self, *args, **options):
+        names = options['catalogs']
+        unknown = [name for name in names if name not in CATALOGS]
+        if unknown:
+            raise CommandError(f"Unknown catalog(s): {', '.join(unknown)} (choose from {', '.join(CATALOGS)})")
+        explicit = bool(names)
+        if not names:
+            names = list(CATALOGS)
+
+        for name in names:
+            path = options[f'{name}_csv'] or CATALOGS[name]['path']
+            if not os.path.exists(path):
+                if explicit or options[f'{name}_csv']:
+                    raise CommandError(f"{name}: CSV file not found: {path}")
+                self.stdout.write(self.style.WARNING(f"{name:<8} skipped: {path} not found"))
+                continue
+            self.import_catalog(name, path, options['chunk_size'], options['keep_indexes'])
+
+    def _read_rows(self, path, catalog):
+        model = catalog['model']
+        columns = catalog['columns']
+        fields = {name: model._meta.get_field(name) for name in columns}
+
+        with open(path, newline='', encoding='utf-8') as f:
+            reader = csv.DictReader(f)
+            missing = [column for name, column in columns.items()
+                       if column not in (reader.fieldnames or []) and not fields[name].null]
+            if missing:
+                raise CommandError(f"{path}: missing column(s) {', '.join(missing)}")
+
+            for record in reader:
+                values = {}
+                for name, column in columns.items():
+                    value = record.get(column)
+                    field = fields[name]
+                    if value is None or value == '':
+                        value = None if field.null else ''
+                    elif field.max_length and len(value) > field.max_length:
+                        value = value[:field.max_length]
+                    values[name] = field.to_python(value) if value is not None else None
+                yield model(**values)
+
+    def import_catalog(self, name, path, chunk_size, keep_indexes):
+        catalog = CATALOGS[name]
+        model = catalog['model']
+        unique_field = catalog['unique_field']
+        update_fields = [field for field in catalog['columns'] if field != unique_field]
+        table = model._meta.db_table
+        indexes = [] if keep_indexes else _secondary_indexes(model)
+        # Rebuilt over the same columns as the existing full-text index, if any
+        search_columns = None if keep_indexes else search_index_columns(connection.alias, table)
+
+        started = time.perf_counter()
+        rows = 0
+        with transaction.atomic():
+            if not keep_indexes:
+                # Rebuilding the indexes once is far cheaper than updating them per row
+                if search_columns:
+                    drop_search_index(connection, table)
+                _drop_indexes(indexes)
+
+            for chunk in _chunks(self._read_rows(path, catalog), chunk_size):
+                model.objects.bulk_create(
+                    chunk,
+                    update_conflicts=True,
+                    unique_fields=[unique_field],
+                    update_fields=update_fields,
+                )
+                rows += len(chunk)
+
+            if not keep_indexes:
+                _create_indexes(table, indexes)
+                if search_columns:
+                    create_search_index(connection, table, search_columns)
+
+        # Rebuilt on next use in this process; workers pick the titles up on
+        # their next periodic rebuild
+        catalog['autocomplete'].reset()
+
+        elapsed = time.perf_counter() - started
+        rate = rows / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"{name:<8} {rows} rows from {path} in {elapsed:.2f}s ({rate:,.0f} rows/s)"
+        ))
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from movies.ai_models.model_loader import registry
+
+
+class Command(BaseCommand):
+    help = "Load the recommender models and report their load time and memory"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'models',
+            nargs='*',
+            help="Model names or prefixes to load (e.g. 'movies.' or 'books.knn'); all models when omitted",
+        )
+
+    def handle(self, *args, **options):
+        report = registry.warm_up(options['models'] or None)
+
+        if not report:
+            self.stdout.write(self.style.WARNING("No recommender models matched."))
+            return
+
+        total_seconds = 0.0
+        total_mb = 0.0
+        for entry in report:
+            if entry['available']:
+                status = self.style.SUCCESS('loaded')
+            else:
+                status = self.style.ERROR(f"unavailable ({entry['error']})")
+            self.stdout.write(
+                f"{entry['name']:<22} {entry['load_seconds']:8.2f}s {entry['rss_delta_mb']:10.1f} MB  {status}"
+            )
+            total_seconds += entry['load_seconds']
+            total_mb += entry['rss_delta_mb']
+
+        self.stdout.write(f"{'total':<22} {total_seconds:8.2f}s {total_mb:10.1f} MB")
@@ -0,0 +1,71 @@
+# Generated by Django 5.2.1 on 2026-10-18 17:28
+
+from django.db import migrations
+
+TABLE = 'movies_movie'
+COLUMNS = ['title', 'genres']
+
+
+def create_search_index(apps, schema_editor):
+    """
+    Full-text index of movies_movie: an external-content FTS5 table kept in sync
+    by triggers on SQLite, a GIN tsvector index on PostgreSQL.
+    """
+    connection = schema_editor.connection
+    fts = f'{TABLE}_fts'
+    column_list = ', '.join(COLUMNS)
+    new_values = ', '.join(f'new.{column}' for column in COLUMNS)
+    old_values = ', '.join(f'old.{column}' for column in COLUMNS)
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            try:
+                cursor.execute(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+                    f"{column_list}, content='{TABLE}', content_rowid='id', tokenize='unicode61 remove_diacritics 2')"
+                )
+            except Exception:
+                # SQLite built without FTS5; search falls back to SearchFilter
+                return
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {TABLE} BEGIN "
+                f"INSERT INTO {fts}(rowid, {column_list}) VALUES (new.id, {new_values}); END"
+            )
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {TABLE} BEGIN "
+                f"INSERT INTO {fts}({fts}, rowid, {column_list}) VALUES ('delete', old.id, {old_values}); END"
+            )
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE ON {TABLE} BEGIN "
+                f"INSERT INTO {fts}({fts}, rowid, {column_list}) VALUES ('delete', old.id, {old_values}); "
+                f"INSERT INTO {fts}(rowid, {column_list}) VALUES (new.id, {new_values}); END"
+            )
+            cursor.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+        elif connection.vendor == 'postgresql':
+            document = " || ' ' || ".join(f"coalesce({TABLE}.{column}, '')" for column in COLUMNS)
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {TABLE}_search_idx ON {TABLE} "
+                f"USING GIN (to_tsvector('simple', {document}))"
+            )
+
+
+def drop_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    fts = f'{TABLE}_fts'
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            for suffix in ('ai', 'ad', 'au'):
+                cursor.execute(f"DROP TRIGGER IF EXISTS {fts}_{suffix}")
+            cursor.execute(f"DROP TABLE IF EXISTS {fts}")
+        elif connection.vendor == 'postgresql':
+            cursor.execute(f"DROP INDEX IF EXISTS {TABLE}_search_idx")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0003_recommendationhistory_movie_hist_user_ts_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
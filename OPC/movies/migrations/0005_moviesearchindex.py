@@ -0,0 +1,24 @@
+# Generated by Django 5.2.1 on 2026-10-18 18:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0004_movie_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovieSearchIndex',
+            fields=[
+                ('movie', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_index', serialize=False, to='movies.movie')),
+            ],
+            options={
+                'db_table': 'movies_movie_fts',
+                'managed': False,
+            },
+        ),
+    ]
@@ -0,0 +1,69 @@
+from rest_framework.pagination import CursorPagination, LimitOffsetPagination
+
+
+class HistoryCursorPagination(CursorPagination):
+    """
+    Keyset pagination over (timestamp, id): every page is an index range
+    scan from the previous page's last row, so deep pages cost the same as
+    the first one.
+    """
+    page_size = 5
+    page_size_query_param = 'limit'
+    max_page_size = 50
+    ordering = ('-timestamp', '-id')
+
+
+class HistoryPagination(LimitOffsetPagination):
+    """
+    Pagination for the recommendation history APIs.
+
+    Offset pagination (?limit=&offset=) by default, for existing clients.
+    Requests with ?pagination=cursor, or following a cursor link (?cursor=),
+    use keyset pagination instead.
+    """
+    cursor_pagination_class = HistoryCursorPagination
+
+    def _uses_cursor(self, request):
+        cursor_param = self.cursor_pagination_class.cursor_query_param
+        return cursor_param in request.query_params or request.query_params.get('pagination') == 'cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self._uses_cursor(request):
+            self.cursor_paginator = self.cursor_pagination_class()
+            return self.cursor_paginator.paginate_queryset(queryset, request, view)
+        self.cursor_paginator = None
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+
+class ApproximateCountMixin:
+    """
+    Adds ?count=approx to LimitOffsetPagination: the page is fetched with one
+    extra row instead of running COUNT(*) over every match, and count is a
+    lower bound (the rows seen so far, plus one when there are more).
+    """
+    count_query_param = 'count'
+    count_is_estimate = False
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if request.query_params.get(self.count_query_param) != 'approx':
+            self.count_is_estimate = False
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.limit = self.get_limit(request)
+        if self.limit is None:
+            return None
+        self.offset = self.get_offset(request)
+
+        page = list(queryset[self.offset:self.offset + self.limit + 1])
+        has_more = len(page) > self.limit
+        self.count = self.offset + min(len(page), self.limit) + int(has_more)
+        self.count_is_estimate = True
+        if self.count > self.limit and self.template is not None:
+            self.display_page_controls = True
+        return page[:self.limit]
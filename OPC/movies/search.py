@@ -0,0 +1,189 @@
+"""
+Full-text search over the Movie, Book and Course catalogs.
+
+DRF's SearchFilter compiles to `LIKE '%q%'` scans that can't use the b-tree
+indexes. FullTextSearchFilter matches every search term as a word prefix
+against a full-text index of the view's search_fields and orders the results
+by relevance:
+
+- SQLite: an FTS5 table `<table>_fts` (external content, kept in sync by
+  triggers), ranked with bm25
+- PostgreSQL: a GIN index over to_tsvector('simple', ...), ranked with ts_rank
+
+The indexes are created by each app's migration (and rebuilt by
+import_catalog). The filter searches and weights the columns the index was
+built over, read from the database; on other databases, or when the index is
+missing, it falls back to SearchFilter.
+"""
+import logging
+import re
+
+from django.db import connections
+from django.db.models import BooleanField, F, FloatField
+from django.db.models.expressions import RawSQL
+from rest_framework import filters
+
+logger = logging.getLogger(__name__)
+
+SEARCH_TOKEN = re.compile(r'\w+')
+
+# Relevance weight of the first indexed column (the title) against the others
+TITLE_WEIGHT = 10.0
+
+# Columns of the tsvector expression, as deparsed by PostgreSQL in the index definition
+TSVECTOR_COLUMN = re.compile(r'COALESCE\(\(?(\w+)\b')
+
+# (database alias, table) -> columns of the table's full-text index, or None
+_index_columns = {}
+
+
+def fts_table(table):
+    return f'{table}_fts'
+
+
+def _tsvector(table, columns):
+    document = " || ' ' || ".join(f"coalesce({table}.{column}, '')" for column in columns)
+    return f"to_tsvector('simple', {document})"
+
+
+def _create_sqlite_index(cursor, table, columns):
+    fts = fts_table(table)
+    column_list = ', '.join(columns)
+    new_values = ', '.join(f'new.{column}' for column in columns)
+    old_values = ', '.join(f'old.{column}' for column in columns)
+    cursor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+        f"{column_list}, content='{table}', content_rowid='id', tokenize='unicode61 remove_diacritics 2')"
+    )
+    cursor.execute(
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts}(rowid, {column_list}) VALUES (new.id, {new_values}); END"
+    )
+    cursor.execute(
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {column_list}) VALUES ('delete', old.id, {old_values}); END"
+    )
+    cursor.execute(
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {column_list}) VALUES ('delete', old.id, {old_values}); "
+        f"INSERT INTO {fts}(rowid, {column_list}) VALUES (new.id, {new_values}); END"
+    )
+    rebuild_search_index(cursor, table)
+
+
+def rebuild_search_index(cursor, table):
+    """Re-index every row of the table (SQLite; PostgreSQL indexes need no rebuild)."""
+    if cursor.db.vendor == 'sqlite':
+        fts = fts_table(table)
+        cursor.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+def create_search_index(connection, table, columns):
+    """
+    Create (and fill) the full-text index of a catalog table for the
+    database in use; nothing on databases without a supported backend.
+    """
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            try:
+                _create_sqlite_index(cursor, table, columns)
+            except Exception as e:
+                # SQLite built without FTS5; search falls back to SearchFilter
+                logger.warning(f"Could not create the full-text index of {table}: {e}")
+        elif connection.vendor == 'postgresql':
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {table}_search_idx ON {table} USING GIN ({_tsvector(table, columns)})"
+            )
+    _index_columns.pop((connection.alias, table), None)
+
+
+def drop_search_index(connection, table):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            fts = fts_table(table)
+            for suffix in ('ai', 'ad', 'au'):
+                cursor.execute(f"DROP TRIGGER IF EXISTS {fts}_{suffix}")
+            cursor.execute(f"DROP TABLE IF EXISTS {fts}")
+        elif connection.vendor == 'postgresql':
+            cursor.execute(f"DROP INDEX IF EXISTS {table}_search_idx")
+    _index_columns.pop((connection.alias, table), None)
+
+
+def _read_index_columns(connection, table):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            fts = fts_table(table)
+            if fts not in connection.introspection.table_names(cursor):
+                return None
+            cursor.execute(f"PRAGMA table_info({fts})")
+            return [row[1] for row in cursor.fetchall()]
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                "SELECT indexdef FROM pg_indexes WHERE tablename = %s AND indexname = %s",
+                [table, f'{table}_search_idx'],
+            )
+            row = cursor.fetchone()
+            if row is None:
+                return None
+            return TSVECTOR_COLUMN.findall(row[0]) or None
+    return None
+
+
+def search_index_columns(alias, table):
+    """
+    Columns the table's full-text index was built over, in index order, or
+    None when the database has no full-text index for it.
+    """
+    key = (alias, table)
+    if key not in _index_columns:
+        _index_columns[key] = _read_index_columns(connections[alias], table)
+    return _index_columns[key]
+
+
+def search_backend(alias, table):
+    """Return 'fts5', 'tsvector' or None (no full-text index) for a table."""
+    if search_index_columns(alias, table) is None:
+        return None
+    return {'sqlite': 'fts5', 'postgresql': 'tsvector'}[connections[alias].vendor]
+
+
+class FullTextSearchFilter(filters.SearchFilter):
+    """
+    SearchFilter backed by the catalog's full-text index.
+
+    Every term of ?search= must match the start of a word in one of the
+    indexed columns; results are ordered by relevance, best first. The view's
+    search_fields are only used by the SearchFilter fallback. On SQLite the
+    catalog model needs the 'search_index' relation to its FTS5 table.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        search_fields = self.get_search_fields(view, request)
+        terms = SEARCH_TOKEN.findall(' '.join(self.get_search_terms(request)).lower())
+        if not search_fields or not terms:
+            return super().filter_queryset(request, queryset, view)
+
+        table = queryset.model._meta.db_table
+        backend = search_backend(queryset.db, table)
+        columns = search_index_columns(queryset.db, table)
+        if backend == 'fts5':
+            # Inner join with the FTS5 table (the catalog's 'search_index'
+            # relation): bm25() and MATCH apply to the joined table
+            fts = fts_table(table)
+            match = ' '.join(f'"{term}"*' for term in terms)
+            weights = ', '.join([str(TITLE_WEIGHT)] + ['1.0'] * (len(columns) - 1))
+            return queryset.filter(search_index__isnull=False).filter(
+                RawSQL(f'{fts} MATCH %s', [match], output_field=BooleanField()),
+            ).annotate(
+                search_rank=RawSQL(f'bm25({fts}, {weights})', [], output_field=FloatField()),
+            ).order_by('search_rank', 'id')
+        if backend == 'tsvector':
+            tsquery = "to_tsquery('simple', %s)"
+            document = _tsvector(table, columns)
+            match = ' & '.join(f'{term}:*' for term in terms)
+            return queryset.filter(
+                RawSQL(f'{document} @@ {tsquery}', [match], output_field=BooleanField()),
+            ).annotate(
+                search_rank=RawSQL(f'ts_rank({document}, {tsquery})', [match], output_field=FloatField()),
+            ).order_by(F('search_rank').desc(), 'id')
+        return super().filter_queryset(request, queryset, view)
@@ -1,6 +1,14 @@
 from movies.models import Movie, RecommendationHistory 
 from rest_framework import serializers
 
+# Upper bound on the titles accepted by one batch recommendation request
+MAX_BATCH_TITLES = 500
+
+MAX_AUTOCOMPLETE_LIMIT = 50
+
+# Upper bound on the length of a free-text recommendation query
+MAX_TEXT_QUERY_LENGTH = 1000
+
 
 class MovieRecommendationRequestSerializer(serializers.Serializer):
     Model_Choices = [
@@ -35,7 +43,70 @@ class MovieRecommendationRequestSerializer(serializers.Serializer):
         default=False,
         help_text="Whether this request is a regeneration"
         )
-    
+    seed = serializers.IntegerField(
+        required=False,
+        allow_null=True,
+        default=None,
+        min_value=0,
+        help_text="Seed making the random selection reproducible; random when omitted"
+    )
+
+
+class MovieBatchRecommendationRequestSerializer(serializers.Serializer):
+    movie_titles = serializers.ListField(
+        child=serializers.CharField(),
+        allow_empty=False,
+        max_length=MAX_BATCH_TITLES,
+        help_text="Input movie titles"
+    )
+    models_used = serializers.ListField(
+        child=serializers.ChoiceField(choices=MovieRecommendationRequestSerializer.Model_Choices),
+        allow_empty=False,
+        help_text="Recommendation models to run for every input title"
+    )
+    num_recommendations = serializers.IntegerField(
+        min_value=1,
+        default=5,
+        help_text="Number of recommendations to return per title and model"
+    )
+    save_history = serializers.BooleanField(
+        required=False,
+        default=False,
+        help_text="Whether to save these recommendations to history"
+    )
+    regenerate = serializers.BooleanField(
+        required=False,
+        default=False,
+        help_text="Whether this request is a regeneration"
+    )
+    seed = serializers.IntegerField(
+        required=False,
+        allow_null=True,
+        default=None,
+        min_value=0,
+        help_text="Seed making the random selection reproducible; random when omitted"
+    )
+
+
+class TextRecommendationRequestSerializer(serializers.Serializer):
+    query = serializers.CharField(
+        max_length=MAX_TEXT_QUERY_LENGTH,
+        help_text="Free-text description of what to recommend"
+    )
+    num_recommendations = serializers.IntegerField(
+        min_value=1,
+        default=5,
+        help_text="Number of recommendations to return"
+    )
+    seed = serializers.IntegerField(
+        required=False,
+        allow_null=True,
+        default=None,
+        min_value=0,
+        help_text="Seed making the random selection reproducible; random when omitted"
+    )
+
+
 class MovieRecommendationUserRatingSerializer(serializers.Serializer):
     Model_Choices = [
             ('GRHR', 'GRHR'),
@@ -66,6 +137,13 @@ class MovieRecommendationUserRatingSerializer(serializers.Serializer):
             default=False,
             help_text="Whether this request is a regeneration"
         )
+    seed = serializers.IntegerField(
+            required=False,
+            allow_null=True,
+            default=None,
+            min_value=0,
+            help_text="Seed making the random selection reproducible; random when omitted"
+        )
 
 
 class RecommendationHistorySerializer(serializers.ModelSerializer): 
@@ -82,3 +160,16 @@ class MovieSerializer(serializers.ModelSerializer):
 
 
 
+
+
+class TitleAutocompleteQuerySerializer(serializers.Serializer):
+    q = serializers.CharField(
+        max_length=255,
+        help_text="Prefix typed so far"
+    )
+    limit = serializers.IntegerField(
+        min_value=1,
+        max_value=MAX_AUTOCOMPLETE_LIMIT,
+        default=10,
+        help_text="Number of suggestions to return"
+    )
@@ -1,3 +1,723 @@
-from django.test import TestCase
+import io
+import os
+import queue
+import tempfile
+import threading
+import time
+from unittest import mock
 
-# Create your tests here.
+import joblib
+import numpy as np
+import scipy.sparse as sp
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from sklearn.metrics.pairwise import cosine_similarity
+from sklearn.neighbors import NearestNeighbors
+from django.urls import reverse
+from rest_framework.test import APIClient, APITestCase
+
+from movies.ai_models import Embeddings, Genre_Based, knn
+from movies.ai_models.model_loader import RegisteredModel
+from movies.ai_models.neighbours import load_neighbour_table
+from movies.management.commands.benchmark_sparse_index import SPARSE_MODELS
+from movies.management.commands.build_neighbour_tables import NEIGHBOUR_MODULES
+from movies.ai_models.artifacts import save_array
+from movies.ai_models.sparse_index import (
+    POSTINGS_NAME, SparseCosineIndex, cosine_index, cosine_postings, evaluate_cosine_index, load_cosine_index,
+)
+from movies.autocomplete import TitleAutocomplete, build_autocomplete, complete_titles
+from movies import views
+from movies.history import HistoryWriter, insert_history
+from movies.models import Movie, RecommendationHistory
+from movies.search import search_backend
+from movies.ai_models.vector_index import (
+    INDEX_FILENAME, ExactIndex, IVFIndex, build_index, evaluate_index, load_index, load_vector_index,
+    normalize_rows,
+)
+
+
+def clustered_vectors(n=2000, dim=32, n_clusters=20, seed=0):
+    """Normalized vectors drawn around a few random directions, like catalog embeddings."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(n_clusters, dim))
+    vectors = centers[rng.integers(n_clusters, size=n)] + 0.3 * rng.normal(size=(n, dim))
+    return normalize_rows(vectors)
+
+
+class VectorIndexTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.vectors = clustered_vectors()
+
+    def test_ivf_recall(self):
+        index = build_index(self.vectors, 'ivf', nprobe=8)
+        stats = evaluate_index(index, self.vectors, k=10, sample=100)
+        self.assertGreaterEqual(stats['recall'], 0.9)
+
+    def test_ivf_int8_recall(self):
+        index = build_index(self.vectors, 'ivf_int8', nprobe=8)
+        stats = evaluate_index(index, self.vectors, k=10, sample=100)
+        self.assertGreaterEqual(stats['recall'], 0.9)
+
+    def test_ivf_probing_every_list_is_exact(self):
+        index = build_index(self.vectors, 'ivf')
+        queries = self.vectors[:20]
+        expected, expected_scores = ExactIndex(self.vectors).search(queries, 10)
+        found, scores = index.search(queries, 10, nprobe=len(index.centroids))
+        np.testing.assert_array_equal(found, expected)
+        np.testing.assert_allclose(scores, expected_scores, rtol=1e-5)
+
+    def test_saved_index_gives_the_same_results(self):
+        index = build_index(self.vectors, 'ivf_int8')
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'vector_index.npz')
+            index.save(path)
+            loaded = load_index(path, self.vectors)
+        self.assertIsInstance(loaded, IVFIndex)
+        self.assertTrue(loaded.quantized)
+        queries = self.vectors[:20]
+        np.testing.assert_array_equal(loaded.search(queries, 10)[0], index.search(queries, 10)[0])
+
+
+class StaleVectorIndexTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.vectors = clustered_vectors(n=300)
+
+    def test_missing_index_uses_exact_search(self):
+        self.assertIsInstance(load_vector_index(self.directory, self.vectors), ExactIndex)
+
+    def test_index_of_another_catalog_uses_exact_search(self):
+        build_index(self.vectors[:200], 'ivf').save(os.path.join(self.directory, INDEX_FILENAME))
+        with self.assertLogs('movies.ai_models.vector_index', level='WARNING'):
+            index = load_vector_index(self.directory, self.vectors)
+        self.assertNotIsInstance(index, IVFIndex)
+        self.assertEqual(len(index), 300)
+
+    def test_unreadable_index_uses_exact_search(self):
+        with open(os.path.join(self.directory, INDEX_FILENAME), 'wb') as f:
+            f.write(b'not an index')
+        with self.assertLogs('movies.ai_models.vector_index', level='WARNING'):
+            self.assertIsInstance(load_vector_index(self.directory, self.vectors), ExactIndex)
+
+    def test_build_command_replaces_a_stale_index(self):
+        build_index(self.vectors[:200], 'ivf').save(os.path.join(self.directory, INDEX_FILENAME))
+        with mock.patch.object(Embeddings, 'EMB_PATH', self.directory), \
+                mock.patch.object(Embeddings, 'catalog_vectors', return_value=self.vectors), \
+                mock.patch.object(Embeddings.embeddings_model, 'reset') as reset:
+            call_command('build_vector_index', 'movies', '--kind', 'ivf', '--no-report', stdout=io.StringIO())
+
+        index = load_vector_index(self.directory, self.vectors)
+        self.assertIsInstance(index, IVFIndex)
+        self.assertEqual(len(index), 300)
+        reset.assert_called_once()
+
+
+def history_row(title, model_used='knn'):
+    return RecommendationHistory(input_title=title, recommended_titles=['A', 'B'], model_used=model_used)
+
+
+class HistoryWriterTests(TransactionTestCase):
+    # The flusher thread writes through its own connection, so these tests
+    # commit instead of running inside a test transaction
+
+    def setUp(self):
+        self.writer = HistoryWriter(max_size=100, batch_size=10, flush_interval=0.05)
+        self.addCleanup(self.writer.stop)
+
+    def test_queued_rows_are_flushed(self):
+        self.assertEqual(self.writer.submit(history_row(f'Movie {i}') for i in range(25)), 25)
+        self.writer.stop()
+
+        self.assertEqual(RecommendationHistory.objects.count(), 25)
+        stats = self.writer.stats()
+        self.assertEqual(stats['enqueued'], 25)
+        self.assertEqual(stats['written'], 25)
+        self.assertEqual(stats['failed'], 0)
+        self.assertEqual(stats['depth'], 0)
+
+    def bulk_create_sizes(self):
+        """Patch bulk_create to record the size of every batch it inserts."""
+        manager = RecommendationHistory.objects
+        patcher = mock.patch.object(manager, 'bulk_create', wraps=manager.bulk_create)
+        bulk_create = patcher.start()
+        self.addCleanup(patcher.stop)
+        return lambda: [len(call.args[0]) for call in bulk_create.call_args_list]
+
+    def test_full_batches_are_flushed_without_waiting(self):
+        writer = HistoryWriter(max_size=100, batch_size=10, flush_interval=30.0)
+        self.addCleanup(writer.stop)
+        sizes = self.bulk_create_sizes()
+
+        writer.submit(history_row(f'Movie {i}') for i in range(20))
+        deadline = time.monotonic() + 5
+        while writer.stats()['written'] < 20 and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        self.assertEqual(sizes(), [10, 10])
+        self.assertEqual(RecommendationHistory.objects.count(), 20)
+
+    def test_stop_flushes_a_partial_batch(self):
+        writer = HistoryWriter(max_size=100, batch_size=10, flush_interval=30.0)
+        sizes = self.bulk_create_sizes()
+
+        writer.submit(history_row(f'Movie {i}') for i in range(3))
+        started = time.monotonic()
+        writer.stop()
+
+        self.assertLess(time.monotonic() - started, 5)
+        self.assertFalse(writer._thread.is_alive())
+        self.assertEqual(sizes(), [3])
+        self.assertEqual(writer.stats()['written'], 3)
+
+    def test_full_queue_writes_the_overflow_synchronously(self):
+        writer = HistoryWriter(max_size=5)
+        # No flusher thread, so the queue fills up
+        writer._queue = queue.Queue(maxsize=writer.max_size)
+        with mock.patch.object(writer, '_ensure_started'), self.assertLogs('movies.history', level='WARNING'):
+            self.assertEqual(writer.submit(history_row(f'Movie {i}') for i in range(8)), 8)
+
+        stats = writer.stats()
+        self.assertEqual(stats['enqueued'], 5)
+        self.assertEqual(stats['overflow_writes'], 3)
+        self.assertEqual(RecommendationHistory.objects.count(), 3)
+
+    def test_failed_batch_keeps_its_good_rows(self):
+        rows = [history_row(f'Movie {i}') for i in range(7)]
+        rows[3].input_title = None
+        rows[5].model_used = None
+
+        with self.assertLogs('movies.history', level='ERROR'):
+            self.writer._write(rows)
+
+        self.assertQuerySetEqual(
+            RecommendationHistory.objects.order_by('input_title').values_list('input_title', flat=True),
+            ['Movie 0', 'Movie 1', 'Movie 2', 'Movie 4', 'Movie 6'],
+        )
+        stats = self.writer.stats()
+        self.assertEqual(stats['written'], 5)
+        self.assertEqual(stats['failed'], 2)
+
+
+class InsertHistoryTests(TestCase):
+    def test_failed_insert_writes_nothing(self):
+        rows = [history_row('Movie 0'), history_row(None)]
+        with self.assertRaises(Exception):
+            insert_history(rows)
+        self.assertFalse(RecommendationHistory.objects.exists())
+
+
+class HistoryPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('reader', password='secret')
+        other = User.objects.create_user('other', password='secret')
+        # One bulk insert, so many rows share a timestamp and only the id orders them
+        RecommendationHistory.objects.bulk_create(
+            [RecommendationHistory(user=cls.user, input_title=f'Movie {i}', recommended_titles=[], model_used='knn')
+             for i in range(12)]
+            + [RecommendationHistory(user=other, input_title='Other', recommended_titles=[], model_used='knn')]
+        )
+        cls.expected_ids = list(
+            RecommendationHistory.objects.filter(user=cls.user)
+            .order_by('-timestamp', '-id').values_list('id', flat=True)
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get_page(self, url, params=None):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_cursor_pages_cover_every_row_once(self):
+        data = self.get_page(reverse('movie_history'), {'pagination': 'cursor', 'limit': 5})
+        self.assertIsNone(data['previous'])
+        pages = [[row['id'] for row in data['results']]]
+        while data['next']:
+            data = self.get_page(data['next'])
+            pages.append([row['id'] for row in data['results']])
+
+        self.assertEqual([len(page) for page in pages], [5, 5, 2])
+        self.assertEqual(sum(pages, []), self.expected_ids)
+
+    def test_cursor_previous_link_returns_the_previous_page(self):
+        first = self.get_page(reverse('movie_history'), {'pagination': 'cursor', 'limit': 5})
+        second = self.get_page(first['next'])
+        back = self.get_page(second['previous'])
+        self.assertEqual([row['id'] for row in second['results']], self.expected_ids[5:10])
+        self.assertEqual([row['id'] for row in back['results']], self.expected_ids[:5])
+
+    def test_cursor_page_ending_on_the_last_row_has_no_next(self):
+        data = self.get_page(reverse('movie_history'), {'pagination': 'cursor', 'limit': 6})
+        data = self.get_page(data['next'])
+        self.assertEqual([row['id'] for row in data['results']], self.expected_ids[6:])
+        self.assertIsNone(data['next'])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('movie_history'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(str(response.data['detail']), 'Invalid cursor')
+
+    def test_empty_cursor_returns_the_first_page(self):
+        data = self.get_page(reverse('movie_history'), {'cursor': '', 'limit': 5})
+        self.assertEqual([row['id'] for row in data['results']], self.expected_ids[:5])
+
+    def test_cursor_survives_deleting_its_rows(self):
+        # The cursor's position is a (timestamp, id) key, not a row that must still exist
+        first = self.get_page(reverse('movie_history'), {'pagination': 'cursor', 'limit': 5})
+        RecommendationHistory.objects.filter(id__in=self.expected_ids[:6]).delete()
+        data = self.get_page(first['next'])
+        self.assertEqual([row['id'] for row in data['results']], self.expected_ids[6:11])
+
+    def test_cursor_past_the_last_row(self):
+        first = self.get_page(reverse('movie_history'), {'pagination': 'cursor', 'limit': 5})
+        RecommendationHistory.objects.filter(id__in=self.expected_ids[5:]).delete()
+        data = self.get_page(first['next'])
+        self.assertEqual(data['results'], [])
+        self.assertIsNone(data['next'])
+
+    def test_offset_pagination_is_the_default(self):
+        data = self.get_page(reverse('movie_history'), {'limit': 5, 'offset': 10})
+        self.assertEqual(data['count'], 12)
+        self.assertEqual([row['id'] for row in data['results']], self.expected_ids[10:])
+
+
+class MovieSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('reader', password='secret')
+        Movie.objects.bulk_create([
+            Movie(movie_id=1, title='Toy Story (1995)', genres='Adventure|Animation|Children|Comedy|Fantasy'),
+            Movie(movie_id=2, title='Heat (1995)', genres='Action|Crime|Thriller'),
+            Movie(movie_id=3, title='Comedy of Errors (1983)', genres='Drama'),
+            Movie(movie_id=4, title='Toy Soldiers (1991)', genres='Action|Drama'),
+            Movie(movie_id=5, title='Les Misérables (1995)', genres='Drama|War'),
+        ])
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def search(self, query):
+        response = self.client.get(reverse('movie_search'), {'search': query})
+        self.assertEqual(response.status_code, 200)
+        return [movie['title'] for movie in response.data['results']]
+
+    def test_uses_the_full_text_index(self):
+        self.assertEqual(search_backend('default', Movie._meta.db_table), 'fts5')
+
+    def test_title_matches_rank_above_genre_matches(self):
+        self.assertEqual(self.search('comedy'), ['Comedy of Errors (1983)', 'Toy Story (1995)'])
+
+    def test_every_term_matches_a_word_prefix(self):
+        self.assertCountEqual(self.search('toy'), ['Toy Story (1995)', 'Toy Soldiers (1991)'])
+        self.assertEqual(self.search('toy sol'), ['Toy Soldiers (1991)'])
+        self.assertEqual(self.search('oy'), [])
+
+    def test_diacritics_and_case_are_ignored(self):
+        self.assertEqual(self.search('MISERABLES'), ['Les Misérables (1995)'])
+
+    def test_index_follows_catalog_changes(self):
+        Movie.objects.filter(movie_id=2).update(title='Heatwave (1995)')
+        Movie.objects.filter(movie_id=3).delete()
+        self.assertEqual(self.search('heatwave'), ['Heatwave (1995)'])
+        self.assertEqual(self.search('errors'), [])
+
+
+class TitleAutocompleteTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.index = TitleAutocomplete(
+            ['Star Wars (1977)', 'Star Trek (1979)', 'Stardust (2007)', 'The Lone Star (1996)',
+             'Heat (1995)', 'Heat (1995)', 'HEAT  (1995)'],
+            popularity={'star trek (1979)': 3, 'the lone star (1996)': 1},
+        )
+
+    def test_prefix_completions_are_ranked_by_popularity(self):
+        # Popular first, then shorter titles
+        self.assertEqual(
+            self.index.complete('star'),
+            ['Star Trek (1979)', 'The Lone Star (1996)', 'Stardust (2007)', 'Star Wars (1977)'],
+        )
+        self.assertEqual(self.index.complete('star w'), ['Star Wars (1977)'])
+
+    def test_prefix_matches_any_word_of_the_title(self):
+        self.assertEqual(self.index.complete('lone'), ['The Lone Star (1996)'])
+        self.assertEqual(self.index.complete('  WARS '), ['Star Wars (1977)'])
+
+    def test_limit(self):
+        self.assertEqual(self.index.complete('sta', limit=2), ['Star Trek (1979)', 'The Lone Star (1996)'])
+        self.assertEqual(self.index.complete('star t', limit=1), ['Star Trek (1979)'])
+
+    def test_duplicate_titles_are_suggested_once(self):
+        self.assertEqual(len(self.index), 5)
+        self.assertEqual(self.index.complete('heat'), ['Heat (1995)'])
+
+    def test_fuzzy_fallback_within_one_edit(self):
+        self.assertEqual(self.index.complete('stra wars'), ['Star Wars (1977)'])
+        self.assertEqual(self.index.complete('star wras'), ['Star Wars (1977)'])
+        self.assertEqual(self.index.complete('stardst'), ['Stardust (2007)'])
+        self.assertEqual(self.index.complete('heet'), ['Heat (1995)'])
+
+    def test_no_fuzzy_fallback_for_short_or_distant_prefixes(self):
+        self.assertEqual(self.index.complete('xt'), [])
+        self.assertEqual(self.index.complete('strr wrs'), [])
+        self.assertEqual(self.index.complete(''), [])
+
+
+class AutocompleteBuildTests(TestCase):
+    def test_popularity_comes_from_the_history(self):
+        Movie.objects.bulk_create([
+            Movie(movie_id=1, title='Heat (1995)', genres='Action'),
+            Movie(movie_id=2, title='Heathers (1989)', genres='Comedy'),
+        ])
+        RecommendationHistory.objects.bulk_create([
+            history_row('heathers (1989)'), history_row('Heathers (1989)'), history_row('Heat (1995)'),
+        ])
+        index = build_autocomplete(Movie, 'title', RecommendationHistory)
+        self.assertEqual(index.complete('hea'), ['Heathers (1989)', 'Heat (1995)'])
+
+    def test_failed_build_is_retried(self):
+        loader = mock.Mock(side_effect=[RuntimeError('database is locked'), TitleAutocomplete(['Heat (1995)'])])
+        handle = RegisteredModel('test.autocomplete', loader)
+        with self.assertLogs('movies.ai_models.model_loader', level='WARNING'):
+            self.assertEqual(complete_titles(handle, 'heat'), [])
+        self.assertEqual(complete_titles(handle, 'heat'), ['Heat (1995)'])
+        self.assertEqual(loader.call_count, 2)
+
+    @override_settings(AUTOCOMPLETE_REFRESH_INTERVAL=60)
+    def test_stale_index_is_refreshed_in_the_background(self):
+        handle = RegisteredModel('test.autocomplete', lambda: TitleAutocomplete(['Heat (1995)']))
+        with mock.patch('movies.autocomplete.refresh_in_background') as refresh:
+            complete_titles(handle, 'heat')
+            refresh.assert_not_called()
+            handle.loaded_at -= 60
+            self.assertEqual(complete_titles(handle, 'heat'), ['Heat (1995)'])
+            refresh.assert_called_once_with(handle)
+
+
+class ImportCatalogTests(TestCase):
+    def write_csv(self, text):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'movies.csv')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        return path
+
+    def import_movies(self, path, *args):
+        out = io.StringIO()
+        call_command('import_catalog', 'movies', '--movies-csv', path, *args, stdout=out)
+        return out.getvalue()
+
+    def test_imports_every_row(self):
+        path = self.write_csv(
+            'movieId,title,genres\n'
+            '1,Toy Story (1995),Adventure|Animation\n'
+            '2,"Heat, The (1995)",Action|Crime\n'
+            '3,Jumanji (1995),\n'
+        )
+        output = self.import_movies(path, '--chunk-size', '2')
+
+        self.assertIn('movies   3 rows', output)
+        self.assertEqual(
+            list(Movie.objects.order_by('movie_id').values_list('movie_id', 'title', 'genres')),
+            [(1, 'Toy Story (1995)', 'Adventure|Animation'), (2, 'Heat, The (1995)', 'Action|Crime'),
+             (3, 'Jumanji (1995)', '')],
+        )
+
+    def test_reimport_updates_by_unique_id(self):
+        self.import_movies(self.write_csv('movieId,title,genres\n1,Toy Story,Animation\n2,Heat,Action\n'))
+        output = self.import_movies(
+            self.write_csv('movieId,title,genres\n2,Heat (1995),Action|Crime\n3,Jumanji (1995),Adventure\n')
+        )
+
+        self.assertIn('movies   2 rows', output)
+        self.assertEqual(Movie.objects.count(), 3)
+        self.assertEqual(Movie.objects.get(movie_id=2).title, 'Heat (1995)')
+
+    def test_indexes_are_rebuilt(self):
+        table = Movie._meta.db_table
+        with connection.cursor() as cursor:
+            before = connection.introspection.get_constraints(cursor, table)
+        self.import_movies(self.write_csv('movieId,title,genres\n1,Toy Story (1995),Animation\n'))
+        with connection.cursor() as cursor:
+            after = connection.introspection.get_constraints(cursor, table)
+
+        self.assertEqual(set(after), set(before))
+        self.assertEqual(
+            list(Movie.objects.filter(search_index__isnull=False).values_list('title', flat=True)),
+            ['Toy Story (1995)'],
+        )
+
+    def test_long_values_are_truncated(self):
+        self.import_movies(self.write_csv(f'movieId,title,genres\n1,{"x" * 300},Drama\n'))
+        self.assertEqual(len(Movie.objects.get().title), Movie._meta.get_field('title').max_length)
+
+    def test_missing_column(self):
+        path = self.write_csv('movieId,name\n1,Toy Story (1995)\n')
+        with self.assertRaisesMessage(CommandError, 'missing column(s) title, genres'):
+            self.import_movies(path)
+        self.assertFalse(Movie.objects.exists())
+
+    def test_unknown_catalog(self):
+        with self.assertRaisesMessage(CommandError, 'Unknown catalog(s): music'):
+            call_command('import_catalog', 'music', stdout=io.StringIO())
+
+
+class SparseCosineIndexTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Nonnegative weights like TF-IDF or ratings, with duplicate rows
+        # (tied distances) and a few empty rows
+        matrix = sp.random(400, 300, density=0.03, format='csr', random_state=0, dtype=np.float64)
+        matrix = sp.vstack([matrix, matrix[:20], sp.csr_matrix((5, 300))]).tocsr()
+        cls.matrix = matrix
+        cls.model = NearestNeighbors(metric='cosine', algorithm='brute').fit(matrix)
+        cls.index = cosine_index(cls.model, matrix)
+
+    def assertSameNeighbours(self, query, k):
+        expected_distances, _ = self.model.kneighbors(query, n_neighbors=k)
+        distances, ids = self.index.kneighbors(query, n_neighbors=k)
+        np.testing.assert_allclose(distances, expected_distances, atol=1e-5)
+        # Rows tied at a distance may come in any order; each id must be at its distance
+        true_distances = 1.0 - cosine_similarity(query, self.matrix)
+        np.testing.assert_allclose(np.take_along_axis(true_distances, ids, axis=1), distances, atol=1e-5)
+        for row in ids:
+            self.assertEqual(len(set(row)), k)
+
+    def test_serves_cosine_models(self):
+        self.assertIsInstance(self.index, SparseCosineIndex)
+        euclidean = NearestNeighbors(metric='euclidean').fit(self.matrix)
+        self.assertIs(cosine_index(euclidean, self.matrix), euclidean)
+
+    def test_single_row_queries_match_sklearn(self):
+        for row in range(0, self.matrix.shape[0], 7):
+            self.assertSameNeighbours(self.matrix[row], 10)
+
+    def test_batch_queries_match_sklearn(self):
+        self.assertSameNeighbours(self.matrix[[1, 5, 401, 410]], 25)
+
+    def test_pads_with_unrelated_rows(self):
+        # The rarest term, shared with fewer rows than k; the rest are at distance 1
+        counts = np.diff(self.matrix.tocsc().indptr)
+        column = int(np.argmin(np.where(counts > 0, counts, counts.max() + 1)))
+        self.assertLess(counts[column], 30)
+        query = sp.csr_matrix(([1.0], ([0], [column])), shape=(1, self.matrix.shape[1]))
+        self.assertSameNeighbours(query, 30)
+        self.assertSameNeighbours(sp.csr_matrix((1, self.matrix.shape[1])), 5)
+
+    def test_loaded_index_does_not_keep_the_sklearn_model(self):
+        with tempfile.TemporaryDirectory() as directory:
+            model_path = os.path.join(directory, 'nn_model.joblib')
+            joblib.dump(self.model, model_path)
+            index = load_cosine_index(directory, model_path, self.matrix)
+            self.assertIsInstance(index, SparseCosineIndex)
+            self.assertFalse(hasattr(index, '_fit_X'))
+
+            # Exported posting lists are used without unpickling the model
+            save_array(directory, POSTINGS_NAME, cosine_postings(self.matrix))
+            with mock.patch('joblib.load') as load:
+                index = load_cosine_index(directory, model_path, self.matrix)
+            load.assert_not_called()
+            np.testing.assert_array_equal(
+                index.kneighbors(self.matrix[:5], 10)[1], self.index.kneighbors(self.matrix[:5], 10)[1],
+            )
+
+    def test_non_cosine_model_serves_the_queries(self):
+        with tempfile.TemporaryDirectory() as directory:
+            model_path = os.path.join(directory, 'nn_model.joblib')
+            joblib.dump(NearestNeighbors(metric='euclidean').fit(self.matrix), model_path)
+            self.assertIsInstance(load_cosine_index(directory, model_path, self.matrix), NearestNeighbors)
+
+    def test_benchmark_command(self):
+        state = {'index': self.index, 'sparse_matrix': self.matrix}
+        with tempfile.TemporaryDirectory() as directory:
+            model_path = os.path.join(directory, 'knn_model.joblib')
+            joblib.dump(self.model, model_path)
+            with mock.patch.dict(SPARSE_MODELS, {'movies.knn': SPARSE_MODELS['movies.knn']}, clear=True), \
+                    mock.patch.object(knn, 'MODEL_PATH', model_path), \
+                    mock.patch.object(knn.knn_model, 'get', return_value=state):
+                out = io.StringIO()
+                # No model names: every sparse model
+                call_command('benchmark_sparse_index', '--sample', '20', stdout=out)
+        self.assertIn('movies.knn     recall@10: 1.000', out.getvalue())
+
+        with self.assertRaisesMessage(CommandError, 'Unknown model(s): movies.nn'):
+            call_command('benchmark_sparse_index', 'movies.knn', 'movies.nn', stdout=io.StringIO())
+
+    def test_evaluation_reports_full_recall(self):
+        stats = evaluate_cosine_index(self.index, self.model, self.matrix, k=10, sample=50)
+        self.assertEqual(stats['recall'], 1.0)
+
+
+class MovieTextRecommendationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('reader', password='secret')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        vectors = normalize_rows(np.eye(4, 8) + 0.1)
+        state = {
+            'titles': np.array(['Alien', 'Aliens', 'Heat', 'Up'], dtype=object),
+            'vectors': vectors,
+            'index': ExactIndex(vectors),
+            'neighbours': None,
+        }
+        patcher = mock.patch.object(Embeddings.embeddings_model, 'get', return_value=state)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # The query reads like the first catalog movie
+        patcher = mock.patch.object(Embeddings, 'encode_text', return_value=vectors[0])
+        self.encode_text = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def recommend(self, data):
+        return self.client.post(reverse('movie_recommend_text'), data, format='json')
+
+    def test_recommends_from_the_encoded_query(self):
+        response = self.recommend({'query': 'space horror', 'num_recommendations': 4})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['query'], 'space horror')
+        self.assertCountEqual(response.data['recommendations'], ['Alien', 'Aliens', 'Heat', 'Up'])
+        self.encode_text.assert_called_once_with('space horror')
+
+    def test_seed_makes_the_selection_reproducible(self):
+        picks = {
+            tuple(self.recommend({'query': 'space horror', 'num_recommendations': 2, 'seed': 7}).data['recommendations'])
+            for _ in range(3)
+        }
+        self.assertEqual(len(picks), 1)
+
+    def test_unavailable_encoder(self):
+        self.encode_text.return_value = None
+        response = self.recommend({'query': 'space horror'})
+        self.assertEqual(response.data['recommendations'], 'Text encoder not available')
+
+    def test_invalid_request(self):
+        self.assertEqual(self.recommend({'num_recommendations': 0}).status_code, 400)
+        self.encode_text.assert_not_called()
+
+    def test_requires_authentication(self):
+        self.client.force_authenticate(None)
+        self.assertEqual(self.recommend({'query': 'space horror'}).status_code, 401)
+
+
+class NeighbourTableCommandTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+        # 40 movies over 6 genres: many exact ties in genre similarity
+        rng = np.random.default_rng(0)
+        genre_vectors = normalize_rows(rng.integers(0, 2, size=(40, 6)) + np.eye(40, 6))
+        titles = np.array([f'Movie {i}' for i in range(40)], dtype=object)
+
+        def load():
+            return {
+                'titles': titles,
+                'genre_vectors': genre_vectors,
+                'title_index': {title: row for row, title in enumerate(titles)},
+                'neighbours': load_neighbour_table(self.directory, len(genre_vectors)),
+            }
+
+        self.handle = RegisteredModel('test.genre_based', load)
+        for name, value in [('genre_based_model', self.handle), ('GENRE_BASED_PATH', self.directory), ('POOL_SIZE', 10)]:
+            patcher = mock.patch.object(Genre_Based, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def build(self, *args):
+        out = io.StringIO()
+        # Only the fixture model, so the no-argument (all models) form can be used
+        with mock.patch.dict(NEIGHBOUR_MODULES, {'genre_based': 'movies.ai_models.Genre_Based'}, clear=True):
+            call_command('build_neighbour_tables', *args, stdout=out)
+        return out.getvalue()
+
+    def test_table_matches_live_pools(self):
+        titles = [f'Movie {i}' for i in range(40)]
+        live = Genre_Based.recommend_movies_by_genre(titles, 4, seed=3)
+        self.assertIsNone(self.handle.get()['neighbours'])
+
+        self.assertIn('genre_based  40 movies x 10 neighbours', self.build('--k', '10'))
+
+        state = self.handle.get()
+        self.assertEqual(state['neighbours'].k, 10)
+        for row in range(40):
+            scores = Genre_Based.genre_similarities(state['genre_vectors'], np.array([row]))[0]
+            scores[row] = -np.inf
+            np.testing.assert_array_equal(state['neighbours'].neighbours(row, 10), Genre_Based.similarity_pool(scores, 10))
+        self.assertEqual(Genre_Based.recommend_movies_by_genre(titles, 4, seed=3), live)
+
+    def test_table_too_shallow_for_the_pool_is_not_used(self):
+        self.build('genre_based', '--k', '5')
+        self.assertFalse(self.handle.get()['neighbours'].covers(10))
+        self.assertEqual(len(Genre_Based.recommend_movies_by_genre(['Movie 0'], 4, seed=3)['Movie 0']), 4)
+
+    def test_unknown_model(self):
+        with self.assertRaisesMessage(CommandError, 'Unknown model(s): grhr'):
+            self.build('genre_based', 'grhr')
+
+
+class AsyncMovieRecommendationTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('reader', password='secret')
+
+    def setUp(self):
+        self.threads = []
+
+        def recommend(titles, n, seed=None):
+            self.threads.append(threading.current_thread().name)
+            return {title: [f'{title} {i}' for i in range(n)] for title in titles}
+
+        patcher = mock.patch.dict(views.MOVIE_RECOMMENDERS, {'knn': recommend})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.url = reverse('movie_recommend_async')
+
+    def test_recommends_on_the_inference_pool(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.post(
+            self.url, {'movie_title': 'Heat', 'model_used': 'knn', 'num_recommendations': 2, 'save_history': True},
+            format='json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['recommendations'], {'Heat': ['Heat 0', 'Heat 1']})
+        self.assertEqual(response.data['input_movie'], 'Heat')
+        self.assertEqual(len(self.threads), 1)
+        self.assertTrue(self.threads[0].startswith('recommender'))
+        self.assertEqual(
+            list(RecommendationHistory.objects.values_list('user', 'input_title', 'recommended_titles')),
+            [(self.user.id, 'Heat', ['Heat 0', 'Heat 1'])],
+        )
+
+    def test_invalid_request(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.post(self.url, {'movie_title': 'Heat', 'model_used': 'GRHR'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('model_used', response.data)
+        self.assertEqual(self.threads, [])
+
+    def test_requires_authentication(self):
+        response = self.client.post(self.url, {'movie_title': 'Heat', 'model_used': 'knn'}, format='json')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(self.threads, [])
+
+    def test_only_post_is_allowed(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 405)
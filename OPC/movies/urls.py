@@ -8,8 +8,14 @@ urlpatterns = [
     path('history/', views.recommendation_history_page, name='movie_recommendation_history_page'),
       # API endpoints
     path('api/movies/search/', views.MovieSearchView.as_view(), name='movie_search'),
+    path('api/movies/autocomplete/', views.MovieAutocompleteView.as_view(), name='movie_autocomplete'),
     path('api/movies/recommend/', views.MovieRecommendation_1.as_view(), name='movie_recommend'),
+    path('api/movies/recommend-batch/', views.MovieBatchRecommendation.as_view(), name='movie_recommend_batch'),
+    path('api/movies/recommend-text/', views.MovieTextRecommendation.as_view(), name='movie_recommend_text'),
     path('api/movies/recommend-genre/', views.MovieRecommendation_2.as_view(), name='movie_recommend_genre'),
+    path('api/movies/async/recommend/', views.AsyncMovieRecommendation.as_view(), name='movie_recommend_async'),
+    path('api/movies/async/recommend-batch/', views.AsyncMovieBatchRecommendation.as_view(), name='movie_recommend_batch_async'),
+    path('api/movies/async/recommend-genre/', views.AsyncMovieGenreRecommendation.as_view(), name='movie_recommend_genre_async'),
     path('api/movies/save-selected/', views.SaveSelectedRecommendations.as_view(), name='save_selected_recommendations'),
     path('api/movies/history/', views.MovieHistoryView.as_view(), name='movie_history'),
     path('api/movies/history/delete-single/', views.MovieHistorySingleClearView.as_view(), name='delete_single_history'),
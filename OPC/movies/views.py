@@ -8,16 +8,22 @@ from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
 from django.utils.decorators import method_decorator
 from django.db import models
+import asyncio
 
 
-from .serializers import MovieRecommendationRequestSerializer, MovieRecommendationUserRatingSerializer , RecommendationHistorySerializer, MovieSerializer
+from .serializers import TitleAutocompleteQuerySerializer, TextRecommendationRequestSerializer, MovieRecommendationRequestSerializer, MovieBatchRecommendationRequestSerializer, MovieRecommendationUserRatingSerializer , RecommendationHistorySerializer, MovieSerializer
 from .models import RecommendationHistory 
+from .history import awrite_history, history_entries, history_user, insert_history, write_history
+from .async_api import AsyncAPIView, run_inference
+from .pagination import ApproximateCountMixin, HistoryPagination
+from .search import FullTextSearchFilter
+from .autocomplete import complete_titles, movie_autocomplete
 from .ai_models.knn import recommend_movies_knn
 from .ai_models.tfidf import recommend_movies_sparse_list
 from .ai_models.Genre_Based import recommend_movies_by_genre
 from .ai_models.GRHR import recommend_movies_GRHR
 from .ai_models.knn_genre import recommend_movies_by_knn_genre
-from .ai_models.Embeddings import recommend_movies_embeddings
+from .ai_models.Embeddings import recommend_movies_by_text, recommend_movies_embeddings
 from .ai_models.NN import recommend_movies_nn
 
 from movies.models import Movie
@@ -27,7 +33,18 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.pagination import PageNumberPagination
 
 
-class CustomLimitOffsetPagination(LimitOffsetPagination):
+# Title-based recommenders by model_used; each takes a list of titles, a count and an optional seed
+MOVIE_RECOMMENDERS = {
+    'tfidf': recommend_movies_sparse_list,
+    'Genre-Based': recommend_movies_by_genre,
+    'knn': recommend_movies_knn,
+    'knn_genre': recommend_movies_by_knn_genre,
+    'Embeddings': recommend_movies_embeddings,
+    'NN': recommend_movies_nn,
+}
+
+
+class CustomLimitOffsetPagination(ApproximateCountMixin, LimitOffsetPagination):
     """
     Custom offset pagination for search results with enhanced response format
     """
@@ -39,6 +56,7 @@ class CustomLimitOffsetPagination(LimitOffsetPagination):
     def get_paginated_response(self, data):
         return Response({
             'count': self.count,
+            'count_is_estimate': self.count_is_estimate,
             'next': self.get_next_link(),
             'previous': self.get_previous_link(),
             'total_pages': (self.count + self.limit - 1) // self.limit if self.limit else 1,
@@ -58,7 +76,7 @@ class MovieSearchView(generics.ListAPIView):
     permission_classes = [IsAuthenticated]
     queryset = Movie.objects.all()
     serializer_class = MovieSerializer
-    filter_backends = [filters.SearchFilter]
+    filter_backends = [FullTextSearchFilter]
     search_fields = ['title', 'genres']
     pagination_class = CustomLimitOffsetPagination
     
@@ -77,6 +95,23 @@ class MovieSearchView(generics.ListAPIView):
 
 
 
+class MovieAutocompleteView(APIView):
+    """
+    Title suggestions for the search box, served from the in-memory
+    autocomplete index without touching the database.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        serializer = TitleAutocompleteQuerySerializer(data=request.query_params)
+        if serializer.is_valid():
+            query = serializer.validated_data['q']
+            suggestions = complete_titles(movie_autocomplete, query, serializer.validated_data['limit'])
+            return Response({"query": query, "results": suggestions}, status=status.HTTP_200_OK)
+
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
 class MovieRecommendation_1(APIView):
     def post(self, request):
         serializer = MovieRecommendationRequestSerializer(data=request.data)
@@ -86,37 +121,21 @@ class MovieRecommendation_1(APIView):
             model_used = serializer.validated_data['model_used']
             save_history = serializer.validated_data.get('save_history', False)  # default True
             regenerate = serializer.validated_data.get('regenerate', False)    # default False
+            seed = serializer.validated_data.get('seed')
 
             # Convert single movie title to list for compatibility with existing AI models
             movie_titles = [movie_title]
 
-            if model_used == 'tfidf':
-                results = recommend_movies_sparse_list(movie_titles, num_recommendations)
-            elif model_used == 'Genre-Based':
-                results = recommend_movies_by_genre(movie_titles, num_recommendations)
-            elif model_used == 'knn':
-                results = recommend_movies_knn(movie_titles, num_recommendations)
-            elif model_used == 'knn_genre':
-                results = recommend_movies_by_knn_genre(movie_titles, num_recommendations)
-            elif model_used == 'Embeddings':
-                results = recommend_movies_embeddings(movie_titles, num_recommendations)
-            elif model_used == 'NN':
-                results = recommend_movies_nn(movie_titles, num_recommendations)
-            else:
+            recommend = MOVIE_RECOMMENDERS.get(model_used)
+            if recommend is None:
                 return Response(
                     {"error": f"Model '{model_used}' is not supported."},
                     status=status.HTTP_400_BAD_REQUEST
                 )
+            results = recommend(movie_titles, num_recommendations, seed=seed)
 
             if save_history:
-                for input_title, recommended in results.items():
-                    if isinstance(recommended, list):
-                        RecommendationHistory.objects.create(
-                            user=request.user if request.user.is_authenticated else None,
-                            input_title=input_title,
-                            recommended_titles=recommended,
-                            model_used=model_used
-                        )
+                write_history(history_entries(RecommendationHistory, history_user(request), model_used, results))
 
             return Response({
                 "recommendations": results,
@@ -133,6 +152,76 @@ class MovieRecommendation_1(APIView):
 
 
 
+class MovieTextRecommendation(APIView):
+    """
+    Recommend movies for a free-text description with the Embeddings model.
+    The description is encoded by the sentence transformer, loaded on the
+    first such request.
+    """
+    def post(self, request):
+        serializer = TextRecommendationRequestSerializer(data=request.data)
+        if serializer.is_valid():
+            query = serializer.validated_data['query']
+            num_recommendations = serializer.validated_data['num_recommendations']
+            seed = serializer.validated_data.get('seed')
+
+            return Response({
+                "recommendations": recommend_movies_by_text(query, num_recommendations, seed=seed),
+                "query": query
+            }, status=status.HTTP_200_OK)
+
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class MovieBatchRecommendation(APIView):
+    """
+    Recommend for many input titles and models in one request. Each model
+    handles all titles in a single batched similarity pass.
+    """
+    def post(self, request):
+        serializer = MovieBatchRecommendationRequestSerializer(data=request.data)
+        if serializer.is_valid():
+            movie_titles = serializer.validated_data['movie_titles']
+            models_used = list(dict.fromkeys(serializer.validated_data['models_used']))
+            num_recommendations = serializer.validated_data['num_recommendations']
+            save_history = serializer.validated_data.get('save_history', False)
+            regenerate = serializer.validated_data.get('regenerate', False)
+            seed = serializer.validated_data.get('seed')
+
+            unsupported = [model_used for model_used in models_used if model_used not in MOVIE_RECOMMENDERS]
+            if unsupported:
+                return Response(
+                    {"error": f"Model '{unsupported[0]}' is not supported."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            results = {
+                model_used: MOVIE_RECOMMENDERS[model_used](movie_titles, num_recommendations, seed=seed)
+                for model_used in models_used
+            }
+
+            if save_history:
+                user = history_user(request)
+                write_history([
+                    entry
+                    for model_used, model_results in results.items()
+                    for entry in history_entries(RecommendationHistory, user, model_used, model_results)
+                ])
+
+            return Response({
+                "recommendations": results,
+                "saved_history": save_history,
+                "regenerated": regenerate,
+                "input_movies": movie_titles
+            }, status=status.HTTP_200_OK)
+
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+
+
+
+
 class MovieRecommendation_2(APIView):
     def post(self, request):
         serializer = MovieRecommendationUserRatingSerializer(data=request.data)
@@ -142,9 +231,10 @@ class MovieRecommendation_2(APIView):
             model_used = serializer.validated_data['model_used']
             save_history = serializer.validated_data.get('save_history', False)
             regenerate = serializer.validated_data.get('regenerate', False)
+            seed = serializer.validated_data.get('seed')
 
             if model_used == 'GRHR':
-                results = recommend_movies_GRHR(movie_genres, num_recommendations)
+                results = recommend_movies_GRHR(movie_genres, num_recommendations, seed=seed)
                 
                 # Check if GRHR returned an error
                 if isinstance(results, dict) and 'error' in results:
@@ -164,12 +254,12 @@ class MovieRecommendation_2(APIView):
                 )
 
             if save_history and isinstance(results, list):
-                RecommendationHistory.objects.create(
-                    user=request.user if request.user.is_authenticated else None,
+                write_history([RecommendationHistory(
+                    user=history_user(request),
                     input_title=", ".join(movie_genres),
                     recommended_titles=results,
                     model_used=model_used
-                )
+                )])
 
             return Response({
                 "recommendations": results,
@@ -185,6 +275,133 @@ class MovieRecommendation_2(APIView):
 
 
 
+class AsyncMovieRecommendation(AsyncAPIView):
+    """
+    Async variant of MovieRecommendation_1 for ASGI servers: the model runs on
+    the inference pool while the request only holds a coroutine.
+    """
+    async def post(self, request):
+        serializer = MovieRecommendationRequestSerializer(data=request.data)
+        if serializer.is_valid():
+            movie_title = serializer.validated_data['movie_title']
+            num_recommendations = serializer.validated_data['num_recommendations']
+            model_used = serializer.validated_data['model_used']
+            save_history = serializer.validated_data.get('save_history', False)
+            regenerate = serializer.validated_data.get('regenerate', False)
+            seed = serializer.validated_data.get('seed')
+
+            recommend = MOVIE_RECOMMENDERS.get(model_used)
+            if recommend is None:
+                return Response(
+                    {"error": f"Model '{model_used}' is not supported."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            results = await run_inference(recommend, [movie_title], num_recommendations, seed=seed)
+
+            if save_history:
+                await awrite_history(history_entries(RecommendationHistory, history_user(request), model_used, results))
+
+            return Response({
+                "recommendations": results,
+                "saved_history": save_history,
+                "regenerated": regenerate,
+                "input_movie": movie_title
+            }, status=status.HTTP_200_OK)
+
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class AsyncMovieBatchRecommendation(AsyncAPIView):
+    """
+    Async variant of MovieBatchRecommendation; the requested models run
+    concurrently on the inference pool.
+    """
+    async def post(self, request):
+        serializer = MovieBatchRecommendationRequestSerializer(data=request.data)
+        if serializer.is_valid():
+            movie_titles = serializer.validated_data['movie_titles']
+            models_used = list(dict.fromkeys(serializer.validated_data['models_used']))
+            num_recommendations = serializer.validated_data['num_recommendations']
+            save_history = serializer.validated_data.get('save_history', False)
+            regenerate = serializer.validated_data.get('regenerate', False)
+            seed = serializer.validated_data.get('seed')
+
+            unsupported = [model_used for model_used in models_used if model_used not in MOVIE_RECOMMENDERS]
+            if unsupported:
+                return Response(
+                    {"error": f"Model '{unsupported[0]}' is not supported."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            model_results = await asyncio.gather(*(
+                run_inference(MOVIE_RECOMMENDERS[model_used], movie_titles, num_recommendations, seed=seed)
+                for model_used in models_used
+            ))
+            results = dict(zip(models_used, model_results))
+
+            if save_history:
+                user = history_user(request)
+                await awrite_history([
+                    entry
+                    for model_used, model_results in results.items()
+                    for entry in history_entries(RecommendationHistory, user, model_used, model_results)
+                ])
+
+            return Response({
+                "recommendations": results,
+                "saved_history": save_history,
+                "regenerated": regenerate,
+                "input_movies": movie_titles
+            }, status=status.HTTP_200_OK)
+
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class AsyncMovieGenreRecommendation(AsyncAPIView):
+    """
+    Async variant of MovieRecommendation_2 (GRHR).
+    """
+    async def post(self, request):
+        serializer = MovieRecommendationUserRatingSerializer(data=request.data)
+        if serializer.is_valid():
+            movie_genres = serializer.validated_data['movie_genres']
+            num_recommendations = serializer.validated_data['num_recommendations']
+            model_used = serializer.validated_data['model_used']
+            save_history = serializer.validated_data.get('save_history', False)
+            regenerate = serializer.validated_data.get('regenerate', False)
+            seed = serializer.validated_data.get('seed')
+
+            if model_used != 'GRHR':
+                return Response(
+                    {"error": f"Model '{model_used}' is not implemented yet."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            results = await run_inference(recommend_movies_GRHR, movie_genres, num_recommendations, seed=seed)
+            if isinstance(results, dict) and 'error' in results:
+                return Response({"error": results['error']}, status=status.HTTP_400_BAD_REQUEST)
+
+            if save_history and isinstance(results, list):
+                await awrite_history([RecommendationHistory(
+                    user=history_user(request),
+                    input_title=", ".join(movie_genres),
+                    recommended_titles=results,
+                    model_used=model_used
+                )])
+
+            return Response({
+                "recommendations": results,
+                "saved_history": save_history,
+                "regenerated": regenerate
+            }, status=status.HTTP_200_OK)
+
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+
+
+
+
 class SaveSelectedRecommendations(APIView):
     def post(self, request):
         input_title = request.data.get('input_title')
@@ -195,13 +412,11 @@ class SaveSelectedRecommendations(APIView):
             return Response({'error': 'No recommendations provided.'}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            for input_title, recommended_titles in selected_recommendations.items():
-                RecommendationHistory.objects.create(
-                    user=request.user if request.user.is_authenticated else None,
-                    input_title= input_title, 
-                    recommended_titles=recommended_titles,  # Assuming this is a JSONField or TextField
-                    model_used=model_used
-                )
+            user = history_user(request)
+            insert_history([
+                RecommendationHistory(user=user, input_title=input_title, recommended_titles=recommended_titles, model_used=model_used)
+                for input_title, recommended_titles in selected_recommendations.items()
+            ])
 
             return Response({'status': 'Saved successfully.'}, status=status.HTTP_200_OK)
 
@@ -218,7 +433,8 @@ class MovieHistoryView(generics.ListAPIView):
     permission_classes = [IsAuthenticated]
     search_fields = ['input_title', 'model_used']
     ordering_fields = ['timestamp']
-    ordering = ['-timestamp']  
+    ordering = ['-timestamp', '-id']
+    pagination_class = HistoryPagination
 
     def get_queryset(self):
         """Return history entries for the authenticated user only"""